@@ -0,0 +1,251 @@
+"""
+Module: GuiResponsiveness
+Description: This module measures how responsive the main window stays while jobs run.
+             The MainWindow is started on the offscreen Qt platform and runs a welding
+             planner and a data filler job on synthetic inputs through its job scheduler.
+             A precise timer ticks in the GUI event loop meanwhile, how late every tick
+             fires is the delay a click or a repaint would see (the event-loop latency).
+
+             Reported for an idle baseline and for every job: the latency percentiles,
+             the rate of the progress signals and the longest gap between two of them,
+             and the time to completion. The run fails when the p99 latency of a job is
+             over the limit or a job does not succeed.
+
+             Run from the app directory:
+                 python -m benchmarks.gui_responsiveness --worker-mode thread
+                 python -m benchmarks.gui_responsiveness --worker-mode process --json results.json
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Interval of the probing timer, a tick is late by the time the event loop was blocked
+PROBE_INTERVAL_MS = 5
+
+# A job that does not finish in this time counts as failed
+JOB_TIMEOUT_S = 600
+
+class LatencyProbe():
+    '''
+    Repeating timer in the GUI event loop recording how late every tick fires.
+
+    :param interval_ms: Interval of the timer
+    '''
+    def __init__(self, interval_ms=PROBE_INTERVAL_MS):
+        from PyQt6.QtCore import Qt, QTimer
+
+        self.interval_s = interval_ms / 1000
+        self.latencies = []
+        self._last_tick = None
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._tick)
+
+    def start(self):
+        self.latencies = []
+        self._last_tick = time.perf_counter()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.latencies.append(max(0.0, now - self._last_tick - self.interval_s))
+        self._last_tick = now
+
+def latency_summary(latencies):
+    '''
+    Returns the p50, p95, p99 and max of the latencies in milliseconds.
+    '''
+    if len(latencies) < 2:
+        # The event loop did not get to run the timer at all
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None, "ticks": len(latencies)}
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50_ms": percentiles[49] * 1000, "p95_ms": percentiles[94] * 1000, "p99_ms": percentiles[98] * 1000,
+            "max_ms": max(latencies) * 1000, "ticks": len(latencies)}
+
+def _measure_idle(probe, duration_s):
+    from PyQt6.QtCore import QEventLoop, QTimer
+
+    event_loop = QEventLoop()
+    QTimer.singleShot(int(duration_s * 1000), event_loop.quit)
+
+    probe.start()
+    event_loop.exec()
+    probe.stop()
+
+    return {"latency": latency_summary(probe.latencies)}
+
+def _measure_job(window, probe, fn, *args, **kwargs):
+    from PyQt6.QtCore import QEventLoop, QTimer
+
+    event_loop = QEventLoop()
+    progress_times = []
+    finished = {}
+
+    def job_progress(job_id, percentage):
+        progress_times.append(time.perf_counter())
+
+    def job_finished(job_result):
+        finished["job_result"] = job_result
+        finished["time"] = time.perf_counter()
+        event_loop.quit()
+
+    window.job_scheduler.job_progress.connect(job_progress)
+    window.job_scheduler.job_finished.connect(job_finished)
+    QTimer.singleShot(JOB_TIMEOUT_S * 1000, event_loop.quit)
+
+    probe.start()
+    submitted_time = time.perf_counter()
+    window.job_scheduler.submit(fn, *args, **kwargs)
+    event_loop.exec()
+    probe.stop()
+
+    window.job_scheduler.job_progress.disconnect(job_progress)
+    window.job_scheduler.job_finished.disconnect(job_finished)
+
+    job_result = finished.get("job_result")
+    end_time = finished.get("time", time.perf_counter())
+
+    # The longest stretch the user saw no progress, from the submit to the end of the job
+    signal_times = [submitted_time] + progress_times + [end_time]
+    max_progress_gap = max(later - earlier for earlier, later in zip(signal_times, signal_times[1:]))
+
+    return {"status": job_result.status if job_result is not None else "timed out",
+            "error": (f"{type(job_result.exception).__name__}: {job_result.exception}"
+                      if job_result is not None and job_result.exception is not None else None),
+            "time_to_completion_s": end_time - submitted_time,
+            "run_time_s": job_result.run_time if job_result is not None else None,
+            "progress_signals": len(progress_times),
+            "progress_rate_per_s": len(progress_times) / max(end_time - submitted_time, 1e-9),
+            "max_progress_gap_s": max_progress_gap,
+            "latency": latency_summary(probe.latencies)}
+
+def run_harness(directory, worker_mode, num_of_materials, num_of_rows, idle_s):
+    '''
+    Runs the idle baseline and the jobs, returns the measurements by name.
+    '''
+    from PyQt6 import QtWidgets
+    from PyQt6.QtCore import QThreadPool
+    import main
+    from modules import jobs
+    from modules.excel_data_manager import ExcelDataManager
+    from .synthetic_inputs import write_data_filler_inputs, write_welding_planner_inputs
+
+    planner_inputs = write_welding_planner_inputs(os.path.join(directory, "planner"), num_of_materials=num_of_materials)
+    filler_inputs = write_data_filler_inputs(os.path.join(directory, "filler"), num_of_rows=num_of_rows,
+                                             num_of_keys=max(1, num_of_rows // 5))
+
+    # The window is measured as configured in main.py, only the worker mode may be overridden
+    if worker_mode is not None:
+        main.worker_mode = worker_mode
+
+    # Kept in a variable, the application must outlive the window
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = main.MainWindow()
+    window.show()
+
+    # The jobs report to the harness instead of opening message boxes
+    window.job_scheduler.job_finished.disconnect(window._job_finished)
+
+    probe = LatencyProbe()
+    measurements = {"idle": _measure_idle(probe, idle_s)}
+
+    paths, title_rows = planner_inputs["paths"], planner_inputs["column_title_rows"]
+    planner_excels = {role: ExcelDataManager(path, 0, title_rows[role] - 1) for role, path in paths.items()}
+    measurements["welding planner"] = _measure_job(window, probe, jobs.run_welding_planner,
+                                                   planner_excels["bi_reservations"],
+                                                   planner_excels["manufacturing_plan"],
+                                                   planner_excels["batch_database"],
+                                                   output_path=os.path.join(directory, "output", "WeldingPlan.xlsx"),
+                                                   name="Welding Planner")
+
+    paths, sheet_names, columns = filler_inputs["paths"], filler_inputs["sheet_names"], filler_inputs["columns"]
+    measurements["data filler"] = _measure_job(window, probe, jobs.run_data_filler,
+                                               ExcelDataManager(paths["src"], sheet_names["src"], 0),
+                                               ExcelDataManager(paths["dst"], sheet_names["dst"], 0),
+                                               columns["src_lookup"], columns["src_copy"],
+                                               columns["dst_lookup"], columns["dst_fill"],
+                                               name="Data Filler")
+
+    # The workers still emit their last signals after the results arrived, the interpreter
+    # must not tear the Qt objects down before the pools are done
+    window.job_scheduler.threadpool.waitForDone()
+    QThreadPool.globalInstance().waitForDone()
+
+    window.close()
+    return measurements
+
+def _format_ms(value):
+    return "-" if value is None else f"{value:.1f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the event-loop latency of MasterPlanner while jobs run.")
+    parser.add_argument("--worker-mode", choices=("thread", "process", "resident"),
+                        help="overrides worker_mode of main.py")
+    parser.add_argument("--materials", type=int, default=1000, help="materials of the synthetic planner inputs")
+    parser.add_argument("--rows", type=int, default=50000, help="rows of the synthetic data filler inputs")
+    parser.add_argument("--idle", type=float, default=1.0, help="seconds of the idle baseline")
+    parser.add_argument("--max-latency-ms", type=float, default=250.0, help="p99 event-loop latency limit of a job")
+    parser.add_argument("--json", help="also write the measurements to this file")
+    args = parser.parse_args()
+
+    # Headless unless a platform is chosen explicitly
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    # main.py loads its icons relative to the app directory
+    os.chdir(APP_DIRECTORY)
+
+    with tempfile.TemporaryDirectory() as directory:
+        measurements = run_harness(directory, args.worker_mode, args.materials, args.rows, args.idle)
+
+    print(f"{'':17}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'progress/s':>12}{'max gap s':>11}{'completed s':>13}")
+    for name, measurement in measurements.items():
+        latency = measurement["latency"]
+        print(f"{name:17}{_format_ms(latency['p50_ms']):>9}{_format_ms(latency['p95_ms']):>9}"
+              f"{_format_ms(latency['p99_ms']):>9}{_format_ms(latency['max_ms']):>9}"
+              f"{measurement.get('progress_rate_per_s', 0):>12.1f}{measurement.get('max_progress_gap_s', 0):>11.2f}"
+              f"{measurement.get('time_to_completion_s', 0):>13.2f}")
+
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(measurements, json_file, indent=2)
+
+    failures = []
+    for name, measurement in measurements.items():
+        if name == "idle":
+            continue
+
+        if measurement["status"] != "succeeded":
+            failures.append(f"the {name} job {measurement['status']}"
+                            + (f" ({measurement['error']})" if measurement["error"] else ""))
+
+        p99_ms = measurement["latency"]["p99_ms"]
+        if p99_ms is None or p99_ms > args.max_latency_ms:
+            failures.append(f"the p99 latency during the {name} job is over {args.max_latency_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
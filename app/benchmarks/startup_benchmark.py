@@ -0,0 +1,150 @@
+"""
+Module: StartupBenchmark
+Description: This module measures the cold start of the app: the time until the main
+             window is shown and the time until the first (synthetic) job has finished.
+             Every run is a fresh interpreter, the medians are checked against limits.
+
+             Run from the app directory:
+                 python -m benchmarks.startup_benchmark --runs 5
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported before the window is shown
+HEAVY_MODULES = ("pandas", "numpy", "isoweek", "openpyxl")
+
+def _measure_startup(inputs):
+    start_time = time.perf_counter()
+
+    # Everything the app needs to show the window is imported after the clock started
+    from PyQt6 import QtWidgets
+    from PyQt6.QtCore import QThreadPool, QTimer
+    import main
+    from modules import jobs
+    from modules.excel_data_manager import ExcelDataManager
+
+    app = QtWidgets.QApplication([])
+    window = main.MainWindow()
+    window.show()
+
+    # Checked before the event loop runs, it starts the background import of the tools
+    heavy_modules_at_window = [module for module in HEAVY_MODULES if module in sys.modules]
+    app.processEvents()
+
+    measurements = {
+        "time_to_window": time.perf_counter() - start_time,
+        "heavy_modules_at_window": heavy_modules_at_window,
+    }
+
+    # Report the job here instead of in a message box
+    window.job_scheduler.job_finished.disconnect(window._job_finished)
+
+    def job_finished(job_result):
+        measurements["time_to_first_job"] = time.perf_counter() - start_time
+        measurements["first_job_status"] = job_result.status
+        app.quit()
+
+    window.job_scheduler.job_finished.connect(job_finished)
+
+    paths, sheet_names, columns = inputs["paths"], inputs["sheet_names"], inputs["columns"]
+    window.job_scheduler.submit(jobs.run_data_filler,
+                                ExcelDataManager(paths["src"], sheet_names["src"], 0),
+                                ExcelDataManager(paths["dst"], sheet_names["dst"], 0),
+                                columns["src_lookup"], columns["src_copy"],
+                                columns["dst_lookup"], columns["dst_fill"],
+                                name="Startup benchmark")
+
+    # Do not hang forever if the job never reports back
+    QTimer.singleShot(120000, app.quit)
+    app.exec()
+
+    # The worker still emits its last signal after the result arrived, the interpreter
+    # must not tear the Qt objects down before the pools are done
+    window.job_scheduler.threadpool.waitForDone()
+    QThreadPool.globalInstance().waitForDone()
+
+    return measurements
+
+def _run_child(inputs):
+    environment = dict(os.environ)
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    completed = subprocess.run([sys.executable, "-m", "benchmarks.startup_benchmark",
+                                "--child", json.dumps(inputs)],
+                               cwd=APP_DIRECTORY, env=environment,
+                               capture_output=True, text=True)
+
+    if completed.returncode != 0:
+        # A crashed run is reported as a failure of the benchmark, not as a traceback
+        stderr_lines = completed.stderr.strip().splitlines()
+        return {"error": f"exit code {completed.returncode}: {stderr_lines[-1] if stderr_lines else 'no output'}"}
+
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the MasterPlanner cold start.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=2000, help="rows of the synthetic data filler inputs")
+    parser.add_argument("--max-time-to-window", type=float, default=1.5, help="seconds, median")
+    parser.add_argument("--max-time-to-first-job", type=float, default=10.0, help="seconds, median")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(_measure_startup(json.loads(args.child))))
+        return 0
+
+    from .synthetic_inputs import write_data_filler_inputs
+
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = write_data_filler_inputs(directory, num_of_rows=args.rows, num_of_keys=max(1, args.rows // 5))
+        runs = [_run_child(inputs) for _ in range(args.runs)]
+
+    failed_runs = [run for run in runs if "error" in run]
+    runs = [run for run in runs if "error" not in run]
+    if not runs:
+        for run in failed_runs:
+            print(f"FAILED: the run crashed ({run['error']})")
+        return 1
+
+    time_to_window = statistics.median(run["time_to_window"] for run in runs)
+    time_to_first_job = statistics.median(run.get("time_to_first_job", float("inf")) for run in runs)
+    heavy_modules = sorted({module for run in runs for module in run["heavy_modules_at_window"]})
+
+    print(f"runs:                       {len(runs) + len(failed_runs)} ({len(failed_runs)} crashed)")
+    print(f"time to window (median):    {time_to_window:.3f} s (limit {args.max_time_to_window:.3f} s)")
+    print(f"time to first job (median): {time_to_first_job:.3f} s (limit {args.max_time_to_first_job:.3f} s)")
+    print(f"heavy modules at window:    {', '.join(heavy_modules) or 'none'}")
+
+    failures = [f"a run crashed ({run['error']})" for run in failed_runs]
+    if time_to_window > args.max_time_to_window:
+        failures.append("time to window is over the limit")
+    if time_to_first_job > args.max_time_to_first_job:
+        failures.append("time to first job is over the limit")
+    if heavy_modules:
+        failures.append("heavy modules are imported before the window is shown")
+    if any(run.get("first_job_status") != "succeeded" for run in runs):
+        failures.append("the first job did not succeed")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
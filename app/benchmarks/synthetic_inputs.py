@@ -0,0 +1,100 @@
+"""
+Module: SyntheticInputs
+Description: This module writes synthetic input workbooks for the welding planner and
+             the data filler, so that the benchmarks do not depend on company data.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+
+def write_welding_planner_inputs(directory, num_of_materials=200, reservations_per_material=5, seed=0):
+    '''
+    Writes BI reservations, manufacturing plan and batch database workbooks.
+
+    :return: dict with the paths of the workbooks and their 1-based column title rows
+    '''
+    rng = np.random.default_rng(seed)
+    year = date.today().year
+    os.makedirs(directory, exist_ok=True)
+
+    materials = [f"MX{index:06d}" for index in range(num_of_materials)]
+    num_of_projects = max(1, num_of_materials // 2)
+    projects = [f"P{index:05d}" for index in range(num_of_projects)]
+
+    num_of_rows = num_of_materials * reservations_per_material
+    reservation_materials = np.repeat(materials, reservations_per_material)
+    reservation_projects = rng.choice(projects + [f"M{year}"], size=num_of_rows)
+    delivery_weeks = rng.integers(10, 45, size=num_of_rows)
+
+    bi_reservations_df = pd.DataFrame({
+        "CISLO_MAT": reservation_materials,
+        "NAZEV_MAT": [f"Part {material}" for material in reservation_materials],
+        "STAV_MAT": rng.integers(0, 20, size=num_of_rows),
+        "_IB_KOKS": reservation_projects,
+        "CIS_OBJ": [f"OA{index:06d}" for index in range(num_of_rows)],
+        "MNOZSTVI": rng.integers(1, 30, size=num_of_rows),
+        "DODATUMU": pd.to_datetime([date.fromisocalendar(year, int(week), 1) for week in delivery_weeks]),
+    })
+
+    # The project numbers are in the 10th column which has no title
+    manufacturing_plan_df = pd.DataFrame({f"COLUMN {index}": [""] * num_of_projects for index in range(9)})
+    manufacturing_plan_df["Unnamed: 9"] = projects
+    manufacturing_plan_df["CURRENT DELIVERY WEEK "] = rng.integers(12, 48, size=num_of_projects)
+
+    batch_database_df = pd.DataFrame({
+        "Číslo": materials,
+        "Norma Kooperace": rng.integers(7, 29, size=num_of_materials),
+        "Dávka": rng.integers(5, 60, size=num_of_materials),
+    })
+
+    paths = {
+        "bi_reservations": os.path.join(directory, "bi_reservations.xlsx"),
+        "manufacturing_plan": os.path.join(directory, "manufacturing_plan.xlsx"),
+        "batch_database": os.path.join(directory, "batch_database.xlsx"),
+    }
+
+    bi_reservations_df.to_excel(paths["bi_reservations"], index=False)
+    manufacturing_plan_df.to_excel(paths["manufacturing_plan"], index=False)
+
+    # The batch database has its column titles on the second row
+    with pd.ExcelWriter(paths["batch_database"]) as writer:
+        pd.DataFrame([["Batch database"]]).to_excel(writer, index=False, header=False)
+        batch_database_df.to_excel(writer, index=False, startrow=1)
+
+    return {"paths": paths,
+            "column_title_rows": {"bi_reservations": 1, "manufacturing_plan": 1, "batch_database": 2}}
+
+def write_data_filler_inputs(directory, num_of_rows=5000, num_of_keys=1000, seed=0):
+    '''
+    Writes a source and a destination workbook sharing the "KEY" lookup column.
+
+    :return: dict with the paths, sheet names and column names of the fill
+    '''
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    keys = np.array([f"K{index:06d}" for index in range(num_of_keys)])
+
+    src_df = pd.DataFrame({"KEY": rng.choice(keys, size=num_of_rows),
+                           "VALUE": rng.integers(0, 1000000, size=num_of_rows)})
+    dst_df = pd.DataFrame({"KEY": rng.choice(keys, size=num_of_rows),
+                           "OTHER": rng.random(size=num_of_rows),
+                           "VALUE": np.nan})
+
+    paths = {"src": os.path.join(directory, "source.xlsx"),
+             "dst": os.path.join(directory, "destination.xlsx")}
+
+    src_df.to_excel(paths["src"], sheet_name="Source", index=False)
+    dst_df.to_excel(paths["dst"], sheet_name="Destination", index=False)
+
+    return {"paths": paths,
+            "sheet_names": {"src": "Source", "dst": "Destination"},
+            "columns": {"src_lookup": "KEY", "src_copy": "VALUE", "dst_lookup": "KEY", "dst_fill": "VALUE"}}
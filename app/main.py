@@ -13,19 +13,58 @@ This software is distributed under the GPL v3.0 license.
 """
 
 # external module imports
+import multiprocessing
+import os
 from PyQt6 import QtWidgets
-from PyQt6.QtCore import QThreadPool, QSize
+from PyQt6.QtCore import QEvent, QSize, QStringListModel, Qt, QThreadPool, QTimer
 from PyQt6.QtGui import QPixmap, QIcon
 
 # local module imports
-from modules.data_filler import DataFiller
-from modules.welding_planner import WeldingPlanner
-from modules.excel_data_manager import ExcelDataManager
-from gui.main_window import Ui_MainWindow
+from modules import jobs
+from modules.excel_data_manager import ExcelDataManager, is_sheet_pattern, matching_sheet_names
+from modules.job_scheduler import JobScheduler, JOB_SUCCEEDED, JOB_FAILED
+from modules.schema_validator import SchemaValidationError
+from modules.workbook_preview import WorkbookPreviewCache, read_workbook_preview, is_same_file
 from modules.thread_worker import ThreadWorker
+from modules.process_worker import ProcessWorker
+from modules.resident_worker import ResidentWorkerProcess
+from gui.main_window import Ui_MainWindow
 
 app_version = "v1.3.2"
 
+# Number of planner/filler jobs allowed to run at the same time
+max_concurrent_jobs = 2
+
+# "thread" runs the jobs inside the GUI process, "process" runs every job in its own
+# worker process so the GUI keeps responding while pandas holds the GIL, "resident" runs
+# the jobs one by one in a pre-warmed process spawned at startup
+worker_mode = "thread"
+
+# Write a per-stage memory report next to the output of every job
+profile_memory = False
+
+# Record every welding plan in output/plan_history.sqlite, update mode then takes the
+# batches in production from there. Edits of the previous plan are still read back on
+# every update run to keep the user's columns, so it is off unless the history is wanted.
+record_plan_history = False
+
+# Checkpoint the welding planner runs in the temporary directory, a failed run started
+# again with the same inputs resumes where it stopped instead of reading the workbooks again.
+# Costs a pickle of the prepared inputs every 30 s, meant for long runs that may fail.
+checkpoint_planning_runs = False
+
+# Processes matching the lookup values of a data filler job, 1 matches in the job itself.
+# More than one needs worker_mode "thread", the worker processes cannot start a pool.
+data_filler_workers = 1
+
+# For destination workbooks bigger than this the user is offered to fill them row by row
+# without loading them into memory (keeps cell values, formulas and styles, drops column
+# widths, merged cells, conditional formatting, data validation and charts), None never offers it
+streaming_fill_min_bytes = 50 * 1024 * 1024
+
+# Memory the resident worker may use to keep parsed input sheets between jobs
+resident_cache_bytes = 512 * 1024 * 1024
+
 class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
     def __init__(self, *args, obj=None, **kwargs):
         super(MainWindow, self).__init__(*args, **kwargs)
@@ -38,7 +77,45 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self._setup_welding_planner_tab()
         self._setup_data_filler_tab()
 
-        self.threadpool = QThreadPool()
+        self.progress_bars = {}
+        self.resident_worker = None
+
+        if worker_mode == "resident":
+            # Spawned right away so the imports happen while the user fills in the inputs
+            self.resident_worker = ResidentWorkerProcess(max_cache_bytes=resident_cache_bytes)
+            self.resident_worker.start()
+            worker_factory = self.resident_worker.create_worker
+
+        elif worker_mode == "process":
+            worker_factory = ProcessWorker
+
+        else:
+            worker_factory = ThreadWorker
+
+        self.job_scheduler = JobScheduler(max_concurrent_jobs=max_concurrent_jobs,
+                                          worker_factory=worker_factory,
+                                          parent=self)
+        self.job_scheduler.job_started.connect(self._job_started)
+        self.job_scheduler.job_progress.connect(self._update_progress_bar)
+        self.job_scheduler.job_finished.connect(self._job_finished)
+
+        # Import the data stack once the window is up instead of before it is shown
+        QTimer.singleShot(0, self._preload_modules)
+
+    def closeEvent(self, event):
+        # Stop the jobs and the resident process together with the window
+        self.job_scheduler.cancel_all()
+
+        if self.resident_worker is not None:
+            self.resident_worker.shutdown()
+
+        super(MainWindow, self).closeEvent(event)
+
+    def _preload_modules(self):
+        # Worker processes import the tools themselves, there is nothing to warm up here
+        if worker_mode == "thread":
+            self.preload_worker = ThreadWorker(jobs.preload_modules)
+            QThreadPool.globalInstance().start(self.preload_worker)
 
     def _setup_welding_planner_tab(self):
         self.welding_planner_excel_icon.setPixmap(self.excel_icon_pixmap.scaled(20, 20))
@@ -65,6 +142,100 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.src_browse_file_button.clicked.connect(self._get_file_path)
         self.dst_browse_file_button.clicked.connect(self._get_file_path)
         self.process_data_filler_button.clicked.connect(self._long_process_threadcall)
+        self.dst_sheet_name_ledit.setToolTip("Sheet name, or a pattern such as * or 2026-* "
+                                             "to fill all matching sheets in one run")
+
+        # Sheet names and column titles of the selected files are offered as completions,
+        # only the first rows of the workbooks are read, in the background
+        self.workbook_previews = WorkbookPreviewCache()
+        self.preview_workers = {}
+        self.data_filler_fields = {
+            "source": (self.src_fpath_ledit, self.src_sheet_name_ledit, self.src_col_title_row_ledit,
+                       (self.src_lookup_column_ledit, self.src_copy_column_ledit)),
+            "destination": (self.dst_fpath_ledit, self.dst_sheet_name_ledit, self.dst_col_title_row_ledit,
+                            (self.dst_lookup_column_ledit, self.dst_fill_column_ledit))}
+
+        for side, (fpath_ledit, sheet_name_ledit, col_title_row_ledit, column_ledits) in self.data_filler_fields.items():
+            for line_edit in (sheet_name_ledit,) + column_ledits:
+                completer = QtWidgets.QCompleter(QStringListModel(line_edit), line_edit)
+                completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+                completer.setFilterMode(Qt.MatchFlag.MatchContains)
+                line_edit.setCompleter(completer)
+                line_edit.installEventFilter(self)
+
+            fpath_ledit.textChanged.connect(lambda text, side=side: self._load_workbook_preview(side))
+            sheet_name_ledit.textChanged.connect(lambda text, side=side: self._update_column_completions(side))
+            col_title_row_ledit.textChanged.connect(lambda text, side=side: self._update_column_completions(side))
+
+    def eventFilter(self, watched, event):
+        # An empty sheet or column field drops down all its completions when it gets the focus
+        if (event.type() == QEvent.Type.FocusIn and isinstance(watched, QtWidgets.QLineEdit)
+                and watched.completer() is not None and watched.text() == ""
+                and watched.completer().model().rowCount() > 0):
+            QTimer.singleShot(0, watched.completer().complete)
+
+        return super(MainWindow, self).eventFilter(watched, event)
+
+    def _load_workbook_preview(self, side):
+        file_path = self.data_filler_fields[side][0].text()
+
+        if not os.path.isfile(file_path):
+            self._set_completions(self.data_filler_fields[side][1], [])
+            self._update_column_completions(side)
+            return
+
+        preview = self.workbook_previews.get(file_path)
+        if preview is not None:
+            self._show_workbook_preview(side, preview)
+            return
+
+        preview_worker = ThreadWorker(read_workbook_preview, file_path)
+        preview_worker.signals.result.connect(lambda preview, side=side: self._workbook_preview_read(side, preview))
+        preview_worker.signals.error.connect(lambda error: print(f"Could not preview the workbook: {error[1]}"))
+
+        # A newer selection replaces the pending one, its result is dropped when it arrives
+        self.preview_workers[side] = preview_worker
+        QThreadPool.globalInstance().start(preview_worker)
+
+    def _workbook_preview_read(self, side, preview):
+        self.workbook_previews.put(preview)
+
+        if is_same_file(self.data_filler_fields[side][0].text(), preview):
+            self._show_workbook_preview(side, preview)
+
+    def _show_workbook_preview(self, side, preview):
+        sheet_name_ledit = self.data_filler_fields[side][1]
+        self._set_completions(sheet_name_ledit, preview.sheet_names)
+
+        if sheet_name_ledit.text() == "" and len(preview.sheet_names) > 0:
+            sheet_name_ledit.setText(preview.sheet_names[0])
+
+        self._update_column_completions(side)
+
+    def _update_column_completions(self, side):
+        fpath_ledit, sheet_name_ledit, col_title_row_ledit, column_ledits = self.data_filler_fields[side]
+
+        column_titles = []
+        preview = self.workbook_previews.get(fpath_ledit.text())
+
+        if preview is not None:
+            # The column title row defaults to the first row while it is not filled in
+            col_title_row = col_title_row_ledit.text().strip() or "1"
+            if col_title_row.isdigit():
+                sheet_name = sheet_name_ledit.text()
+
+                # The sheets of a pattern share their layout, the first one stands for all
+                if is_sheet_pattern(sheet_name):
+                    sheet_names = matching_sheet_names(preview.sheet_names, sheet_name)
+                    sheet_name = sheet_names[0] if sheet_names else sheet_name
+
+                column_titles = preview.column_titles(sheet_name, int(col_title_row))
+
+        for column_ledit in column_ledits:
+            self._set_completions(column_ledit, column_titles)
+
+    def _set_completions(self, line_edit, completions):
+        line_edit.completer().model().setStringList(completions)
 
     def _get_file_path(self):
         file_filter = 'Excel File (*.xlsx *.xls)'
@@ -95,11 +266,6 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             elif (self.sender() is self.batch_data_browse_file_button):
                 self.batch_data_fpath_ledit.setText((response[0]))
 
-    def _enable_all_pushbuttons(self, enable):
-        pushbutton_object_list = self.tabWidget.findChildren(QtWidgets.QPushButton)
-        for push_button in pushbutton_object_list:
-            push_button.setEnabled(enable)
-
     def _check_missing_inputs(self):
         missing_input = False
 
@@ -123,8 +289,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         else:
             self.process_welding_planner_button.setText("Create Welding Plan")
 
-    def _run_welding_planner(self, progress_callback=None):
-        
+    def _submit_welding_planner_job(self):
         bi_reservations_excel = ExcelDataManager(self.bi_reser_fpath_ledit.text(),
                                                  sheet_name=0,
                                                  column_name_row=int(
@@ -148,12 +313,21 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         else:
             welding_planner_excel = None
 
-        welding_planner_instance = WeldingPlanner(welding_planner_excel)
-        
-        welding_planner_instance.plan_welding(bi_reservations_excel, manufacturing_plan_excel, 
-                                              batch_database_excel, progress_callback=progress_callback)
-
-    def _run_data_filler(self, progress_callback):
+        read_files, written_files = jobs.welding_planner_job_files(bi_reservations_excel,
+                                                                   manufacturing_plan_excel,
+                                                                   batch_database_excel,
+                                                                   welding_planner_excel)
+
+        return self.job_scheduler.submit(jobs.run_welding_planner, bi_reservations_excel,
+                                         manufacturing_plan_excel, batch_database_excel,
+                                         welding_planner_excel, profile_memory=profile_memory,
+                                         record_plan_history=record_plan_history,
+                                         checkpoint_directory=(jobs.DEFAULT_CHECKPOINT_DIRECTORY
+                                                               if checkpoint_planning_runs else None),
+                                         name="Welding Planner",
+                                         read_files=read_files, written_files=written_files)
+
+    def _submit_data_filler_job(self):
         src_excel = ExcelDataManager(self.src_fpath_ledit.text(), 
                                         self.src_sheet_name_ledit.text(), 
                                         int(self.src_col_title_row_ledit.text())-1)
@@ -161,64 +335,142 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         dst_excel = ExcelDataManager(self.dst_fpath_ledit.text(),
                                                 self.dst_sheet_name_ledit.text(),
                                                 int(self.dst_col_title_row_ledit.text())-1)
-        
-        src_excel.df = src_excel.read_excel()
-        dst_excel.df = dst_excel.read_excel()
 
-        data_filler_instance = DataFiller(src_excel, dst_excel, 
-                                            self.src_lookup_column_ledit.text(), 
-                                            self.src_copy_column_ledit.text(), 
-                                            self.dst_lookup_column_ledit.text(), 
-                                            self.dst_fill_column_ledit.text())
+        read_files, written_files = jobs.data_filler_job_files(src_excel, dst_excel)
+
+        # The streaming fill handles a single sheet, a pattern of sheets is always loaded
+        streaming = (streaming_fill_min_bytes is not None and os.path.isfile(dst_excel.file_path) and
+                     not is_sheet_pattern(dst_excel.sheet_name) and
+                     os.path.getsize(dst_excel.file_path) >= streaming_fill_min_bytes and
+                     self._confirm_streaming_fill(dst_excel))
+
+        return self.job_scheduler.submit(jobs.run_data_filler, src_excel, dst_excel,
+                                         self.src_lookup_column_ledit.text(),
+                                         self.src_copy_column_ledit.text(),
+                                         self.dst_lookup_column_ledit.text(),
+                                         self.dst_fill_column_ledit.text(),
+                                         profile_memory=profile_memory, streaming=streaming,
+                                         num_of_workers=data_filler_workers,
+                                         name="Data Filler",
+                                         read_files=read_files, written_files=written_files)
+
+    def _confirm_streaming_fill(self, dst_excel):
+        # The streaming fill loses formatting of the whole workbook, it is never chosen silently
+        size_mb = os.path.getsize(dst_excel.file_path) / (1024 * 1024)
+
+        msgBox = QtWidgets.QMessageBox(self)
+        msgBox.setWindowIcon(QIcon('gui/resources/icons/master_planner_icon.png'))
+        msgBox.setWindowTitle("MasterPlanner Processing")
+        msgBox.setIcon(QtWidgets.QMessageBox.Icon.Warning)
+        msgBox.setText(f"The destination workbook has {size_mb:.0f} MB.\n"
+                       "Fill it row by row without loading it into memory?")
+        msgBox.setInformativeText("Cell values, formulas and cell styles are kept. Column widths, merged cells, "
+                                  "conditional formatting, data validation, charts and images of every sheet "
+                                  "of the workbook are lost.")
+        msgBox.setStandardButtons(QtWidgets.QMessageBox.StandardButton.Yes |
+                                  QtWidgets.QMessageBox.StandardButton.No)
+        msgBox.setDefaultButton(QtWidgets.QMessageBox.StandardButton.No)
+
+        msgBox.exec()
 
-        data_filler_instance.fill_data(progress_callback=progress_callback)
+        return msgBox.standardButton(msgBox.clickedButton()) == QtWidgets.QMessageBox.StandardButton.Yes
 
     def _long_process_threadcall(self):
         if self._check_missing_inputs() == False:
 
-            self._enable_all_pushbuttons(False)
-
+            # The inputs are read here in the GUI thread, the queued job only gets a snapshot of them
             if (self.sender() is self.process_data_filler_button):
-
-                worker = ThreadWorker(self._run_data_filler)
+                job_id = self._submit_data_filler_job()
 
             elif(self.sender() is self.process_welding_planner_button):
-                worker = ThreadWorker(self._run_welding_planner)
+                job_id = self._submit_welding_planner_job()
+
+            progress_bar = QtWidgets.QProgressDialog("Processing...", "Abort", 0, 100, self)
+            progress_bar.setWindowTitle("MasterPlanner Processing")
+            progress_bar.setAutoClose(False)
+            progress_bar.setMinimumDuration(0)
+            progress_bar.canceled.connect(lambda job_id=job_id: self.job_scheduler.cancel(job_id))
+            self.progress_bars[job_id] = progress_bar
+
+            if self.job_scheduler.is_queued(job_id):
+                progress_bar.setLabelText(f"Job #{job_id} is waiting in the queue...")
+            else:
+                progress_bar.setLabelText(f"Job #{job_id} is running...")
+
+    def _job_started(self, job_id):
+        if job_id in self.progress_bars:
+            self.progress_bars[job_id].setLabelText(f"Job #{job_id} is running...")
+
+    def _update_progress_bar(self, job_id, n):
+        if job_id in self.progress_bars:
+            self.progress_bars[job_id].setValue(n)
 
-            worker.signals.progress.connect(self._update_progress_bar)
-            worker.signals.error.connect(self._thread_raised_exception)
-            worker.signals.result.connect(self._thread_processed_successfully)
-            worker.signals.finished.connect(self._thread_finished)
+    def _job_finished(self, job_result):
+        progress_bar = self.progress_bars.pop(job_result.job_id, None)
+        if progress_bar is not None:
+            progress_bar.close()
 
-            self.progress_bar = QtWidgets.QProgressDialog("Processing...", "Abort", 0, 100, self)
-            self.progress_bar.setMinimumDuration(0)
-            self.threadpool.start(worker)
+        if job_result.status == JOB_SUCCEEDED:
+            self._thread_processed_successfully(job_result)
 
-    def _update_progress_bar(self, n):
-        self.progress_bar.setValue(n)
+        elif job_result.status == JOB_FAILED:
+            self._thread_raised_exception(job_result)
 
-    def _thread_processed_successfully(self):
+    def _thread_processed_successfully(self, job_result):
         msgBox = QtWidgets.QMessageBox()
         msgBox.setWindowIcon(QIcon('gui/resources/icons/master_planner_icon.png'))
-        msgBox.setText("Processing is complete!")
+        message = (f"{job_result.name} (job #{job_result.job_id}) is complete!\n"
+                   f"Processing took {job_result.run_time:.1f} s.")
+
+        # The result had the same content as the existing output, the file was left alone
+        if getattr(job_result.value, "attrs", {}).get(jobs.OUTPUT_UNCHANGED_ATTRIBUTE, False):
+            message += "\nThe output is unchanged, it was not written again."
+
+        msgBox.setText(message)
         msgBox.setWindowTitle("MasterPlanner Processing")
         msgBox.setStyleSheet("QLabel{min-width: 200px; min-height: 100px;}")
+        msgBox.addButton(QtWidgets.QMessageBox.StandardButton.Ok)
+
+        # Imported here, pandas is loaded anyway once a job returned a DataFrame
+        from modules.result_viewer import is_viewable
+        show_results_button = None
+        if is_viewable(job_result.value):
+            show_results_button = msgBox.addButton("Show Results", QtWidgets.QMessageBox.ButtonRole.ActionRole)
+
         msgBox.exec()
 
-    def _thread_raised_exception(self):
+        if show_results_button is not None and msgBox.clickedButton() is show_results_button:
+            self._show_results(job_result)
+
+    def _show_results(self, job_result):
+        from modules.result_viewer import ResultViewerDialog
+
+        # Not modal, several results can stay open next to the main window, the window owns them
+        result_viewer = ResultViewerDialog(job_result.value, f"{job_result.name} (job #{job_result.job_id}) results", self)
+        result_viewer.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        result_viewer.show()
+
+    def _thread_raised_exception(self, job_result):
         msgBox = QtWidgets.QMessageBox()
         msgBox.setWindowIcon(QIcon('gui/resources/icons/master_planner_icon.png'))
-        msgBox.setText("Processing failed, unknown error!\nCheck the inputs.")
+
+        if isinstance(job_result.exception, SchemaValidationError):
+            # Refused before processing, the message says exactly what is wrong with which input
+            msgBox.setText(f"{job_result.name} (job #{job_result.job_id}) did not start!\n"
+                           f"{job_result.exception}")
+        else:
+            msgBox.setText(f"{job_result.name} (job #{job_result.job_id}) failed!\n"
+                           f"{type(job_result.exception).__name__}: {job_result.exception}\n"
+                           "Check the inputs.")
+            msgBox.setDetailedText(job_result.traceback)
         msgBox.setWindowTitle("MasterPlanner Processing")
         msgBox.setStyleSheet("QLabel{min-width: 200px; min-height: 100px;}")
         msgBox.exec()
 
-        self.progress_bar.close()
-
-    def _thread_finished(self):
-        self._enable_all_pushbuttons(True)
-
 if __name__ == "__main__":
+    # Needed for the worker processes of a frozen (packaged) app
+    multiprocessing.freeze_support()
+
     app = QtWidgets.QApplication([])
     window = MainWindow()
     window.show()
@@ -0,0 +1,42 @@
+"""
+Module: Cancellation
+Description: This module provides a cancellation token that long running tools
+             poll at safe points so that a job can be stopped cooperatively.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import threading
+
+class JobCancelledError(Exception):
+    '''
+    Raised inside a running tool when its cancellation token has been triggered.
+    '''
+    pass
+
+class CancellationToken():
+    '''
+    Cooperative cancellation flag shared between the GUI thread and a running tool.
+
+    :param event: Optional event object used as the flag (e.g. a multiprocessing.Event
+                  when the tool runs in another process). A threading.Event is used by default.
+    :type event: threading.Event
+
+    '''
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelledError("The job was cancelled.")
@@ -0,0 +1,192 @@
+"""
+Module: CapacityScheduler
+Description: This module levels the welding load of the production batches against a weekly
+             capacity of the workcentres. Every batch has the latest week its welding has to
+             be completed in. The weeks are filled backwards from the latest one with a
+             priority queue, a batch that does not fit into its week any more is pulled to
+             an earlier week, the batches with the earliest deadline are pulled first.
+
+             The capacity is read from config/welding_capacity.json, the scheduling is off
+             when the file does not exist. See config/welding_capacity.example.json.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import heapq
+import json
+import os
+import numpy as np
+
+DEFAULT_CAPACITY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     "config", "welding_capacity.json")
+DEFAULT_WORKCENTRE = "WELDING"
+CAPACITY_UNITS = ("pieces", "hours")
+
+class CapacityScheduler():
+    '''
+    Assigns welding weeks to the production batches without exceeding the weekly capacity.
+
+    A batch is never scheduled after its latest week and never before first_week. A batch
+    bigger than the whole weekly capacity gets a week on its own. When the weeks down to
+    first_week are full, the rest of the batches are put into first_week over the capacity.
+
+    :param weekly_capacity: Capacity per week, a number for every workcentre or a dict
+                            {workcentre: capacity}, workcentres missing in it are not levelled
+    :param unit: "pieces" or "hours"
+    :param workcentres: dict {material number: workcentre}, other materials go to DEFAULT_WORKCENTRE
+    :param hours_per_piece: dict {material number: welding hours per piece}, used for unit "hours"
+    :param default_hours_per_piece: Welding hours per piece of materials missing in hours_per_piece
+
+    '''
+    def __init__(self, weekly_capacity, unit="pieces", workcentres=None, hours_per_piece=None,
+                 default_hours_per_piece=1.0):
+        if unit not in CAPACITY_UNITS:
+            raise ValueError(f"Unknown capacity unit '{unit}', use one of {', '.join(CAPACITY_UNITS)}.")
+
+        self.weekly_capacity = weekly_capacity
+        self.unit = unit
+        self.workcentres = workcentres if workcentres is not None else {}
+        self.hours_per_piece = hours_per_piece if hours_per_piece is not None else {}
+        self.default_hours_per_piece = default_hours_per_piece
+
+    @classmethod
+    def load(cls, path=DEFAULT_CAPACITY_PATH):
+        '''
+        Reads the capacity configuration, returns None (no scheduling) when the file does not exist.
+        '''
+        if not os.path.exists(path):
+            return None
+
+        with open(path, encoding="utf-8") as capacity_file:
+            return cls.from_config(json.load(capacity_file))
+
+    @classmethod
+    def from_config(cls, config):
+        if "weekly_capacity" not in config:
+            raise ValueError("The capacity configuration has no 'weekly_capacity'.")
+
+        return cls(config["weekly_capacity"],
+                   unit=config.get("unit", "pieces"),
+                   workcentres=config.get("workcentres"),
+                   hours_per_piece=config.get("hours_per_piece"),
+                   default_hours_per_piece=config.get("default_hours_per_piece", 1.0))
+
+    def capacity_of(self, workcentre):
+        if isinstance(self.weekly_capacity, dict):
+            return self.weekly_capacity.get(workcentre)
+
+        return self.weekly_capacity
+
+    def workcentres_of(self, materials):
+        return np.array([self.workcentres.get(material, DEFAULT_WORKCENTRE) for material in materials], dtype=object)
+
+    def loads_of(self, materials, pieces):
+        pieces = np.asarray(pieces, dtype=float)
+
+        if self.unit == "pieces":
+            return pieces
+
+        return pieces * np.array([self.hours_per_piece.get(material, self.default_hours_per_piece)
+                                  for material in materials], dtype=float)
+
+    def assign_weeks(self, latest_weeks, materials, pieces, first_week=None):
+        '''
+        Returns the assigned week of every batch, NaN where the latest week is NaN.
+
+        :param latest_weeks: array like of the latest welding weeks
+        :param materials: array like of the material numbers of the batches
+        :param pieces: array like of the pieces in the batches
+        :param first_week: Earliest week that can still be scheduled, None for no limit
+        '''
+        latest_weeks = np.asarray(latest_weeks, dtype=float)
+        assigned_weeks = np.full(latest_weeks.shape, np.nan)
+
+        workcentres = self.workcentres_of(materials)
+        loads = self.loads_of(materials, pieces)
+        valid = np.isfinite(latest_weeks)
+
+        for workcentre in _unique_in_order(workcentres[valid]):
+            positions = np.flatnonzero(valid & (workcentres == workcentre))
+            capacity = self.capacity_of(workcentre)
+
+            if capacity is None or capacity <= 0:
+                # Workcentre without a capacity limit, weld as late as possible
+                assigned_weeks[positions] = np.trunc(latest_weeks[positions])
+                continue
+
+            assigned_weeks[positions] = self._level(np.trunc(latest_weeks[positions]).astype(np.int64),
+                                                    loads[positions], capacity, first_week)
+
+        return assigned_weeks
+
+    def _level(self, latest_weeks, loads, capacity, first_week):
+        num_of_batches = latest_weeks.size
+        assigned_weeks = np.empty(num_of_batches, dtype=np.int64)
+
+        # Batches by their latest week, the latest first
+        order = np.argsort(-latest_weeks, kind="stable")
+        sorted_latest_weeks = latest_weeks[order].tolist()
+        order = order.tolist()
+        loads = loads.tolist()
+
+        # Batches that may be welded in the current week, the one with the latest deadline on top
+        available = []
+        next_batch = 0
+        week = sorted_latest_weeks[0]
+
+        while next_batch < num_of_batches or available:
+            if not available:
+                # Skip the weeks nobody needs
+                week = min(week, sorted_latest_weeks[next_batch])
+
+            while next_batch < num_of_batches and sorted_latest_weeks[next_batch] >= week:
+                heapq.heappush(available, (-sorted_latest_weeks[next_batch], next_batch, order[next_batch]))
+                next_batch += 1
+
+            if first_week is not None and week <= first_week:
+                # Nothing can be welded earlier, the rest overloads the first week
+                for _, _, position in available:
+                    assigned_weeks[position] = first_week
+                for position in order[next_batch:]:
+                    assigned_weeks[position] = first_week
+                break
+
+            remaining_capacity = capacity
+            while available:
+                position = available[0][2]
+
+                # An empty week takes even a batch bigger than the whole capacity
+                if loads[position] > remaining_capacity and remaining_capacity < capacity:
+                    break
+
+                heapq.heappop(available)
+                assigned_weeks[position] = week
+                remaining_capacity -= loads[position]
+
+            week -= 1
+
+        return assigned_weeks
+
+    def weekly_load(self, assigned_weeks, materials, pieces):
+        '''
+        Returns a list of (workcentre, week, load, capacity) rows sorted by workcentre and week.
+        '''
+        assigned_weeks = np.asarray(assigned_weeks, dtype=float)
+        workcentres = self.workcentres_of(materials)
+        loads = self.loads_of(materials, pieces)
+        valid = np.isfinite(assigned_weeks)
+
+        totals = {}
+        for workcentre, week, load in zip(workcentres[valid], assigned_weeks[valid].astype(np.int64), loads[valid]):
+            totals[(workcentre, int(week))] = totals.get((workcentre, int(week)), 0.0) + load
+
+        return [(workcentre, week, float(load), self.capacity_of(workcentre))
+                for (workcentre, week), load in sorted(totals.items(), key=lambda item: (str(item[0][0]), item[0][1]))]
+
+def _unique_in_order(values):
+    # Unique values in the order of appearance, np.unique would sort mixed object values
+    return list(dict.fromkeys(values.tolist()))
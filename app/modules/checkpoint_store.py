@@ -0,0 +1,118 @@
+"""
+Module: CheckpointStore
+Description: This module keeps the intermediate results of a long planning run in a local
+             scratch directory, so a run that fails late (e.g. on an output file locked by
+             Excel) resumes from its last checkpoint instead of reading the workbooks again.
+
+             The checkpoints of a run live in a directory named by the fingerprint of the
+             run: the identity (path, size, modification time) of every input file with its
+             sheet and column title row, the planning parameters and the date. A changed
+             input, parameter or day gives another fingerprint, so stale checkpoints are
+             never resumed. Every checkpoint file is written to a temporary name and then
+             renamed, an interrupted write leaves no half written checkpoint behind.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .frame_cache import file_identity
+
+# external module imports
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+# Checkpoint directories not touched for this long belong to runs that will never resume
+MAX_CHECKPOINT_AGE_S = 2 * 24 * 60 * 60
+
+# Changed whenever the content of the checkpoints changes, older checkpoints are ignored
+CHECKPOINT_FORMAT = 1
+
+class CheckpointStore():
+    '''
+    Checkpoints of one run, keyed by the fingerprint of its inputs and parameters.
+
+    :param directory: Scratch directory holding the checkpoints of all runs
+    :param input_excels: ExcelDataManager objects of the input sheets (None entries are skipped)
+    :param parameters: JSON serializable parameters the results depend on
+
+    '''
+    def __init__(self, directory, input_excels, parameters):
+        self.directory = directory
+        self.fingerprint = run_fingerprint(input_excels, parameters)
+        self.run_directory = os.path.join(directory, self.fingerprint)
+
+    def load(self, name):
+        '''
+        Returns the checkpoint saved under the name, None if there is none.
+        '''
+        try:
+            with open(self._path(name), "rb") as checkpoint_file:
+                fingerprint, data = pickle.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # A damaged checkpoint is treated as a missing one, the work is simply done again
+            print(f"Ignoring the unreadable checkpoint '{self._path(name)}': {e}")
+            return None
+
+        return data if fingerprint == self.fingerprint else None
+
+    def save(self, name, data):
+        os.makedirs(self.run_directory, exist_ok=True)
+
+        temporary_path = self._path(name) + ".tmp"
+        with open(temporary_path, "wb") as checkpoint_file:
+            pickle.dump((self.fingerprint, data), checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporary_path, self._path(name))
+
+    def names(self, prefix=""):
+        '''
+        Returns the sorted names of the saved checkpoints starting with the prefix.
+        '''
+        if not os.path.isdir(self.run_directory):
+            return []
+
+        return sorted(os.path.splitext(file_name)[0] for file_name in os.listdir(self.run_directory)
+                      if file_name.startswith(prefix) and file_name.endswith(".pkl"))
+
+    def clear(self):
+        '''
+        Removes the checkpoints of the run, called once the run succeeded.
+        '''
+        shutil.rmtree(self.run_directory, ignore_errors=True)
+
+    def prune(self, max_age_s=MAX_CHECKPOINT_AGE_S):
+        '''
+        Removes the checkpoint directories of other runs that were not touched for max_age_s.
+        '''
+        if not os.path.isdir(self.directory):
+            return
+
+        oldest_kept = time.time() - max_age_s
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.path != self.run_directory and entry.stat().st_mtime < oldest_kept:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.run_directory, f"{name}.pkl")
+
+def run_fingerprint(input_excels, parameters):
+    '''
+    Returns the hex digest identifying a run by its input files and parameters.
+    '''
+    inputs = [(file_identity(input_excel.file_path), input_excel.sheet_name, input_excel.column_name_row)
+              for input_excel in input_excels if input_excel is not None]
+
+    # Sorted keys, the same parameters always give the same text
+    description = json.dumps({"format": CHECKPOINT_FORMAT, "inputs": inputs, "parameters": parameters},
+                             sort_keys=True, default=str)
+
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()[:32]
@@ -0,0 +1,64 @@
+"""
+Module: ContentHash
+Description: This module computes a canonical hash of the data a tool writes, so an output
+             whose content did not change is not written again. The hash covers the sheet
+             names, the column titles and dtypes and the values of every row, it does not
+             depend on how the workbook was saved (timestamps, styles, zip compression).
+
+             The hash of a written workbook is kept in a JSON sidecar file together with the
+             size and modification time of the workbook. A workbook edited or replaced after
+             it was written no longer matches its sidecar and is always written again.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import hashlib
+import json
+import os
+import pandas as pd
+
+def frames_hash(frames):
+    '''
+    Returns the hex digest of the content of the frames.
+
+    :param frames: list of (name, DataFrame) in the order they are written
+    '''
+    digest = hashlib.sha256()
+
+    for name, df in frames:
+        layout = [str(name), [str(column) for column in df.columns], [str(dtype) for dtype in df.dtypes]]
+        digest.update(json.dumps(layout).encode("utf-8"))
+
+        # One 64-bit hash per row, computed column by column without converting the rows
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+
+    return digest.hexdigest()
+
+def is_unchanged(file_path, sidecar_path, content_hash):
+    '''
+    True when the file was written with the content of the hash and not touched since.
+    '''
+    try:
+        with open(sidecar_path, encoding="utf-8") as sidecar_file:
+            sidecar = json.load(sidecar_file)
+
+        stat_result = os.stat(file_path)
+    except (OSError, ValueError):
+        return False
+
+    return (sidecar.get("content_hash") == content_hash and sidecar.get("size") == stat_result.st_size
+            and sidecar.get("mtime_ns") == stat_result.st_mtime_ns)
+
+def record_content_hash(file_path, sidecar_path, content_hash):
+    '''
+    Writes the sidecar of a file that was just written with the content of the hash.
+    '''
+    stat_result = os.stat(file_path)
+
+    with open(sidecar_path, "w", encoding="utf-8") as sidecar_file:
+        json.dump({"content_hash": content_hash, "size": stat_result.st_size, "mtime_ns": stat_result.st_mtime_ns},
+                  sidecar_file)
@@ -2,6 +2,8 @@
 Module: DataFiller
 Description: This module provides a class for filling data in a destination Excel sheet
              based on common lookup values between a source Excel sheet and the destination sheet.
+             MultiSheetDataFiller fills every sheet of a destination workbook whose name matches
+             a pattern ("*", "2026-*") from one index of the source lookup values.
              
 Author: Adam Ondryas
 Email: adam.ondryas@gmail.com
@@ -11,15 +13,22 @@ This software is distributed under the GPL v3.0 license.
 
 # local module imports
 from .excel_data_manager import ExcelDataManager
+from .cancellation import JobCancelledError
+from .content_hash import frames_hash
+from .memory_profiler import MemoryProfiler
+from .output_files import OUTPUT_UNCHANGED_ATTRIBUTE
 
 # external module imports
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
 
 class DataFiller():
     def __init__(self, source: ExcelDataManager, destination: ExcelDataManager,
                  src_lookup_column, src_copy_column, 
-                 dst_lookup_column, dst_fill_column):
+                 dst_lookup_column, dst_fill_column, memory_profiler=None, num_of_workers=1,
+                 source_index=None):
         
         self.source = source
         self.source.lookup_column = src_lookup_column
@@ -29,62 +38,227 @@ class DataFiller():
         self.destination.lookup_column = dst_lookup_column
         self.destination.fill_column = dst_fill_column
 
-    def fill_data(self, progress_callback=None):
-        # Getting unique lookup values from source and destination dataframes
-        source_unique_lookup_values = self._get_unique_lookup_values(self.source.df, self.source.lookup_column)
-        destination_unique_lookup_values = self._get_unique_lookup_values(self.destination.df, self.destination.lookup_column)
+        self.memory_profiler = memory_profiler if memory_profiler is not None else MemoryProfiler(enabled=False)
 
-        # Finding common values between source and destination lookup values
-        unique_lookup_values = self._find_common_values(destination_unique_lookup_values, 
-                                                        source_unique_lookup_values)
-        
-        num_of_unique_lookup_values = unique_lookup_values.size
-
-        # Iterating over common lookup values
-        for index, current_lookup_value in enumerate(unique_lookup_values):
-            # Creating subsets of dataframes based on current lookup value
-            current_source_subset = self.source.df[
-                (self.source.df[self.source.lookup_column] == current_lookup_value)]
-            
-            current_destination_subset = self.destination.df[
-                (self.destination.df[self.destination.lookup_column] == current_lookup_value)]
-        
-            # Aligning indices of destination subset with source subset
-            self._align_indeces(current_destination_subset, current_source_subset)
-            
-            # Updating values in destination column with values from source column
-            self._update_values(self.destination.df[self.destination.fill_column], current_source_subset[self.source.copy_column])
-            
-            progress_callback.emit(int( (index / (num_of_unique_lookup_values-1)) * 100 ))
-
-        # Get the index of column to be appended
-        fill_column_index = self.destination.df.columns.get_loc(self.destination.fill_column)
-
-        # Appending updated dataframe to the destination Excel file
-        self.destination.append_to_excel(self.destination.df[self.destination.fill_column], 
-                                         startcol=fill_column_index)
-        
-    def _get_unique_lookup_values(self, df, lookup_column):
+        # More than one worker matches hash shards of the lookup values in a process pool
+        self.num_of_workers = max(1, int(num_of_workers))
+
+        # Optional index_lookup_values of the source, shared by the fills of several destination sheets
+        self.source_index = source_index
+
+        # Set by fill_data when the destination already had every value and was not written
+        self.output_unchanged = False
+
+    def fill_data(self, progress_callback=None, cancel_token=None):
+        try:
+            return self._fill_data(progress_callback, cancel_token)
+
+        except JobCancelledError:
+            # Release the loaded sheets, the destination file is left untouched
+            self.source.df = None
+            self.destination.df = None
+            raise
+
+    def _fill_data(self, progress_callback, cancel_token):
+        with self.memory_profiler.stage("fill column"):
+            previous_hash = self._fill_column_hash()
+            self._fill_column(progress_callback, cancel_token)
+
+        # Last chance to stop before the destination file is modified
+        self._check_cancelled(cancel_token)
+
+        self.output_unchanged = self._fill_column_hash() == previous_hash
+        if self.output_unchanged:
+            # Every value is already there, the destination is not written (nor saved) again
+            self.destination.df.attrs[OUTPUT_UNCHANGED_ATTRIBUTE] = True
+            return self.destination.df
+
+        with self.memory_profiler.stage("append to destination"):
+            # Get the index of column to be appended
+            fill_column_index = self.destination.df.columns.get_loc(self.destination.fill_column)
+
+            # Appending updated dataframe to the destination Excel file
+            self.destination.append_to_excel(self.destination.df[self.destination.fill_column], 
+                                             startcol=fill_column_index)
+
+        return self.destination.df
+
+    def _fill_column(self, progress_callback, cancel_token):
+        # Make sure all lookup values are strings on both sides
+        if self.source_index is None:
+            source_lookup_values = self._normalize_lookup_values(self.source.df, self.source.lookup_column)
+        destination_lookup_values = self._normalize_lookup_values(self.destination.df, self.destination.lookup_column)
+
+        self._update_progress_bar(progress_callback, 10)
+        self._check_cancelled(cancel_token)
+
+        if self.source_index is not None:
+            destination_positions, source_positions = match_indexed(self.source_index, destination_lookup_values)
+
+        elif self.num_of_workers > 1 and not multiprocessing.current_process().daemon:
+            destination_positions, source_positions = self._match_sharded(source_lookup_values,
+                                                                          destination_lookup_values,
+                                                                          progress_callback, cancel_token)
+        else:
+            # Worker processes of the GUI are daemonic and cannot start a process pool
+            destination_positions, source_positions = match_positional(source_lookup_values,
+                                                                       destination_lookup_values)
+
+        self._check_cancelled(cancel_token)
+
+        # Updating values in destination column with values from source column
+        new_values = pd.Series(self.source.df[self.source.copy_column].values[source_positions],
+                               index=self.destination.df.index[destination_positions])
+        self._update_values(self.destination.df[self.destination.fill_column], new_values)
+
+        self._update_progress_bar(progress_callback, 100)
+
+    def _match_sharded(self, source_lookup_values, destination_lookup_values, progress_callback, cancel_token):
+        # All rows of a lookup value land in the same shard, so the shards can be matched independently
+        source_shards = self._shard_numbers(source_lookup_values)
+        destination_shards = self._shard_numbers(destination_lookup_values)
+
+        destination_positions = []
+        source_positions = []
+
+        with ProcessPoolExecutor(max_workers=self.num_of_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = []
+            for shard in range(self.num_of_workers):
+                shard_source_positions = np.flatnonzero(source_shards == shard)
+                shard_destination_positions = np.flatnonzero(destination_shards == shard)
+
+                futures.append(executor.submit(_match_shard,
+                                               source_lookup_values[shard_source_positions], shard_source_positions,
+                                               destination_lookup_values[shard_destination_positions],
+                                               shard_destination_positions))
+
+            try:
+                for num_of_done_shards, future in enumerate(as_completed(futures), start=1):
+                    self._check_cancelled(cancel_token)
+
+                    shard_destination_positions, shard_source_positions = future.result()
+                    destination_positions.append(shard_destination_positions)
+                    source_positions.append(shard_source_positions)
+
+                    self._update_progress_bar(progress_callback, 10 + int(num_of_done_shards / len(futures) * 80))
+
+            except JobCancelledError:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        return np.concatenate(destination_positions), np.concatenate(source_positions)
+
+    def _shard_numbers(self, lookup_values):
+        hashes = pd.util.hash_pandas_object(pd.Series(lookup_values), index=False).to_numpy()
+        return hashes % np.uint64(self.num_of_workers)
+
+    def _fill_column_hash(self):
+        return frames_hash([(self.destination.fill_column, self.destination.df[[self.destination.fill_column]])])
+
+    def _update_progress_bar(self, progress_callback, percentage):
+        # Headless runs (daemon, service) have no progress bar
+        if progress_callback is not None:
+            progress_callback.emit(percentage)
+
+    def _check_cancelled(self, cancel_token):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+    def _normalize_lookup_values(self, df, lookup_column):
         # Make sure all inputs are a string
         df[lookup_column] = df[lookup_column].astype(str)
 
-        return  df[lookup_column].unique()
-    
-    def _find_common_values(self, array1, array2):
-        return np.intersect1d(array1, array2)
-        
+        return df[lookup_column].to_numpy()
+
     def _update_values(self, df_to_be_updated, df_with_new_values):
         df_to_be_updated.update(df_with_new_values)
 
-    def _align_indeces(self, base_df, to_update_df):
-        row_diff = base_df.shape[0] - to_update_df.shape[0]
+class MultiSheetDataFiller():
+    '''
+    Fills the same columns of several destination sheets from one source sheet. The source
+    lookup values are indexed once, the sheets are written into the pooled workbook of the
+    destination, which the caller saves once.
+
+    :param destinations: list of ExcelDataManager, one per destination sheet, with a loaded df
+    '''
+    def __init__(self, source: ExcelDataManager, destinations,
+                 src_lookup_column, src_copy_column,
+                 dst_lookup_column, dst_fill_column, memory_profiler=None):
+
+        self.source = source
+        self.source.lookup_column = src_lookup_column
+        self.source.copy_column = src_copy_column
+
+        self.destinations = destinations
+        self.dst_lookup_column = dst_lookup_column
+        self.dst_fill_column = dst_fill_column
+
+        self.memory_profiler = memory_profiler if memory_profiler is not None else MemoryProfiler(enabled=False)
+
+    def fill_data(self, progress_callback=None, cancel_token=None):
+        '''
+        Returns a dict {sheet name: filled DataFrame} in the order of the sheets.
+        '''
+        try:
+            return self._fill_data(progress_callback, cancel_token)
+
+        except JobCancelledError:
+            self.source.df = None
+            for destination in self.destinations:
+                destination.df = None
+            raise
+
+    def _fill_data(self, progress_callback, cancel_token):
+        with self.memory_profiler.stage("index source"):
+            source_lookup_values = self.source.df[self.source.lookup_column].astype(str).to_numpy()
+            source_index = index_lookup_values(source_lookup_values, "source_position")
+
+        filled_dfs = {}
+        for num_of_filled_sheets, destination in enumerate(self.destinations):
+            with self.memory_profiler.stage(f"fill sheet '{destination.sheet_name}'"):
+                data_filler = DataFiller(self.source, destination,
+                                         self.source.lookup_column, self.source.copy_column,
+                                         self.dst_lookup_column, self.dst_fill_column,
+                                         source_index=source_index)
+                filled_dfs[destination.sheet_name] = data_filler.fill_data(cancel_token=cancel_token)
+
+            if progress_callback is not None:
+                progress_callback.emit(int((num_of_filled_sheets + 1) / len(self.destinations) * 100))
+
+        return filled_dfs
+
+def index_lookup_values(lookup_values, position_column):
+    '''
+    Returns the lookup values numbered by their occurrence, with their positions in the
+    position_column, the side of a match_indexed join.
+    '''
+    index_df = pd.DataFrame({"lookup": lookup_values, position_column: np.arange(len(lookup_values))})
+    index_df["occurrence"] = index_df.groupby("lookup", sort=False).cumcount()
+
+    return index_df
+
+def match_indexed(source_index, destination_lookup_values):
+    '''
+    match_positional against an index_lookup_values of the source.
+    '''
+    destination_index = index_lookup_values(destination_lookup_values, "destination_position")
+    pairs_df = destination_index.merge(source_index, on=["lookup", "occurrence"], how="inner", sort=False)
+
+    return pairs_df["destination_position"].to_numpy(), pairs_df["source_position"].to_numpy()
+
+def match_positional(source_lookup_values, destination_lookup_values):
+    '''
+    Pairs the n-th destination row of every lookup value with the n-th source row of the
+    same lookup value, rows without a counterpart stay unpaired.
 
-        if(row_diff > 0):
-            to_update_df.index = base_df.index[0:(to_update_df.shape[0])]
+    :return: (destination positions, source positions) of the pairs
+    '''
+    return match_indexed(index_lookup_values(source_lookup_values, "source_position"), destination_lookup_values)
 
-        elif(row_diff < 0):
-            to_update_df.drop(to_update_df.tail(abs(row_diff)).index, inplace=True)
-            to_update_df.index = base_df.index
+def _match_shard(source_lookup_values, source_positions, destination_lookup_values, destination_positions):
+    # Runs in a pool process, the positions are translated back to the whole sheets
+    shard_destination_positions, shard_source_positions = match_positional(source_lookup_values,
+                                                                           destination_lookup_values)
 
-        elif(base_df.shape[0] == to_update_df.shape[0]):
-            to_update_df.index = base_df.index
\ No newline at end of file
+    return destination_positions[shard_destination_positions], source_positions[shard_source_positions]
@@ -10,18 +10,69 @@ This software is distributed under the GPL v3.0 license.
 """
 
 # external module imports
-import pandas as pd
+import fnmatch
+import importlib
+
+class _LazyModule():
+    '''
+    Imports the wrapped module on first attribute access. ExcelDataManager objects are
+    created in the GUI thread, so importing pandas here would slow down the app start.
+    '''
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        return getattr(self._module, attribute)
+
+pd = _LazyModule("pandas")
+
+# A sheet name with one of these characters is a pattern of sheet names ("*", "2026-*")
+SHEET_PATTERN_CHARACTERS = "*?["
+
+def is_sheet_pattern(sheet_name):
+    return isinstance(sheet_name, str) and any(character in sheet_name for character in SHEET_PATTERN_CHARACTERS)
+
+def matching_sheet_names(sheet_names, pattern):
+    '''
+    Returns the sheet names matching the pattern in the workbook order, compared
+    case-insensitively like Excel compares sheet names.
+    '''
+    return [sheet_name for sheet_name in sheet_names
+            if fnmatch.fnmatchcase(sheet_name.lower(), pattern.lower())]
 
 class ExcelDataManager():
-    def __init__(self, file_path, sheet_name=0, column_name_row=0):
+    # Optional process wide FrameCache of parsed sheets, set by long living processes
+    frame_cache = None
+
+    def __init__(self, file_path, sheet_name=0, column_name_row=0, workbook_pool=None, use_cache=True):
         self.file_path = file_path
         self.sheet_name = sheet_name
         self.column_name_row = column_name_row
         self.df = None
 
+        # Files that live only for one request (uploads, private copies) bypass the frame cache,
+        # their entries could never be hit again and would evict the shared master data
+        self.use_cache = use_cache
+
+        # Optional WorkbookPool of the run, the file is then opened once for all its sheets
+        self.workbook_pool = workbook_pool
+
     def read_excel(self):
         try:
-            return (pd.read_excel(self.file_path, self.sheet_name, skiprows=self.column_name_row))
+            if self.frame_cache is None or not self.use_cache:
+                return self._parse_sheet()
+
+            cache_key = self.frame_cache.make_key(self.file_path, self.sheet_name, self.column_name_row)
+            df = self.frame_cache.get(cache_key)
+
+            if df is None:
+                df = self._parse_sheet()
+                self.frame_cache.put(cache_key, df)
+
+            return df
         
         except FileNotFoundError:
             print(f"File '{self.file_path}' not found.")
@@ -29,6 +80,12 @@ class ExcelDataManager():
         except Exception as e:
             print(f"An Error occured while reading the Excel file: {str(e)}")
 
+    def _parse_sheet(self):
+        if self.workbook_pool is None:
+            return (pd.read_excel(self.file_path, self.sheet_name, skiprows=self.column_name_row))
+
+        return self.workbook_pool.parse(self.file_path, self.sheet_name, skiprows=self.column_name_row)
+
     def write_excel(self, index=False):
         try:
             writer = pd.ExcelWriter(self.file_path, sheet_name=self.sheet_name, engine='openpyxl')
@@ -41,6 +98,12 @@ class ExcelDataManager():
 
     def append_to_excel(self, data, index=False, startcol=0):
         try:
+            if self.workbook_pool is not None:
+                # Written into the pooled workbook, it is saved once at the end of the run
+                self._append_to_pooled_workbook(data, index, startcol)
+                print(f"Data successfully appended to '{self.file_path}'.")
+                return
+
             with pd.ExcelWriter(self.file_path, mode='a', engine='openpyxl', if_sheet_exists="overlay") as writer:
                 data.to_excel(writer, sheet_name=self.sheet_name, index=index,
                               startrow=self.column_name_row, startcol=startcol)
@@ -49,3 +112,23 @@ class ExcelDataManager():
         except Exception as e:
             print(f"An error occured while appending to the Excel file: {str(e)}")
 
+    def _append_to_pooled_workbook(self, data, index, startcol):
+        if index:
+            data = data.reset_index()
+
+        data_df = data.to_frame() if isinstance(data, pd.Series) else data
+
+        workbook = self.workbook_pool.workbook(self.file_path)
+        if isinstance(self.sheet_name, int):
+            worksheet = workbook.worksheets[self.sheet_name]
+        else:
+            worksheet = workbook[self.sheet_name]
+
+        # Same layout as DataFrame.to_excel(startrow=column_name_row), the column titles first
+        title_row = self.column_name_row + 1
+        for column_offset, column_title in enumerate(data_df.columns):
+            column = startcol + column_offset + 1
+            worksheet.cell(row=title_row, column=column, value=column_title)
+
+            for row_offset, value in enumerate(data_df.iloc[:, column_offset].tolist()):
+                worksheet.cell(row=title_row + 1 + row_offset, column=column, value=None if pd.isna(value) else value)
@@ -0,0 +1,88 @@
+"""
+Module: FrameCache
+Description: This module provides a memory bounded LRU cache of parsed Excel sheets.
+             Entries are keyed by the file identity (path, size, modification time),
+             the sheet and the column title row, so a changed file is parsed again.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import os
+import threading
+from collections import OrderedDict
+
+def file_identity(file_path):
+    '''
+    Returns (absolute path, size, modification time in ns) of the file.
+    '''
+    stat_result = os.stat(file_path)
+    return (os.path.normcase(os.path.abspath(file_path)), stat_result.st_size, stat_result.st_mtime_ns)
+
+class FrameCache():
+    '''
+    LRU cache of DataFrames bounded by their total memory usage.
+
+    The tools modify the frames they read, so get() always hands out a copy
+    and the cached frame itself is never exposed.
+
+    :param max_bytes: Upper bound of the memory used by the cached frames
+    :type max_bytes: int
+
+    '''
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, file_path, sheet_name, column_name_row):
+        return (file_identity(file_path), sheet_name, column_name_row)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            df = entry[0]
+
+        return df.copy()
+
+    def put(self, key, df):
+        df_bytes = int(df.memory_usage(index=True, deep=True).sum())
+
+        # A frame bigger than the whole cache is not worth keeping
+        if df_bytes > self.max_bytes:
+            return
+
+        df = df.copy()
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            self._entries[key] = (df, df_bytes)
+            self.current_bytes += df_bytes
+
+            # Evict the least recently used frames until the cache fits again
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
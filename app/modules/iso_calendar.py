@@ -0,0 +1,84 @@
+"""
+Module: IsoCalendar
+Description: This module maps ISO week numbers to the Monday of the week for whole arrays
+             at once. A week number is an offset from week 1 of a base year, so week 0
+             or a negative week falls into the previous year(s) and weeks past the last
+             week of the year roll over into the next one(s), like isoweek.Week does.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+from datetime import date
+import numpy as np
+
+class IsoWeekCalendar():
+    '''
+    Precomputed table of the Mondays of all ISO weeks in a span of years.
+
+    The table grows on demand when offsets fall outside of it.
+
+    :param first_year: First ISO year of the table
+    :param last_year: Last ISO year of the table
+    '''
+    def __init__(self, first_year, last_year):
+        self._build(first_year, last_year)
+
+    def _build(self, first_year, last_year):
+        self.first_year = first_year
+        self.last_year = last_year
+
+        first_monday = np.datetime64(date.fromisocalendar(first_year, 1, 1), "D")
+        end_monday = np.datetime64(date.fromisocalendar(last_year + 1, 1, 1), "D")
+
+        # Monday of every week in the span, a week is found by its position in this array
+        self.mondays = np.arange(first_monday, end_monday, np.timedelta64(7, "D"))
+
+        # Position of week 1 of every year in the span
+        self.week_one_positions = {year: int((np.datetime64(date.fromisocalendar(year, 1, 1), "D") - first_monday)
+                                             // np.timedelta64(7, "D"))
+                                   for year in range(first_year, last_year + 1)}
+
+    def mondays_of(self, year, weeks):
+        '''
+        Returns the Mondays of the given weeks of the year as a datetime64[D] array.
+
+        :param year: ISO year the week numbers are relative to
+        :param weeks: array like of week numbers, NaN gives NaT
+        '''
+        weeks = np.asarray(weeks, dtype=float)
+        valid = np.isfinite(weeks)
+
+        self._ensure_year(year)
+        positions = np.full(weeks.shape, -1, dtype=np.int64)
+        positions[valid] = self.week_one_positions[year] + np.trunc(weeks[valid]).astype(np.int64) - 1
+
+        if valid.any():
+            self._ensure_positions(year, positions[valid].min(), positions[valid].max())
+            # The table may have been rebuilt with an earlier first year
+            positions[valid] = self.week_one_positions[year] + np.trunc(weeks[valid]).astype(np.int64) - 1
+
+        result = np.full(weeks.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+        result[valid] = self.mondays[positions[valid]]
+
+        return result
+
+    def _ensure_year(self, year):
+        if year < self.first_year or year > self.last_year:
+            self._build(min(year, self.first_year), max(year, self.last_year))
+
+    def _ensure_positions(self, year, min_position, max_position):
+        # Roughly 52 weeks per year, one extra year of margin on each side
+        first_year, last_year = self.first_year, self.last_year
+
+        if min_position < 0:
+            first_year -= int(-min_position // 52) + 1
+
+        if max_position >= self.mondays.size:
+            last_year += int((max_position - self.mondays.size) // 52) + 1
+
+        if (first_year, last_year) != (self.first_year, self.last_year):
+            self._build(first_year, last_year)
@@ -0,0 +1,221 @@
+"""
+Module: JobScheduler
+Description: This module provides a job scheduler on top of QThreadPool. Jobs are queued,
+             independent jobs run concurrently up to a configurable limit and every job
+             reports its result or exception together with its timing.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .thread_worker import ThreadWorker
+
+# external module imports
+import time
+from collections import deque
+from itertools import count
+from PyQt6.QtCore import QObject, QThreadPool, pyqtSignal
+
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+class JobResult():
+    '''
+    Outcome of a single scheduled job.
+
+    :param job_id: Identifier returned by JobScheduler.submit
+    :param name: Human readable job name
+    :param status: One of JOB_SUCCEEDED, JOB_FAILED or JOB_CANCELLED
+    :param value: Object returned by the job function (None unless succeeded)
+    :param exception: Exception raised by the job function (None unless failed)
+    :param traceback: Formatted traceback of the exception (None unless failed)
+
+    '''
+    def __init__(self, job_id, name, status, value=None, exception=None, traceback=None,
+                 queued_at=None, started_at=None, finished_at=None):
+        self.job_id = job_id
+        self.name = name
+        self.status = status
+        self.value = value
+        self.exception = exception
+        self.traceback = traceback
+        self.queued_at = queued_at
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    @property
+    def succeeded(self):
+        return self.status == JOB_SUCCEEDED
+
+    @property
+    def wait_time(self):
+        # Seconds spent in the queue before the job was started
+        if self.started_at is None:
+            return None
+        return self.started_at - self.queued_at
+
+    @property
+    def run_time(self):
+        # Seconds spent running the job
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+class Job():
+    def __init__(self, job_id, name, fn, args, kwargs, read_files, written_files):
+        self.job_id = job_id
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.read_files = frozenset(read_files)
+        self.written_files = frozenset(written_files)
+        self.worker = None
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+
+    def conflicts_with(self, other):
+        # Two jobs conflict when one of them writes a file the other one reads or writes
+        return bool((self.written_files & (other.read_files | other.written_files)) or
+                    (other.written_files & self.read_files))
+
+class JobScheduler(QObject):
+    '''
+    Queues jobs and runs them on a QThreadPool.
+
+    Jobs are started in submission order. A job is held back while it conflicts with
+    a running job or with an earlier job that is still queued, so jobs touching the same
+    files always run in the order they were submitted.
+
+    Supported signals are:
+
+    job_started
+        int job id
+
+    job_progress
+        int job id, int indicating % progress
+
+    job_finished
+        JobResult of the job, emitted for succeeded, failed and cancelled jobs
+
+    :param max_concurrent_jobs: Maximum number of jobs running at the same time
+    :type max_concurrent_jobs: int
+    :param worker_factory: Callable creating the QRunnable worker for a job, it receives
+                           the job function and its arguments like ThreadWorker does
+    :type worker_factory: function
+
+    '''
+    job_started = pyqtSignal(int)
+    job_progress = pyqtSignal(int, int)
+    job_finished = pyqtSignal(object)
+
+    def __init__(self, max_concurrent_jobs=2, worker_factory=ThreadWorker, parent=None):
+        super(JobScheduler, self).__init__(parent)
+
+        self.max_concurrent_jobs = max(1, int(max_concurrent_jobs))
+        self.worker_factory = worker_factory
+
+        self.threadpool = QThreadPool()
+        self.threadpool.setMaxThreadCount(self.max_concurrent_jobs)
+
+        self._job_ids = count(1)
+        self._queued_jobs = deque()
+        self._running_jobs = {}
+
+        # Jobs that reported their outcome but whose worker still runs its last lines, the
+        # worker and its signals object must stay referenced until it emitted finished
+        self._finishing_jobs = {}
+
+    def submit(self, fn, *args, name=None, read_files=(), written_files=(), **kwargs):
+        job = Job(next(self._job_ids), name or fn.__name__, fn, args, kwargs,
+                  read_files, written_files)
+
+        self._queued_jobs.append(job)
+        self._dispatch()
+
+        return job.job_id
+
+    def cancel(self, job_id):
+        # Queued jobs are dropped right away, running jobs are asked to stop
+        for job in self._queued_jobs:
+            if job.job_id == job_id:
+                self._queued_jobs.remove(job)
+                self.job_finished.emit(JobResult(job.job_id, job.name, JOB_CANCELLED,
+                                                 queued_at=job.queued_at))
+
+                # Later jobs may have waited only behind the cancelled one
+                self._dispatch()
+                return
+
+        if job_id in self._running_jobs:
+            self._running_jobs[job_id].worker.cancel()
+
+    def cancel_all(self):
+        for job_id in [job.job_id for job in self._queued_jobs] + list(self._running_jobs):
+            self.cancel(job_id)
+
+    def is_queued(self, job_id):
+        return any(job.job_id == job_id for job in self._queued_jobs)
+
+    def queued_job_count(self):
+        return len(self._queued_jobs)
+
+    def running_job_count(self):
+        return len(self._running_jobs)
+
+    def is_idle(self):
+        # No job is queued or running and every worker has emitted its last signal
+        return not (self._queued_jobs or self._running_jobs or self._finishing_jobs)
+
+    def _dispatch(self):
+        blocking_jobs = list(self._running_jobs.values())
+
+        for job in list(self._queued_jobs):
+            if len(self._running_jobs) >= self.max_concurrent_jobs:
+                break
+
+            if any(job.conflicts_with(other) for other in blocking_jobs):
+                # Keep the job queued and let it block later jobs touching the same files
+                blocking_jobs.append(job)
+                continue
+
+            self._queued_jobs.remove(job)
+            self._start(job)
+            blocking_jobs.append(job)
+
+    def _start(self, job):
+        job.worker = self.worker_factory(job.fn, *job.args, **job.kwargs)
+
+        job.worker.signals.progress.connect(lambda n, job_id=job.job_id: self.job_progress.emit(job_id, n))
+        job.worker.signals.result.connect(lambda value, job=job: self._job_done(job, JOB_SUCCEEDED, value=value))
+        job.worker.signals.error.connect(lambda error, job=job: self._job_done(job, JOB_FAILED, error=error))
+        job.worker.signals.cancelled.connect(lambda job=job: self._job_done(job, JOB_CANCELLED))
+        job.worker.signals.finished.connect(lambda job_id=job.job_id: self._finishing_jobs.pop(job_id, None))
+
+        job.started_at = time.perf_counter()
+        self._running_jobs[job.job_id] = job
+
+        self.job_started.emit(job.job_id)
+        self.threadpool.start(job.worker)
+
+    def _job_done(self, job, status, value=None, error=None):
+        # The slot is free, but the job is released only once its worker emitted finished
+        self._running_jobs.pop(job.job_id, None)
+        self._finishing_jobs[job.job_id] = job
+
+        exception = None
+        formatted_traceback = None
+        if error is not None:
+            exception, formatted_traceback = error[1], error[2]
+
+        self.job_finished.emit(JobResult(job.job_id, job.name, status, value=value,
+                                         exception=exception, traceback=formatted_traceback,
+                                         queued_at=job.queued_at, started_at=job.started_at,
+                                         finished_at=time.perf_counter()))
+
+        # A slot has been freed, start whatever can run now
+        self._dispatch()
@@ -0,0 +1,302 @@
+"""
+Module: Jobs
+Description: This module contains the job entry points of the tools. Each job takes
+             only plain input descriptions (ExcelDataManager objects and column names),
+             so that it can be queued and run outside of the GUI thread.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .output_files import OUTPUT_UNCHANGED_ATTRIBUTE, content_hash_path, plan_changes_path
+
+# external module imports
+import os
+import tempfile
+
+# Same defaults as WeldingPlanner, kept here so the GUI does not import the planner
+DEFAULT_OUTPUT_PATH = "output/WeldingPlan.xlsx"
+DEFAULT_SCENARIOS_OUTPUT_PATH = "output/WeldingPlanScenarios.xlsx"
+
+# Local scratch directory of the planning checkpoints
+DEFAULT_CHECKPOINT_DIRECTORY = os.path.join(tempfile.gettempdir(), "masterplanner-checkpoints")
+
+def preload_modules(progress_callback=None, cancel_token=None):
+    '''
+    Imports the tool modules (and with them pandas, numpy, isoweek and openpyxl). The tools
+    are imported lazily by the jobs, this lets the GUI warm them up in the background.
+    '''
+    import openpyxl
+    from . import data_filler, welding_planner
+
+def run_welding_planner(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                        welding_planner_excel=None, output_path=DEFAULT_OUTPUT_PATH, profile_memory=False,
+                        record_plan_history=False, num_of_workers=1, checkpoint_directory=None,
+                        progress_callback=None, cancel_token=None):
+    '''
+    Plans the welding, bi_reservations_excel may be a dict {plant: ExcelDataManager} to plan
+    several plants into one workbook, num_of_workers processes plan the plants.
+
+    With a checkpoint_directory a single plant run checkpoints its progress there and a failed
+    run started again with the same inputs resumes from its last checkpoint.
+    '''
+    from .capacity_scheduler import CapacityScheduler
+    from .memory_profiler import MemoryProfiler
+    from .plan_history import PlanHistory
+    from .schema_validator import validate_welding_planner_inputs
+    from .welding_planner import WeldingPlanner
+    from .workbook_pool import WorkbookPool
+
+    memory_profiler = MemoryProfiler(enabled=profile_memory)
+    memory_profiler.start()
+
+    plan_history = None
+
+    # Inputs kept as sheets of one workbook are parsed once. The previous plan is not pooled,
+    # it is usually the output file which is overwritten while the pool is still open.
+    input_excels = (*_plant_excels(bi_reservations_excel), manufacturing_plan_excel, batch_database_excel)
+
+    try:
+        # Refuse wrong inputs before minutes of parsing, only the column titles are read
+        with memory_profiler.stage("validate inputs"):
+            validate_welding_planner_inputs(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                                            welding_planner_excel)
+
+        if record_plan_history:
+            plan_history = PlanHistory(plan_history_path(output_path))
+
+        with WorkbookPool() as workbook_pool:
+            for input_excel in input_excels:
+                input_excel.workbook_pool = workbook_pool
+
+            welding_planner_instance = WeldingPlanner(welding_planner_excel, output_path=output_path,
+                                                      memory_profiler=memory_profiler,
+                                                      capacity_scheduler=CapacityScheduler.load(),
+                                                      plan_history=plan_history,
+                                                      checkpoint_directory=checkpoint_directory)
+
+            return welding_planner_instance.plan_welding(bi_reservations_excel, manufacturing_plan_excel,
+                                                         batch_database_excel, progress_callback=progress_callback,
+                                                         cancel_token=cancel_token, num_of_workers=num_of_workers)
+    finally:
+        for input_excel in input_excels:
+            input_excel.workbook_pool = None
+
+        # The report is written next to the output, also for failed runs
+        memory_profiler.stop()
+        memory_profiler.write_report(memory_report_path(output_path))
+
+        if plan_history is not None:
+            plan_history.close()
+
+def run_welding_scenarios(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel, scenarios_path,
+                          welding_planner_excel=None, output_path=DEFAULT_SCENARIOS_OUTPUT_PATH, num_of_workers=1,
+                          profile_memory=False, progress_callback=None, cancel_token=None):
+    '''
+    Plans the welding for every scenario of the scenarios file into one workbook. The plans
+    are what-if runs, they are not recorded in the plan history.
+    '''
+    from .capacity_scheduler import CapacityScheduler
+    from .memory_profiler import MemoryProfiler
+    from .planning_scenario import load_scenarios
+    from .schema_validator import validate_welding_planner_inputs
+    from .welding_planner import WeldingPlanner
+    from .workbook_pool import WorkbookPool
+
+    scenarios = load_scenarios(scenarios_path)
+
+    memory_profiler = MemoryProfiler(enabled=profile_memory)
+    memory_profiler.start()
+
+    input_excels = (bi_reservations_excel, manufacturing_plan_excel, batch_database_excel)
+
+    try:
+        with memory_profiler.stage("validate inputs"):
+            validate_welding_planner_inputs(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                                            welding_planner_excel)
+
+        with WorkbookPool() as workbook_pool:
+            for input_excel in input_excels:
+                input_excel.workbook_pool = workbook_pool
+
+            welding_planner_instance = WeldingPlanner(welding_planner_excel, output_path=output_path,
+                                                      memory_profiler=memory_profiler,
+                                                      capacity_scheduler=CapacityScheduler.load())
+
+            return welding_planner_instance.plan_scenarios(bi_reservations_excel, manufacturing_plan_excel,
+                                                           batch_database_excel, scenarios,
+                                                           num_of_workers=num_of_workers,
+                                                           progress_callback=progress_callback,
+                                                           cancel_token=cancel_token)
+    finally:
+        for input_excel in input_excels:
+            input_excel.workbook_pool = None
+
+        memory_profiler.stop()
+        memory_profiler.write_report(memory_report_path(output_path))
+
+def run_data_filler(src_excel, dst_excel, src_lookup_column, src_copy_column,
+                    dst_lookup_column, dst_fill_column, profile_memory=False, streaming=False,
+                    num_of_workers=1, progress_callback=None, cancel_token=None):
+    '''
+    Fills the destination sheet, or every sheet matching a destination sheet name pattern
+    ("*", "2026-*"), in place. Returns the filled DataFrame, a dict {sheet name: DataFrame}
+    for a pattern, or the number of filled cells of a streaming fill.
+    '''
+    from .data_filler import DataFiller
+    from .excel_data_manager import is_sheet_pattern
+    from .memory_profiler import MemoryProfiler
+    from .schema_validator import validate_data_filler_inputs
+    from .streaming_data_filler import StreamingDataFiller
+    from .workbook_pool import WorkbookPool
+
+    memory_profiler = MemoryProfiler(enabled=profile_memory)
+    memory_profiler.start()
+
+    try:
+        if is_sheet_pattern(dst_excel.sheet_name):
+            if streaming:
+                raise ValueError("A pattern of destination sheets cannot be filled by streaming, "
+                                 "name a single sheet.")
+
+            return _fill_sheets(src_excel, dst_excel, src_lookup_column, src_copy_column,
+                                dst_lookup_column, dst_fill_column, memory_profiler, progress_callback, cancel_token)
+
+        with memory_profiler.stage("validate inputs"):
+            validate_data_filler_inputs(src_excel, dst_excel, src_lookup_column, src_copy_column,
+                                        dst_lookup_column, dst_fill_column)
+
+        if streaming:
+            # The destination is never loaded as a whole, returns the number of filled cells
+            data_filler_instance = StreamingDataFiller(src_excel, dst_excel,
+                                                       src_lookup_column, src_copy_column,
+                                                       dst_lookup_column, dst_fill_column,
+                                                       memory_profiler=memory_profiler)
+
+            return data_filler_instance.fill_data(progress_callback=progress_callback, cancel_token=cancel_token)
+
+        # Source and destination are often sheets of one workbook, it is opened only once
+        with WorkbookPool(writable_paths=[dst_excel.file_path]) as workbook_pool:
+            src_excel.workbook_pool = workbook_pool
+            dst_excel.workbook_pool = workbook_pool
+
+            with memory_profiler.stage("read source"):
+                src_excel.df = src_excel.read_excel()
+
+            with memory_profiler.stage("read destination"):
+                dst_excel.df = dst_excel.read_excel()
+
+            data_filler_instance = DataFiller(src_excel, dst_excel,
+                                              src_lookup_column, src_copy_column,
+                                              dst_lookup_column, dst_fill_column,
+                                              memory_profiler=memory_profiler,
+                                              num_of_workers=num_of_workers)
+
+            dst_df = data_filler_instance.fill_data(progress_callback=progress_callback, cancel_token=cancel_token)
+
+            with memory_profiler.stage("save destination"):
+                workbook_pool.save()
+
+        return dst_df
+    finally:
+        src_excel.workbook_pool = None
+        dst_excel.workbook_pool = None
+
+        memory_profiler.stop()
+        memory_profiler.write_report(memory_report_path(dst_excel.file_path))
+
+def _fill_sheets(src_excel, dst_excel, src_lookup_column, src_copy_column, dst_lookup_column, dst_fill_column,
+                 memory_profiler, progress_callback, cancel_token):
+    from .data_filler import MultiSheetDataFiller
+    from .excel_data_manager import ExcelDataManager, matching_sheet_names
+    from .schema_validator import validate_data_filler_inputs
+    from .workbook_pool import WorkbookPool
+
+    # The destination workbook is parsed and saved once for all its sheets
+    with WorkbookPool(writable_paths=[dst_excel.file_path]) as workbook_pool:
+        src_excel.workbook_pool = workbook_pool
+
+        sheet_names = workbook_pool.excel_file(dst_excel.file_path).sheet_names
+        dst_excels = [ExcelDataManager(dst_excel.file_path, sheet_name, dst_excel.column_name_row, workbook_pool,
+                                       use_cache=dst_excel.use_cache)
+                      for sheet_name in matching_sheet_names(sheet_names, dst_excel.sheet_name)
+                      if not _is_same_sheet(src_excel, dst_excel.file_path, sheet_name, sheet_names)]
+
+        if len(dst_excels) == 0:
+            raise ValueError(f"No sheet of '{dst_excel.file_path}' matches '{dst_excel.sheet_name}', "
+                             f"the sheets are: {', '.join(sheet_names)}.")
+
+        with memory_profiler.stage("validate inputs"):
+            for sheet_excel in dst_excels:
+                validate_data_filler_inputs(src_excel, sheet_excel, src_lookup_column, src_copy_column,
+                                            dst_lookup_column, dst_fill_column)
+
+        with memory_profiler.stage("read source"):
+            src_excel.df = src_excel.read_excel()
+
+        with memory_profiler.stage("read destination"):
+            for sheet_excel in dst_excels:
+                sheet_excel.df = sheet_excel.read_excel()
+
+        data_filler_instance = MultiSheetDataFiller(src_excel, dst_excels,
+                                                    src_lookup_column, src_copy_column,
+                                                    dst_lookup_column, dst_fill_column,
+                                                    memory_profiler=memory_profiler)
+
+        filled_dfs = data_filler_instance.fill_data(progress_callback=progress_callback, cancel_token=cancel_token)
+
+        with memory_profiler.stage("save destination"):
+            workbook_pool.save()
+
+    return filled_dfs
+
+def _is_same_sheet(src_excel, file_path, sheet_name, sheet_names):
+    # A source sheet in the destination workbook is never filled by a pattern
+    if _normalize_paths({src_excel.file_path}) != _normalize_paths({file_path}):
+        return False
+
+    src_sheet_name = sheet_names[src_excel.sheet_name] if isinstance(src_excel.sheet_name, int) else src_excel.sheet_name
+    return src_sheet_name.lower() == sheet_name.lower()
+
+def memory_report_path(output_path):
+    # WeldingPlan.xlsx -> WeldingPlan_memory_report.txt
+    return os.path.splitext(output_path)[0] + "_memory_report.txt"
+
+def plan_history_path(output_path):
+    # The history lives next to the plan it records
+    return os.path.join(os.path.dirname(output_path), "plan_history.sqlite")
+
+def welding_planner_job_files(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                              welding_planner_excel=None, output_path=DEFAULT_OUTPUT_PATH):
+    '''
+    Returns the (read, written) file sets of a welding planner job, used by the scheduler
+    to decide which jobs may run concurrently.
+    '''
+    read_files = {manufacturing_plan_excel.file_path, batch_database_excel.file_path}
+    read_files.update(plant_excel.file_path for plant_excel in _plant_excels(bi_reservations_excel))
+    written_files = {output_path, plan_history_path(output_path), content_hash_path(output_path)}
+
+    if welding_planner_excel is not None:
+        read_files.add(welding_planner_excel.file_path)
+        written_files.add(plan_changes_path(output_path))
+
+    return (_normalize_paths(read_files), _normalize_paths(written_files))
+
+def data_filler_job_files(src_excel, dst_excel):
+    '''
+    Returns the (read, written) file sets of a data filler job.
+    '''
+    return (_normalize_paths({src_excel.file_path}), _normalize_paths({dst_excel.file_path}))
+
+def _plant_excels(bi_reservations_excel):
+    # The BI reservations of a single plant or of every plant of a multi-plant run
+    if isinstance(bi_reservations_excel, dict):
+        return tuple(bi_reservations_excel.values())
+
+    return (bi_reservations_excel,)
+
+def _normalize_paths(paths):
+    return {os.path.normcase(os.path.abspath(path)) for path in paths}
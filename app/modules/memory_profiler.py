@@ -0,0 +1,313 @@
+"""
+Module: MemoryProfiler
+Description: This module provides an opt-in memory profiler for the tools. It records the
+             peak and retained memory of every pipeline stage with tracemalloc, samples
+             the resident set size (RSS) of the process in the background and lists the
+             call sites whose memory grew the most during every stage.
+
+             tracemalloc is process-wide. Profilers of jobs running at the same time share
+             it: it is started by the first and stopped by the last of them, and the peak of
+             the stages of all of them is kept before it is reset. Their allocations cannot
+             be told apart, stages that overlapped another profiled job are marked as such.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import ctypes
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+
+# Allocations of the profiler itself and of the import machinery are not listed
+IGNORED_CALL_SITE_FILES = frozenset((__file__, tracemalloc.__file__, "<frozen importlib._bootstrap>",
+                                     "<frozen importlib._bootstrap_external>"))
+
+# tracemalloc is shared by the profilers running at the same time (jobs of the thread pool)
+_tracing_lock = threading.RLock()
+_active_profilers = []
+_started_tracemalloc = False
+
+def current_rss():
+    '''
+    Returns the resident set size of this process in bytes, None if it is not available.
+    '''
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    if sys.platform == "win32":
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+        process_handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process_handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+
+    return None
+
+class CallSite():
+    def __init__(self, filename, lineno, size_diff, count_diff):
+        self.filename = filename
+        self.lineno = lineno
+        self.size_diff = size_diff
+        self.count_diff = count_diff
+
+class StageRecord():
+    def __init__(self, name):
+        self.name = name
+        self.duration = 0.0
+        self.traced_start = 0
+        self.traced_peak = 0
+        self.traced_end = 0
+        self.rss_start = None
+        self.rss_peak = None
+        self.rss_end = None
+        self.top_call_sites = []
+        self.overlapped = False
+
+    @property
+    def retained(self):
+        # Memory allocated in the stage and still alive at its end
+        return self.traced_end - self.traced_start
+
+class MemoryProfiler():
+    '''
+    Records memory usage per pipeline stage.
+
+    Usage:
+        profiler.start()
+        with profiler.stage("read inputs"):
+            ...
+        profiler.stop()
+        profiler.write_report(path)
+
+    A disabled profiler does nothing, so the tools can always call stage().
+
+    :param enabled: Record anything at all
+    :param sample_interval: Seconds between RSS samples
+    :param num_of_call_sites: Number of top allocating call sites of every stage in the report
+    :param traceback_depth: Frames stored by tracemalloc for every allocation, the report
+                            lists the allocating line (the most recent frame) only
+
+    '''
+    def __init__(self, enabled=True, sample_interval=0.05, num_of_call_sites=5, traceback_depth=1):
+        self.enabled = enabled
+        self.sample_interval = sample_interval
+        self.num_of_call_sites = num_of_call_sites
+        self.traceback_depth = traceback_depth
+
+        self.stages = []
+        self.started_at = None
+        self.total_duration = 0.0
+
+        self._open_stages = []
+        self._rss_peak = None
+        self._sampler_thread = None
+        self._stop_sampling = threading.Event()
+
+    def start(self):
+        global _started_tracemalloc
+
+        if not self.enabled:
+            return
+
+        with _tracing_lock:
+            if not _active_profilers and not tracemalloc.is_tracing():
+                tracemalloc.start(self.traceback_depth)
+                _started_tracemalloc = True
+
+            # The stages running now will see the allocations of this job as well
+            for profiler in _active_profilers:
+                for record in profiler._open_stages:
+                    record.overlapped = True
+
+            _active_profilers.append(self)
+
+        self.started_at = time.perf_counter()
+        self._rss_peak = current_rss()
+
+        if self._rss_peak is not None:
+            self._stop_sampling.clear()
+            self._sampler_thread = threading.Thread(target=self._sample_rss, daemon=True)
+            self._sampler_thread.start()
+
+    def stop(self):
+        global _started_tracemalloc
+
+        if not self.enabled or self.started_at is None:
+            return
+
+        self.total_duration = time.perf_counter() - self.started_at
+
+        with _tracing_lock:
+            _active_profilers.remove(self)
+
+            # The last profiler stops tracing, unless it was running before the first one started
+            if not _active_profilers and _started_tracemalloc:
+                tracemalloc.stop()
+                _started_tracemalloc = False
+
+        if self._sampler_thread is not None:
+            self._stop_sampling.set()
+            self._sampler_thread.join()
+            self._sampler_thread = None
+
+        self.started_at = None
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled or self.started_at is None:
+            yield
+            return
+
+        record = StageRecord(name)
+        record.traced_start = tracemalloc.get_traced_memory()[0]
+        record.rss_start = current_rss()
+
+        # The snapshot itself is not traced, it does not change the numbers of the stage
+        start_snapshot = tracemalloc.take_snapshot()
+
+        with _tracing_lock:
+            # The peak counter is shared, fold it into the open stages before resetting it
+            _fold_peak_into_active_profilers()
+            tracemalloc.reset_peak()
+            record.overlapped = len(_active_profilers) > 1
+
+        self._rss_peak = record.rss_start
+        self._open_stages.append(record)
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            record.duration = time.perf_counter() - start_time
+
+            with _tracing_lock:
+                _fold_peak_into_active_profilers()
+                record.overlapped = record.overlapped or len(_active_profilers) > 1
+
+            self._open_stages.pop()
+
+            record.traced_end = tracemalloc.get_traced_memory()[0]
+            record.rss_end = current_rss()
+            if record.rss_peak is not None and record.rss_end is not None:
+                record.rss_peak = max(record.rss_peak, record.rss_end)
+
+            record.top_call_sites = self._grown_call_sites(start_snapshot)
+            start_snapshot = None
+
+            with _tracing_lock:
+                # Comparing the snapshots allocates, that is not a peak of the enclosing stages
+                _fold_peak_into_active_profilers(excluded_profiler=self)
+                tracemalloc.reset_peak()
+
+            self.stages.append(record)
+
+    def _grown_call_sites(self, start_snapshot):
+        # The lines whose memory grew the most between the start and the end of the stage,
+        # compare_to() groups the blocks of both snapshots by their allocating line
+        call_sites = []
+        for statistic_diff in tracemalloc.take_snapshot().compare_to(start_snapshot, "lineno"):
+            frame = statistic_diff.traceback[0]
+            if statistic_diff.size_diff > 0 and frame.filename not in IGNORED_CALL_SITE_FILES:
+                call_sites.append(CallSite(frame.filename, frame.lineno,
+                                           statistic_diff.size_diff, statistic_diff.count_diff))
+
+            # compare_to() sorts by the absolute size difference, the growing lines come biggest first
+            if len(call_sites) == self.num_of_call_sites:
+                break
+
+        return call_sites
+
+    def _fold_peak_into_open_stages(self, traced_peak):
+        rss_peak = self._rss_peak
+
+        for record in self._open_stages:
+            record.traced_peak = max(record.traced_peak, traced_peak)
+            if rss_peak is not None:
+                record.rss_peak = rss_peak if record.rss_peak is None else max(record.rss_peak, rss_peak)
+
+    def _sample_rss(self):
+        while not self._stop_sampling.wait(self.sample_interval):
+            rss = current_rss()
+            if rss is not None and (self._rss_peak is None or rss > self._rss_peak):
+                self._rss_peak = rss
+
+    def report(self):
+        lines = [f"MasterPlanner memory report, {datetime.now():%Y-%m-%d %H:%M:%S}",
+                 f"Total duration: {self.total_duration:.2f} s",
+                 "",
+                 f"{'STAGE':<32}{'TIME [s]':>10}{'PEAK [MB]':>12}{'RETAINED [MB]':>15}"
+                 f"{'RSS START [MB]':>16}{'RSS PEAK [MB]':>15}{'RSS END [MB]':>14}"]
+
+        for record in self.stages:
+            lines.append(f"{record.name + (' *' if record.overlapped else ''):<32}{record.duration:>10.2f}"
+                         f"{(record.traced_peak - record.traced_start) / MB:>12.1f}"
+                         f"{record.retained / MB:>15.1f}"
+                         f"{self._format_rss(record.rss_start):>16}{self._format_rss(record.rss_peak):>15}"
+                         f"{self._format_rss(record.rss_end):>14}")
+
+        lines += ["",
+                  "PEAK is the highest traced Python/NumPy memory during the stage above its start,",
+                  "RETAINED is the traced memory allocated by the stage and still alive at its end."]
+
+        if any(record.overlapped for record in self.stages):
+            lines.append("* Another profiled job ran during the stage, its allocations are included.")
+
+        for record in self.stages:
+            lines += ["", f"Top {len(record.top_call_sites)} call sites grown during '{record.name}':"]
+
+            for call_site in record.top_call_sites:
+                lines.append(f"{call_site.size_diff / MB:>+10.1f} MB {call_site.count_diff:>+10} blocks  "
+                             f"{call_site.filename}:{call_site.lineno}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path):
+        '''
+        Writes the report next to the output. Called also for failed runs, so a report that
+        cannot be written is only logged, it must not replace the error of the run.
+        '''
+        if not self.enabled:
+            return
+
+        try:
+            with open(path, "w", encoding="utf-8") as report_file:
+                report_file.write(self.report())
+        except OSError as e:
+            print(f"The memory report could not be written to '{path}': {e}")
+
+    def _format_rss(self, rss):
+        return "n/a" if rss is None else f"{rss / MB:.1f}"
+
+def _fold_peak_into_active_profilers(excluded_profiler=None):
+    # Called with _tracing_lock held, right before the shared peak counter is reset
+    traced_peak = tracemalloc.get_traced_memory()[1]
+
+    for profiler in _active_profilers:
+        if profiler is not excluded_profiler:
+            profiler._fold_peak_into_open_stages(traced_peak)
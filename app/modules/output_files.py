@@ -0,0 +1,25 @@
+"""
+Module: OutputFiles
+Description: This module names the files written next to the output of a tool and the
+             flags a tool sets on its result. It imports nothing heavy, so the tools, the
+             job entry points and the GUI can all use it.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import os
+
+# Set in DataFrame.attrs of a job result whose output already had the same content and was not rewritten
+OUTPUT_UNCHANGED_ATTRIBUTE = "output_unchanged"
+
+def plan_changes_path(output_path):
+    # WeldingPlan.xlsx -> WeldingPlan_changes.csv, written in update mode
+    return os.path.splitext(output_path)[0] + "_changes.csv"
+
+def content_hash_path(output_path):
+    # WeldingPlan.xlsx -> WeldingPlan_content_hash.json, the hash of the written content
+    return os.path.splitext(output_path)[0] + "_content_hash.json"
@@ -0,0 +1,138 @@
+"""
+Module: PlanDiff
+Description: This module compares two welding plans. The planned batches (not in production)
+             are matched in two hash joins: first the batches of a material with the same
+             dates, then the remaining batches of a material in the order of their dates
+             (the n-th remaining batch of the previous plan with the n-th remaining batch
+             of the new plan). Batches without a counterpart were added or removed, matched
+             batches with other dates were re-dated, with another count of pieces re-sized.
+             The batches of a multi-plant plan are matched within their PLANT.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import numpy as np
+import pandas as pd
+
+CHANGE_ADDED = "added"
+CHANGE_REMOVED = "removed"
+CHANGE_REDATED = "re-dated"
+CHANGE_RESIZED = "re-sized"
+
+# Batches of a material with the same dates, numbered by OCCURRENCE
+DATE_KEY_COLUMNS = ["KEY", "READY FOR PICKING", "WELDING COMPLETED", "OCCURRENCE"]
+
+CHANGES_COLUMNS = ["MATERIAL NUMBER", "NAME", "BATCH", "CHANGE",
+                   "PREVIOUS PIECES", "PIECES IN BATCH",
+                   "PREVIOUS READY FOR PICKING", "READY FOR PICKING",
+                   "PREVIOUS WELDING COMPLETED", "WELDING COMPLETED",
+                   "SHIFT IN WEEKS"]
+
+def diff_welding_plans(previous_plan_df, welding_plan_df):
+    '''
+    Returns the changed batches of the new plan against the previous one, one row per
+    added, removed, re-dated or re-sized batch, sorted by material and batch number.
+
+    :param previous_plan_df: Rows of the previous "Welding Plan" sheet
+    :param welding_plan_df: Rows of the new "Welding Plan" sheet
+    '''
+    plant_columns = ["PLANT"] if "PLANT" in welding_plan_df.columns else []
+
+    previous_batches_df = _planned_batches(previous_plan_df)
+    batches_df = _planned_batches(welding_plan_df)
+
+    # Batches that kept their dates, the n-th of the same material and dates on both sides
+    same_dates_df = previous_batches_df.merge(batches_df, on=DATE_KEY_COLUMNS, how="inner", sort=False,
+                                              suffixes=(" PREVIOUS", ""))
+    same_dates_df["_merge"] = "both"
+
+    # The rest is matched in the order of the dates, a removed or added batch does not shift the others
+    previous_rest_df = _number_by_material(previous_batches_df[~previous_batches_df["ROW"].isin(same_dates_df["ROW PREVIOUS"])])
+    rest_df = _number_by_material(batches_df[~batches_df["ROW"].isin(same_dates_df["ROW"])])
+    moved_df = previous_rest_df.merge(rest_df, on=["KEY", "REST"], how="outer", sort=False,
+                                      suffixes=(" PREVIOUS", ""), indicator=True)
+
+    for column in ("READY FOR PICKING", "WELDING COMPLETED"):
+        same_dates_df[f"{column} PREVIOUS"] = same_dates_df[column]
+
+    # Empty parts are left out, they would turn the date columns to objects
+    merged_df = pd.concat([df for df in (same_dates_df, moved_df) if df.shape[0] > 0] or [moved_df],
+                          ignore_index=True)
+
+    previous_ready = merged_df["READY FOR PICKING PREVIOUS"]
+    previous_completed = merged_df["WELDING COMPLETED PREVIOUS"]
+    redated = ~(_same_values(previous_ready, merged_df["READY FOR PICKING"]) &
+                _same_values(previous_completed, merged_df["WELDING COMPLETED"]))
+    resized = ~_same_values(merged_df["PIECES IN BATCH PREVIOUS"], merged_df["PIECES IN BATCH"])
+
+    side = merged_df["_merge"].astype(str).values
+    change = np.select([side == "left_only", side == "right_only", redated.values, resized.values],
+                       [CHANGE_REMOVED, CHANGE_ADDED, CHANGE_REDATED, CHANGE_RESIZED], default="")
+
+    changes_df = pd.DataFrame({
+        "KEY": merged_df["KEY"],
+        "PLANT": _first_valid(merged_df["PLANT"], merged_df["PLANT PREVIOUS"]),
+        "MATERIAL NUMBER": _first_valid(merged_df["MATERIAL NUMBER"], merged_df["MATERIAL NUMBER PREVIOUS"]),
+        "NAME": _first_valid(merged_df["NAME"], merged_df["NAME PREVIOUS"]),
+        "BATCH": _first_valid(merged_df["BATCH"], merged_df["BATCH PREVIOUS"]).astype("int64"),
+        "CHANGE": change,
+        "PREVIOUS PIECES": merged_df["PIECES IN BATCH PREVIOUS"],
+        "PIECES IN BATCH": merged_df["PIECES IN BATCH"],
+        "PREVIOUS READY FOR PICKING": previous_ready,
+        "READY FOR PICKING": merged_df["READY FOR PICKING"],
+        "PREVIOUS WELDING COMPLETED": previous_completed,
+        "WELDING COMPLETED": merged_df["WELDING COMPLETED"],
+        "SHIFT IN WEEKS": (merged_df["WELDING COMPLETED"] - previous_completed).dt.days / 7})
+
+    changes_df = changes_df[changes_df["CHANGE"].values != ""]
+    changes_df = changes_df.sort_values(["KEY", "BATCH"], kind="stable")
+
+    return changes_df[plant_columns + CHANGES_COLUMNS].reset_index(drop=True)
+
+def _planned_batches(welding_plan_df):
+    in_production = pd.to_numeric(welding_plan_df["BATCH IN PRODUCTION"], errors="coerce").fillna(0).values
+    planned_df = welding_plan_df[in_production == 0]
+
+    batches_df = pd.DataFrame({"PLANT": _column(planned_df, "PLANT"),
+                               "MATERIAL NUMBER": planned_df["MATERIAL NUMBER"].values,
+                               "NAME": _column(planned_df, "NAME"),
+                               "PIECES IN BATCH": pd.to_numeric(_column(planned_df, "PIECES IN BATCH"), errors="coerce"),
+                               "READY FOR PICKING": pd.to_datetime(_column(planned_df, "READY FOR PICKING"), errors="coerce"),
+                               "WELDING COMPLETED": pd.to_datetime(_column(planned_df, "WELDING COMPLETED"), errors="coerce")})
+
+    # Material numbers read back from a workbook may differ in type, the join compares their text
+    batches_df["KEY"] = batches_df["MATERIAL NUMBER"].astype(str)
+    if "PLANT" in welding_plan_df.columns:
+        batches_df["KEY"] = batches_df["PLANT"].astype(str) + " / " + batches_df["KEY"]
+
+    # The batches of a material are numbered in the order they are welded
+    batches_df = batches_df.sort_values(["KEY", "READY FOR PICKING", "WELDING COMPLETED"], kind="stable")
+    batches_df["BATCH"] = batches_df.groupby("KEY", sort=False).cumcount() + 1
+    batches_df["OCCURRENCE"] = batches_df.groupby(DATE_KEY_COLUMNS[:-1], sort=False, dropna=False).cumcount()
+    batches_df["ROW"] = np.arange(batches_df.shape[0])
+
+    return batches_df
+
+def _number_by_material(batches_df):
+    batches_df = batches_df.copy()
+    batches_df["REST"] = batches_df.groupby("KEY", sort=False).cumcount()
+    return batches_df
+
+def _column(df, column):
+    # Older plans may lack a column, it is compared as empty
+    if column in df.columns:
+        return df[column].values
+
+    return np.full(df.shape[0], None, dtype=object)
+
+def _first_valid(values, previous_values):
+    # The value of the new plan, of the previous plan for removed batches
+    return values.where(values.notna(), previous_values)
+
+def _same_values(previous_values, values):
+    # Empty on both sides counts as the same
+    return (previous_values == values) | (previous_values.isna() & values.isna())
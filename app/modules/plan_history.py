@@ -0,0 +1,300 @@
+"""
+Module: PlanHistory
+Description: This module stores every welding plan in a local SQLite database. Each run
+             gets a run ID and all of its batches are kept with their in-production
+             count, indexed by material number. Update mode takes the in-production
+             batches of the last run from here instead of parsing the previous
+             WeldingPlan.xlsx again, and the history of a material can be queried
+             without opening old workbooks.
+
+             The in-production counts are entered by the users in the written workbook.
+             The workbook identity is stored with the run, when the workbook was edited
+             since, its batches are imported into the run once before they are used.
+             Columns the users added to the plan are kept with every batch as JSON and
+             come back after the planner's own columns, in the order they had.
+
+             A run whose output was left unchanged (same content as the last written
+             plan) is not recorded again, its last run already holds the same batches.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .frame_cache import file_identity
+
+# external module imports
+import json
+import os
+import sqlite3
+from datetime import datetime
+import pandas as pd
+
+# The material column has no type affinity, numeric material numbers stay numbers
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at      TEXT NOT NULL,
+    output_path     TEXT NOT NULL,
+    output_size     INTEGER,
+    output_mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS batches (
+    run_id            INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    position          INTEGER NOT NULL,
+    material          NOT NULL,
+    name              TEXT,
+    pieces            INTEGER,
+    ready_for_picking TEXT,
+    welding_completed TEXT,
+    welding_week      TEXT,
+    in_production     INTEGER NOT NULL DEFAULT 0,
+    plant             TEXT,
+    extra             TEXT,
+    PRIMARY KEY (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS batches_by_material ON batches(material, run_id);
+CREATE INDEX IF NOT EXISTS batches_in_production ON batches(run_id) WHERE in_production > 0;
+CREATE INDEX IF NOT EXISTS runs_by_output ON runs(output_path, run_id);
+"""
+
+# Welding plan column -> batches column
+COLUMNS = {"MATERIAL NUMBER": "material",
+           "NAME": "name",
+           "PIECES IN BATCH": "pieces",
+           "READY FOR PICKING": "ready_for_picking",
+           "WELDING COMPLETED": "welding_completed",
+           "WELDING WEEK": "welding_week",
+           "BATCH IN PRODUCTION": "in_production",
+           "PLANT": "plant"}
+DATE_COLUMNS = ("READY FOR PICKING", "WELDING COMPLETED", "WELDING WEEK")
+
+# Columns added to the batches table after its first version, with their types
+ADDED_FIELDS = {"plant": "TEXT", "extra": "TEXT"}
+
+class PlanHistory():
+    '''
+    SQLite store of the welding plan runs.
+
+    Usage:
+        with PlanHistory(path) as plan_history:
+            plan_history.record_run(welding_plan_df, output_path)
+
+    :param path: Database file, created when it does not exist
+
+    '''
+    def __init__(self, path):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+        self._upgrade_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _upgrade_schema(self):
+        # Older databases have no plant (multi-plant plans) or extra (user columns) column
+        batches_fields = [row[1] for row in self._connection.execute("PRAGMA table_info(batches)")]
+        for field, field_type in ADDED_FIELDS.items():
+            if field not in batches_fields:
+                with self._connection:
+                    self._connection.execute(f"ALTER TABLE batches ADD COLUMN {field} {field_type}")
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def record_run(self, welding_plan_df, output_path):
+        '''
+        Stores the batches of a written welding plan, returns the run ID.
+        '''
+        identity = file_identity(output_path)
+
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (created_at, output_path, output_size, output_mtime_ns) VALUES (?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec="seconds"),) + identity)
+            run_id = cursor.lastrowid
+            self._insert_batches(run_id, welding_plan_df)
+
+        return run_id
+
+    def latest_run(self, output_path=None):
+        '''
+        Returns the last run (of the workbook output_path) as a dict, None when there is none.
+        '''
+        if output_path is None:
+            row = self._connection.execute("SELECT * FROM runs ORDER BY run_id DESC LIMIT 1").fetchone()
+        else:
+            row = self._connection.execute("SELECT * FROM runs WHERE output_path = ? ORDER BY run_id DESC LIMIT 1",
+                                           (os.path.normcase(os.path.abspath(output_path)),)).fetchone()
+
+        if row is None:
+            return None
+
+        return dict(zip(("run_id", "created_at", "output_path", "output_size", "output_mtime_ns"), row))
+
+    def is_recorded(self, output_path):
+        '''
+        True when the last run of the workbook output_path matches the file as it is now.
+        '''
+        run = self.latest_run(output_path)
+        if run is None or not os.path.exists(output_path):
+            return False
+
+        return file_identity(output_path)[1:] == (run["output_size"], run["output_mtime_ns"])
+
+    def in_production(self, welding_planner_excel):
+        '''
+        Returns the in-production batches of the last run written to the workbook, as the
+        rows of the "Welding Plan" sheet. None when the workbook was not recorded.
+
+        :param welding_planner_excel: ExcelDataManager of the previous WeldingPlan.xlsx
+        '''
+        return self._latest_batches(welding_planner_excel, "AND batches.in_production > 0")
+
+    def latest_plan(self, welding_planner_excel):
+        '''
+        Returns all batches of the last run written to the workbook, None when the workbook
+        was not recorded.
+        '''
+        return self._latest_batches(welding_planner_excel, "")
+
+    def _latest_batches(self, welding_planner_excel, condition):
+        if not os.path.exists(welding_planner_excel.file_path):
+            return None
+
+        run = self.latest_run(welding_planner_excel.file_path)
+        if run is None:
+            return None
+
+        if not self.is_recorded(welding_planner_excel.file_path):
+            self._import_workbook(run["run_id"], welding_planner_excel)
+
+        return self._query_batches(f"WHERE batches.run_id = ? {condition} ORDER BY batches.position",
+                                   (run["run_id"],))
+
+    def material_history(self, material, since=None):
+        '''
+        Returns all batches of the material in the runs since the given datetime, with the
+        RUN ID and RUN CREATED AT columns, the oldest run first.
+        '''
+        if since is None:
+            return self._query_batches("WHERE batches.material = ? ORDER BY batches.run_id, batches.position",
+                                       (material,), with_runs=True)
+
+        return self._query_batches("WHERE batches.material = ? AND runs.created_at >= ? "
+                                   "ORDER BY batches.run_id, batches.position",
+                                   (material, since.isoformat(timespec="seconds")), with_runs=True)
+
+    def _import_workbook(self, run_id, welding_planner_excel):
+        # The users edited the workbook, its batches replace the recorded ones
+        welding_plan_df = welding_planner_excel.read_excel()
+        if welding_plan_df is None:
+            # read_excel reported why, the batches recorded with the run are used as they are
+            print(f"The edits of '{welding_planner_excel.file_path}' could not be imported into run {run_id}, "
+                  "its recorded batches are used.")
+            return
+
+        identity = file_identity(welding_planner_excel.file_path)
+
+        with self._connection:
+            self._connection.execute("DELETE FROM batches WHERE run_id = ?", (run_id,))
+            self._insert_batches(run_id, welding_plan_df)
+            self._connection.execute("UPDATE runs SET output_size = ?, output_mtime_ns = ? WHERE run_id = ?",
+                                     identity[1:] + (run_id,))
+
+    def _insert_batches(self, run_id, welding_plan_df):
+        num_of_rows = welding_plan_df.shape[0]
+        values = {"run_id": [run_id] * num_of_rows, "position": range(num_of_rows)}
+
+        for column, field in COLUMNS.items():
+            if column not in welding_plan_df.columns:
+                values[field] = [None] * num_of_rows
+            elif column in DATE_COLUMNS:
+                dates = pd.to_datetime(welding_plan_df[column], errors="coerce")
+                values[field] = [None if pd.isna(value) else value for value in dates.dt.strftime("%Y-%m-%d")]
+            elif field in ("pieces", "in_production"):
+                numbers = pd.to_numeric(welding_plan_df[column], errors="coerce").fillna(0).astype("int64")
+                values[field] = numbers.tolist()
+            else:
+                values[field] = [None if pd.isna(value) else value for value in welding_plan_df[column].tolist()]
+
+        # Columns of the users, e.g. notes added to the batches in production
+        extra_columns = [column for column in welding_plan_df.columns if column not in COLUMNS]
+        values["extra"] = _encode_extra(welding_plan_df[extra_columns]) if extra_columns else [None] * num_of_rows
+
+        fields = list(values.keys())
+        self._connection.executemany(f"INSERT INTO batches ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                                     zip(*values.values()))
+
+    def _query_batches(self, condition, parameters, with_runs=False):
+        fields = ", ".join(f"batches.{field}" for field in list(COLUMNS.values()) + ["extra"])
+        if with_runs:
+            query = f"SELECT batches.run_id, runs.created_at, {fields} FROM batches JOIN runs USING (run_id) {condition}"
+            columns = ["RUN ID", "RUN CREATED AT"] + list(COLUMNS.keys()) + ["extra"]
+        else:
+            query = f"SELECT {fields} FROM batches {condition}"
+            columns = list(COLUMNS.keys()) + ["extra"]
+
+        history_df = pd.DataFrame(self._connection.execute(query, parameters).fetchall(), columns=columns)
+        history_df = pd.concat([history_df.drop(columns="extra"), _decode_extra(history_df["extra"])], axis=1)
+
+        for column in DATE_COLUMNS:
+            history_df[column] = pd.to_datetime(history_df[column])
+
+        # Plans written without the capacity scheduler have no WELDING WEEK column,
+        # single plant plans no PLANT column
+        for column in ("WELDING WEEK", "PLANT"):
+            if history_df[column].isna().all():
+                history_df = history_df.drop(columns=column)
+
+        return history_df
+
+def _encode_extra(extra_df):
+    '''
+    Returns the JSON object of the filled extra columns of every row, None for rows without any.
+    '''
+    records = []
+    for row in extra_df.itertuples(index=False, name=None):
+        extra = {str(column): _json_value(value) for column, value in zip(extra_df.columns, row) if not pd.isna(value)}
+        records.append(json.dumps(extra) if extra else None)
+
+    return records
+
+def _json_value(value):
+    # Dates are tagged, they are read back as dates and not as texts
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return {"date": pd.Timestamp(value).isoformat()}
+
+    if hasattr(value, "item"):
+        # numpy scalars
+        return value.item()
+
+    return value if isinstance(value, (str, int, float, bool)) else str(value)
+
+def _decode_extra(extra_values):
+    '''
+    Returns the extra columns of the rows as a DataFrame, columns in the order they first appear.
+    '''
+    rows = [{} if extra is None else json.loads(extra) for extra in extra_values]
+    extra_df = pd.DataFrame(rows, index=extra_values.index)
+
+    for column in extra_df.columns:
+        values = extra_df[column]
+        if values.map(lambda value: isinstance(value, dict)).any():
+            extra_df[column] = pd.to_datetime(values.map(lambda value: value["date"] if isinstance(value, dict) else None))
+
+    return extra_df
@@ -0,0 +1,96 @@
+"""
+Module: PlanningRules
+Description: This module holds the business rules deciding which BI reservations take part
+             in the welding planning. The rules are read from a JSON configuration, the
+             project codes are templates parameterized by the planning year, so the
+             configuration does not have to be edited every year. The rules are compiled
+             into a single vectorized eligibility mask per run.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import json
+import os
+from datetime import date
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "config", "planning_rules.json")
+
+class PlanningRules():
+    '''
+    Eligibility rules of the BI reservations.
+
+    Project code templates may use {year}, {previous_year} and {next_year}.
+
+    :param year: Planning year, the current year when None
+    :param excluded_projects: Templates of "_IB_KOKS" project codes that are never planned
+    :param stock_projects: Templates of stock project codes, they are always kept (also
+                           duplicated reservations) and have no manufacturing plan deadline
+    :param excluded_order_patterns: Regular expressions, reservations whose "CIS_OBJ" order
+                                    number matches any of them are not planned
+    :param excluded_order_numbers: "CIS_OBJ" values that are not planned (e.g. 0 for no order)
+
+    '''
+    def __init__(self, year=None, excluded_projects=("S{year}",),
+                 stock_projects=("M{previous_year}", "M{year}"),
+                 excluded_order_patterns=("^.K",), excluded_order_numbers=(0,)):
+        self.year = year if year is not None else date.today().year
+        self.excluded_project_templates = list(excluded_projects)
+        self.stock_project_templates = list(stock_projects)
+        self.excluded_order_patterns = list(excluded_order_patterns)
+        self.excluded_order_numbers = list(excluded_order_numbers)
+
+    @classmethod
+    def load(cls, path=DEFAULT_RULES_PATH, year=None):
+        '''
+        Reads the rules from a JSON file, the defaults are used when the file does not exist.
+        '''
+        if not os.path.exists(path):
+            return cls(year=year)
+
+        with open(path, encoding="utf-8") as rules_file:
+            config = json.load(rules_file)
+
+        return cls(year=year if year is not None else config.get("year"),
+                   excluded_projects=config.get("excluded_projects", ("S{year}",)),
+                   stock_projects=config.get("stock_projects", ("M{previous_year}", "M{year}")),
+                   excluded_order_patterns=config.get("excluded_order_patterns", ("^.K",)),
+                   excluded_order_numbers=config.get("excluded_order_numbers", (0,)))
+
+    @property
+    def excluded_projects(self):
+        return self._expand(self.excluded_project_templates)
+
+    @property
+    def stock_projects(self):
+        return self._expand(self.stock_project_templates)
+
+    def _expand(self, templates):
+        return [template.format(year=self.year, previous_year=self.year - 1, next_year=self.year + 1)
+                for template in templates]
+
+    def eligibility_mask(self, reservations_df):
+        '''
+        Returns a boolean array marking the reservations that take part in the planning.
+        '''
+        project_codes = reservations_df["_IB_KOKS"]
+        order_numbers = reservations_df["CIS_OBJ"]
+
+        mask = ~project_codes.isin(self.excluded_projects).to_numpy()
+        mask &= ~order_numbers.isin(self.excluded_order_numbers).to_numpy()
+
+        if self.excluded_order_patterns:
+            # One combined expression, evaluated only on the text order numbers
+            combined_pattern = "|".join(f"(?:{pattern})" for pattern in self.excluded_order_patterns)
+            is_text = order_numbers.map(type).eq(str).to_numpy()
+            matches = order_numbers[is_text].str.contains(combined_pattern, regex=True).to_numpy(dtype=bool)
+
+            excluded_by_pattern = is_text.copy()
+            excluded_by_pattern[is_text] = matches
+            mask &= ~excluded_by_pattern
+
+        return mask
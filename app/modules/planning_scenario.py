@@ -0,0 +1,90 @@
+"""
+Module: PlanningScenario
+Description: This module holds the parameters of a welding plan that are a matter of
+             judgement rather than of the input data: the lead times between the welding
+             and the project deadline, batch size overrides and the safety stock kept in
+             the inventory. A what-if run evaluates several scenarios on one preprocessing
+             pass of the inputs, see WeldingPlanner.plan_scenarios.
+
+             Example of a scenarios file (config/scenarios.example.json):
+                 {"scenarios": [
+                     {"name": "Base"},
+                     {"name": "Conservative", "material_picking_weeks": 3, "safety_stock": 10},
+                     {"name": "Aggressive", "assembly_weeks": 0, "batch_sizes": {"MX000001": 20}}
+                 ]}
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import json
+import re
+
+# Characters Excel does not allow in sheet names
+INVALID_SHEET_NAME_CHARACTERS = re.compile(r"[\[\]:*?/\\]")
+
+class PlanningScenario():
+    '''
+    Parameters of one welding plan.
+
+    :param name: Name of the scenario, also the name of its sheet
+    :param material_picking_weeks: Weeks between READY FOR PICKING and the assembly
+    :param assembly_weeks: Weeks of the assembly before the project deadline
+    :param material_delivery_weeks: Weeks the material has to be delivered before WELDING COMPLETED,
+                                    None leaves the MATERIAL DELIVERY column out
+    :param batch_sizes: dict {material number: batch size} replacing the batch database sizes
+    :param safety_stock: Pieces of every material kept in the inventory, a number or a dict
+                         {material number: pieces}
+
+    '''
+    def __init__(self, name="Base", material_picking_weeks=2, assembly_weeks=1, material_delivery_weeks=None,
+                 batch_sizes=None, safety_stock=0):
+        self.name = name
+        self.material_picking_weeks = material_picking_weeks
+        self.assembly_weeks = assembly_weeks
+        self.material_delivery_weeks = material_delivery_weeks
+        self.batch_sizes = batch_sizes if batch_sizes is not None else {}
+        self.safety_stock = safety_stock
+
+    @classmethod
+    def from_config(cls, config):
+        unknown_keys = set(config) - {"name", "material_picking_weeks", "assembly_weeks", "material_delivery_weeks",
+                                      "batch_sizes", "safety_stock"}
+        if unknown_keys:
+            raise ValueError(f"Unknown scenario parameters: {', '.join(sorted(unknown_keys))}.")
+
+        return cls(**config)
+
+    @property
+    def sheet_name(self):
+        return INVALID_SHEET_NAME_CHARACTERS.sub("_", str(self.name))[:31]
+
+    def batch_size_of(self, mx, batch_size):
+        return int(self.batch_sizes.get(mx, batch_size))
+
+    def safety_stock_of(self, mx):
+        if isinstance(self.safety_stock, dict):
+            return int(self.safety_stock.get(mx, 0))
+
+        return int(self.safety_stock)
+
+def load_scenarios(path):
+    '''
+    Reads a list of scenarios from a JSON file.
+    '''
+    with open(path, encoding="utf-8") as scenarios_file:
+        config = json.load(scenarios_file)
+
+    scenarios = [PlanningScenario.from_config(scenario_config) for scenario_config in config.get("scenarios", [])]
+
+    if len(scenarios) == 0:
+        raise ValueError(f"No scenarios in '{path}'.")
+
+    sheet_names = [scenario.sheet_name.lower() for scenario in scenarios]
+    if len(set(sheet_names)) != len(sheet_names) or "comparison" in sheet_names:
+        raise ValueError("Scenario names have to be unique (as sheet names) and must not be 'Comparison'.")
+
+    return scenarios
@@ -0,0 +1,313 @@
+"""
+Module: PlanningService
+Description: This module provides a local HTTP/JSON service wrapping the welding planner
+             and the data filler. Master data (batch database, manufacturing plan) stays
+             parsed in a FrameCache between requests and the requests are served
+             concurrently by a bounded pool of worker threads.
+
+             Endpoints:
+                 GET  /health   service and cache status
+                 POST /plan     runs WeldingPlanner, returns the plan as JSON records
+                                and optionally the WeldingPlan.xlsx workbook
+                 POST /fill     runs DataFiller on a copy of the destination and returns
+                                the filled workbook
+
+             An input file is given either as {"path": ...} (read where it is, cached by
+             its identity) or as {"content_base64": ...} (an uploaded workbook, read
+             without the cache as it is deleted with the request), plus
+             optional "sheet_name" and "column_title_row" (1-based) keys. A /plan
+             request may carry its own "capacity" configuration, the format of
+             config/welding_capacity.json, and may plan several plants at once with
+             "plants": {plant: file description} in place of "bi_reservations".
+             Inputs without the expected columns are answered with 400 before they
+             are parsed.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .capacity_scheduler import CapacityScheduler
+from .excel_data_manager import ExcelDataManager
+from .frame_cache import FrameCache
+from .schema_validator import SchemaValidationError, validate_data_filler_inputs, validate_welding_planner_inputs
+from .workbook_pool import WorkbookPool
+
+# external module imports
+import base64
+import json
+import os
+import shutil
+import tempfile
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+class BadRequestError(ValueError):
+    '''
+    Raised for requests that are missing or have malformed fields.
+    '''
+    pass
+
+class PooledHTTPServer(HTTPServer):
+    '''
+    HTTPServer handing every connection to a bounded thread pool.
+    '''
+    def __init__(self, server_address, request_handler_class, max_workers):
+        super(PooledHTTPServer, self).__init__(server_address, request_handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="planning-service")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request_in_pool, request, client_address)
+
+    def _process_request_in_pool(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super(PooledHTTPServer, self).server_close()
+        self.executor.shutdown(wait=True)
+
+class PlanningService():
+    '''
+    Local planning service.
+
+    :param host: Interface to bind, localhost by default
+    :param port: Port to bind, 0 picks a free port (see server_address)
+    :param max_workers: Number of requests processed at the same time
+    :param max_cache_bytes: Memory the parsed master data may use
+
+    '''
+    def __init__(self, host="127.0.0.1", port=8765, max_workers=4, max_cache_bytes=1024 * 1024 * 1024):
+        self.frame_cache = FrameCache(max_bytes=max_cache_bytes)
+        self.http_server = PooledHTTPServer((host, port), self._make_request_handler(), max_workers)
+
+    @property
+    def server_address(self):
+        return self.http_server.server_address
+
+    def serve_forever(self):
+        ExcelDataManager.frame_cache = self.frame_cache
+
+        # Import the data stack before the first request arrives
+        from .jobs import preload_modules
+        preload_modules()
+
+        try:
+            self.http_server.serve_forever()
+        finally:
+            self.http_server.server_close()
+            ExcelDataManager.frame_cache = None
+
+    def shutdown(self):
+        # Has to be called from another thread than serve_forever
+        self.http_server.shutdown()
+
+    def health(self):
+        return {"status": "ok",
+                "cached_sheets": len(self.frame_cache),
+                "cached_bytes": self.frame_cache.current_bytes,
+                "cache_hits": self.frame_cache.hits,
+                "cache_misses": self.frame_cache.misses}
+
+    def plan(self, request):
+        from .welding_planner import WeldingPlanner
+
+        with tempfile.TemporaryDirectory(prefix="masterplanner-") as work_directory:
+            if request.get("plants") is not None:
+                bi_reservations_excel = self._plant_excel_data_managers(request, work_directory)
+            else:
+                bi_reservations_excel = self._excel_data_manager(request, "bi_reservations", work_directory)
+            manufacturing_plan_excel = self._excel_data_manager(request, "manufacturing_plan", work_directory)
+            batch_database_excel = self._excel_data_manager(request, "batch_database", work_directory,
+                                                            default_column_title_row=2)
+
+            if request.get("welding_plan") is not None:
+                welding_planner_excel = self._excel_data_manager(request, "welding_plan", work_directory,
+                                                                 default_sheet_name="Welding Plan")
+            else:
+                welding_planner_excel = None
+
+            validate_welding_planner_inputs(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                                            welding_planner_excel)
+
+            output_path = os.path.join(work_directory, "WeldingPlan.xlsx")
+            welding_planner_instance = WeldingPlanner(welding_planner_excel, output_path=output_path,
+                                                      capacity_scheduler=self._capacity_scheduler(request))
+            welding_plan_df = welding_planner_instance.plan_welding(bi_reservations_excel,
+                                                                    manufacturing_plan_excel,
+                                                                    batch_database_excel)
+
+            response = {"batches": json.loads(welding_plan_df.to_json(orient="records", date_format="iso")),
+                        "batch_database_missing_parts": [self._missing_part(part) for part in
+                                                         welding_planner_instance.batch_database_missing_parts]}
+
+            if request.get("return_workbook", False):
+                response["workbook_base64"] = self._read_base64(output_path)
+
+        return response
+
+    def fill(self, request):
+        from .data_filler import DataFiller
+
+        columns = {}
+        for key in ("src_lookup_column", "src_copy_column", "dst_lookup_column", "dst_fill_column"):
+            if not request.get(key):
+                raise BadRequestError(f"Missing '{key}'.")
+            columns[key] = request[key]
+
+        with tempfile.TemporaryDirectory(prefix="masterplanner-") as work_directory:
+            src_excel = self._excel_data_manager(request, "source", work_directory, require_sheet_name=True)
+
+            # The filler writes into the destination, always work on a private copy
+            dst_excel = self._excel_data_manager(request, "destination", work_directory,
+                                                 require_sheet_name=True, private_copy=True)
+
+            validate_data_filler_inputs(src_excel, dst_excel, columns["src_lookup_column"], columns["src_copy_column"],
+                                        columns["dst_lookup_column"], columns["dst_fill_column"])
+
+            with WorkbookPool(writable_paths=[dst_excel.file_path]) as workbook_pool:
+                src_excel.workbook_pool = workbook_pool
+                dst_excel.workbook_pool = workbook_pool
+
+                src_excel.df = src_excel.read_excel()
+                dst_excel.df = dst_excel.read_excel()
+
+                data_filler_instance = DataFiller(src_excel, dst_excel,
+                                                  columns["src_lookup_column"], columns["src_copy_column"],
+                                                  columns["dst_lookup_column"], columns["dst_fill_column"])
+                data_filler_instance.fill_data()
+
+            return {"workbook_base64": self._read_base64(dst_excel.file_path)}
+
+    def _plant_excel_data_managers(self, request, work_directory):
+        if not isinstance(request["plants"], dict) or len(request["plants"]) == 0:
+            raise BadRequestError("'plants' has to be a non-empty JSON object {plant: file description}.")
+
+        # Every plant is read as a request key of its own, the uploads get distinct file names
+        plant_requests = {f"plant_{position}": file_request
+                          for position, file_request in enumerate(request["plants"].values())}
+
+        return {plant: self._excel_data_manager(plant_requests, key, work_directory)
+                for plant, key in zip(request["plants"], plant_requests)}
+
+    def _missing_part(self, part):
+        # The missing parts of a multi-plant plan are (plant, material number)
+        if isinstance(part, tuple):
+            return [str(value) for value in part]
+
+        return str(part)
+
+    def _capacity_scheduler(self, request):
+        if request.get("capacity") is None:
+            return CapacityScheduler.load()
+
+        if not isinstance(request["capacity"], dict):
+            raise BadRequestError("'capacity' has to be a JSON object.")
+
+        try:
+            return CapacityScheduler.from_config(request["capacity"])
+        except ValueError as e:
+            raise BadRequestError(f"Invalid 'capacity': {e}")
+
+    def _excel_data_manager(self, request, key, work_directory, default_sheet_name=0,
+                            default_column_title_row=1, require_sheet_name=False, private_copy=False):
+        file_request = request.get(key)
+        if not isinstance(file_request, dict):
+            raise BadRequestError(f"Missing '{key}' file description.")
+
+        if require_sheet_name and "sheet_name" not in file_request:
+            raise BadRequestError(f"Missing '{key}.sheet_name'.")
+
+        # Uploads and private copies are deleted with the work directory, caching them would
+        # only evict the master data, so only files owned by the caller go through the cache
+        use_cache = False
+
+        if "content_base64" in file_request:
+            file_path = os.path.join(work_directory, f"{key}.xlsx")
+            try:
+                content = base64.b64decode(file_request["content_base64"], validate=True)
+            except ValueError:
+                raise BadRequestError(f"'{key}.content_base64' is not valid base64.")
+
+            with open(file_path, "wb") as upload_file:
+                upload_file.write(content)
+
+        elif "path" in file_request:
+            file_path = file_request["path"]
+            if not os.path.isfile(file_path):
+                raise BadRequestError(f"'{key}.path' does not exist: {file_path}")
+
+            use_cache = not private_copy
+            if private_copy:
+                copy_path = os.path.join(work_directory, f"{key}.xlsx")
+                shutil.copyfile(file_path, copy_path)
+                file_path = copy_path
+
+        else:
+            raise BadRequestError(f"'{key}' needs either 'path' or 'content_base64'.")
+
+        try:
+            column_title_row = int(file_request.get("column_title_row", default_column_title_row))
+        except (TypeError, ValueError):
+            raise BadRequestError(f"'{key}.column_title_row' has to be an integer.")
+
+        return ExcelDataManager(file_path,
+                                sheet_name=file_request.get("sheet_name", default_sheet_name),
+                                column_name_row=column_title_row - 1,
+                                use_cache=use_cache)
+
+    def _read_base64(self, file_path):
+        with open(file_path, "rb") as result_file:
+            return base64.b64encode(result_file.read()).decode("ascii")
+
+    def _make_request_handler(self):
+        service = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/health":
+                    self._send_json(200, service.health())
+                else:
+                    self._send_json(404, {"error": f"Unknown endpoint '{self.path}'."})
+
+            def do_POST(self):
+                endpoints = {"/plan": service.plan, "/fill": service.fill}
+
+                if self.path not in endpoints:
+                    self._send_json(404, {"error": f"Unknown endpoint '{self.path}'."})
+                    return
+
+                try:
+                    content_length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(content_length) or b"{}")
+                    if not isinstance(request, dict):
+                        raise BadRequestError("The request body has to be a JSON object.")
+
+                    self._send_json(200, endpoints[self.path](request))
+
+                except (BadRequestError, SchemaValidationError, json.JSONDecodeError) as e:
+                    self._send_json(400, {"error": str(e)})
+
+                except Exception as e:
+                    self._send_json(500, {"error": f"{type(e).__name__}: {e}",
+                                          "traceback": traceback.format_exc()})
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                print(f"{self.address_string()} - {format % args}", flush=True)
+
+        return RequestHandler
@@ -0,0 +1,149 @@
+"""
+Module: ProcessWorker
+Description: This module allows long processes to run in a separate process. The job
+             runs outside of the GUI process (and its GIL), progress and the result or
+             error are streamed back over a queue and re-emitted as WorkerSignals, so the
+             worker is a drop-in replacement for ThreadWorker.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .cancellation import CancellationToken, JobCancelledError
+from .thread_worker import WorkerSignals
+
+# external module imports
+import multiprocessing
+import pickle
+import queue
+import traceback
+from PyQt6.QtCore import QRunnable, pyqtSlot
+
+# Seconds between checks of the worker process while waiting for messages
+POLL_INTERVAL = 0.1
+
+class _QueueProgressEmitter():
+    '''
+    Stands in for the progress pyqtSignal inside the worker process.
+    Only changed values are sent to keep the queue traffic low.
+    '''
+    def __init__(self, message_queue):
+        self.message_queue = message_queue
+        self.last_value = None
+
+    def emit(self, value):
+        if value != self.last_value:
+            self.last_value = value
+            self.message_queue.put(("progress", value))
+
+def _picklable_exception(exception):
+    try:
+        pickle.dumps(exception)
+        return exception
+    except Exception:
+        return RuntimeError(f"{type(exception).__name__}: {exception}")
+
+def run_job(fn, args, kwargs, message_queue, cancel_event):
+    # Runs a job inside a worker process and reports the outcome over the queue
+    kwargs['progress_callback'] = _QueueProgressEmitter(message_queue)
+    kwargs['cancel_token'] = CancellationToken(cancel_event)
+
+    try:
+        # Pickle here so an unpicklable result is reported as an error of the job
+        pickled_result = pickle.dumps(fn(*args, **kwargs))
+    except JobCancelledError:
+        message_queue.put(("cancelled", None))
+    except Exception as e:
+        message_queue.put(("error", (type(e), _picklable_exception(e), traceback.format_exc())))
+    else:
+        message_queue.put(("result", pickled_result))
+
+def relay_messages(signals, process, message_queue):
+    '''
+    Re-emits the messages of a job running in the given process as WorkerSignals,
+    returns once the job has reported its result, error or cancellation.
+    '''
+    while True:
+        try:
+            message, payload = message_queue.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            if process.is_alive():
+                continue
+
+            try:
+                # The last message may still be in the pipe when the process exits
+                message, payload = message_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                # The process died without reporting back (e.g. killed or crashed)
+                error = RuntimeError(f"Worker process exited unexpectedly with code {process.exitcode}.")
+                signals.error.emit((RuntimeError, error, repr(error)))
+                return
+
+        if message == "progress":
+            signals.progress.emit(payload)
+
+        elif message == "result":
+            signals.result.emit(pickle.loads(payload))
+            return
+
+        elif message == "error":
+            signals.error.emit(payload)
+            return
+
+        elif message == "cancelled":
+            signals.cancelled.emit()
+            return
+
+class ProcessWorker(QRunnable):
+    '''
+    Worker process
+
+    Inherits from QRunnable, the pool thread only starts the worker process and relays
+    its messages, the callback itself runs in the worker process.
+
+    :param callback: The function callback to run in the worker process. It has to be
+                     picklable (a module level function) as do args and kwargs.
+    :type callback: function
+    :param args: Arguments to pass to the callback function
+    :param kwargs: Keywords to pass to the callback function
+
+    '''
+    def __init__(self, fn, *args, **kwargs):
+        super(ProcessWorker, self).__init__()
+
+        # Store constructor arguments (re-used for processing)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+        # Spawn gives the same behaviour on every platform and does not fork the Qt state
+        self.context = multiprocessing.get_context("spawn")
+        self.cancel_event = self.context.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @pyqtSlot()
+    def run(self):
+        message_queue = self.context.Queue()
+        process = self.context.Process(target=run_job,
+                                       args=(self.fn, self.args, self.kwargs, message_queue, self.cancel_event),
+                                       daemon=True)
+        try:
+            process.start()
+            relay_messages(self.signals, process, message_queue)
+        except Exception as e:
+            # emit error, the worker process could not be started or talked to
+            self.signals.error.emit((type(e), e, traceback.format_exc()))
+        finally:
+            if process.pid is not None:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+            # emit the finished signal once the process has finished
+            self.signals.finished.emit()
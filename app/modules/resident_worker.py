@@ -0,0 +1,153 @@
+"""
+Module: ResidentWorker
+Description: This module provides a resident worker process. It is spawned when the app
+             starts, imports the data stack right away and keeps recently parsed input
+             sheets in a bounded FrameCache, so later jobs neither pay for the imports
+             nor for parsing unchanged workbooks again.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .process_worker import run_job, relay_messages
+from .thread_worker import WorkerSignals
+
+# external module imports
+import gc
+import multiprocessing
+import threading
+import traceback
+from PyQt6.QtCore import QRunnable, pyqtSlot
+
+def _resident_main(request_queue, message_queue, cancel_event, max_cache_bytes):
+    # Entry point of the resident process, warm up first and then serve jobs one by one
+    from .excel_data_manager import ExcelDataManager
+    from .frame_cache import FrameCache
+    from .jobs import preload_modules
+
+    preload_modules()
+    ExcelDataManager.frame_cache = FrameCache(max_bytes=max_cache_bytes)
+
+    while True:
+        request = request_queue.get()
+
+        # None is the shutdown request
+        if request is None:
+            break
+
+        fn, args, kwargs = request
+        run_job(fn, args, kwargs, message_queue, cancel_event)
+
+        # Give the memory of the finished job back before waiting for the next one
+        del request, fn, args, kwargs
+        gc.collect()
+
+class ResidentWorkerProcess():
+    '''
+    Owns the resident process and runs jobs in it, one job at a time.
+
+    :param max_cache_bytes: Upper bound of the memory used by cached input sheets
+    :type max_cache_bytes: int
+
+    '''
+    def __init__(self, max_cache_bytes=512 * 1024 * 1024):
+        self.max_cache_bytes = max_cache_bytes
+        self.context = multiprocessing.get_context("spawn")
+        self.process = None
+        self.request_queue = None
+        self.message_queue = None
+        self.cancel_event = self.context.Event()
+
+        # The process serves a single job at a time, workers wait for their turn here
+        self.job_lock = threading.Lock()
+
+    def start(self):
+        if self.process is not None and self.process.is_alive():
+            return
+
+        self.request_queue = self.context.Queue()
+        self.message_queue = self.context.Queue()
+        self.process = self.context.Process(target=_resident_main,
+                                            args=(self.request_queue, self.message_queue,
+                                                  self.cancel_event, self.max_cache_bytes),
+                                            daemon=True)
+        self.process.start()
+
+    def shutdown(self, timeout=5):
+        if self.process is None:
+            return
+
+        # Stop a running job and ask the process to leave its loop
+        self.cancel_event.set()
+
+        if self.process.is_alive():
+            self.request_queue.put(None)
+            self.process.join(timeout=timeout)
+
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=timeout)
+
+        self.process = None
+
+    def create_worker(self, fn, *args, **kwargs):
+        # Worker factory for the JobScheduler
+        return ResidentWorker(self, fn, *args, **kwargs)
+
+class ResidentWorker(QRunnable):
+    '''
+    Worker running its callback in the resident process
+
+    Has the same interface as ThreadWorker and ProcessWorker, the callback and its
+    arguments have to be picklable.
+
+    :param resident_process: The ResidentWorkerProcess to run the callback in
+    :type resident_process: ResidentWorkerProcess
+
+    '''
+    def __init__(self, resident_process, fn, *args, **kwargs):
+        super(ResidentWorker, self).__init__()
+
+        # Store constructor arguments (re-used for processing)
+        self.resident_process = resident_process
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.cancel_requested = False
+        self.running = False
+
+    def cancel(self):
+        self.cancel_requested = True
+
+        # The event is shared by all jobs, only the job holding the process may set it
+        if self.running:
+            self.resident_process.cancel_event.set()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            with self.resident_process.job_lock:
+                self.resident_process.cancel_event.clear()
+                self.running = True
+
+                # Cancelled while waiting for the process, let the job stop at its first check
+                if self.cancel_requested:
+                    self.resident_process.cancel_event.set()
+
+                # Restart the process if it died (e.g. it was killed by the system)
+                self.resident_process.start()
+                self.resident_process.request_queue.put((self.fn, self.args, self.kwargs))
+                try:
+                    relay_messages(self.signals, self.resident_process.process, self.resident_process.message_queue)
+                finally:
+                    self.running = False
+        except Exception as e:
+            # emit error, the resident process could not be talked to
+            self.signals.error.emit((type(e), e, traceback.format_exc()))
+        finally:
+            # emit the finished signal once the job has finished
+            self.signals.finished.emit()
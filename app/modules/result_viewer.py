@@ -0,0 +1,279 @@
+"""
+Module: ResultViewer
+Description: This module shows the DataFrame returned by a job in a table window. The
+             table model reads the cells straight from the column arrays of the DataFrame
+             and the view asks only for the visible rows, so a plan with hundreds of
+             thousands of batches opens instantly and nothing is copied into Qt items.
+
+             Sorting and filtering never move the data, they replace the array of row
+             positions shown by the view. The sort order of a column and the distinct
+             values of a filtered column are computed on first use and kept, filtering
+             compares the distinct values only and maps them back to the rows.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import numpy as np
+import pandas as pd
+from PyQt6 import QtWidgets
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer
+
+# Columns offered for the material filter, the first one present is preselected
+MATERIAL_COLUMNS = ("MATERIAL NUMBER",)
+
+# Date columns whose ISO week is filtered, the first one present is used
+WEEK_COLUMNS = ("WELDING WEEK", "WELDING COMPLETED", "READY FOR PICKING")
+
+# Rows measured when the column widths are fitted to the contents
+RESIZE_PRECISION_ROWS = 100
+
+# Delay after the last keystroke before the filter is applied
+FILTER_DELAY_MS = 200
+
+class DataFrameTableModel(QAbstractTableModel):
+    '''
+    Read-only table model over the columns of a DataFrame.
+
+    :param df: DataFrame shown by the model, it must not be changed while the model is used
+    '''
+    def __init__(self, df, parent=None):
+        super(DataFrameTableModel, self).__init__(parent)
+
+        self.column_names = [str(column) for column in df.columns]
+        self._values = [df.iloc[:, position].to_numpy() for position in range(df.shape[1])]
+        self._num_of_rows = df.shape[0]
+
+        # Positions of the shown rows in the DataFrame, in the order they are shown
+        self._rows = np.arange(self._num_of_rows)
+
+        self._sort_key = None
+        self._filters = {}
+        self._sort_orders = {}
+        self._factorized = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows.size
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._values)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return format_value(self._values[index.column()][self._rows[index.row()]])
+
+        if role == Qt.ItemDataRole.TextAlignmentRole and self._values[index.column()].dtype.kind in "iuf":
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        if orientation == Qt.Orientation.Horizontal:
+            return self.column_names[section]
+
+        # Rows keep the number they have in the DataFrame (and in the sheet without the title row)
+        return str(int(self._rows[section]) + 1)
+
+    @property
+    def total_row_count(self):
+        return self._num_of_rows
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        # Column -1 restores the order of the DataFrame
+        self._sort_key = (column, order) if column >= 0 else None
+        self._update_rows()
+
+    def set_filter(self, column_name, text, week=False):
+        '''
+        Shows only the rows whose value in the column contains the text (case-insensitive).
+        An empty text removes the filter of the column.
+
+        :param week: Match the ISO week ("2026-W05") of the dates instead of the values
+        '''
+        text = text.strip().lower()
+
+        # The values and the weeks of a date column are separate filters
+        if text == "":
+            self._filters.pop((column_name, week), None)
+        else:
+            self._filters[(column_name, week)] = text
+
+        self._update_rows()
+
+    def _update_rows(self):
+        mask = None
+        for (column_name, week), text in self._filters.items():
+            codes, uniques = self._factorize(self.column_names.index(column_name), week)
+
+            # Only the distinct values are compared, the codes map the matches to the rows
+            matched = np.append(pd.Index(uniques).str.contains(text, regex=False), False)
+            column_mask = matched[codes]
+            mask = column_mask if mask is None else mask & column_mask
+
+        if self._sort_key is None:
+            rows = np.arange(self._num_of_rows)
+        else:
+            rows = self._sort_order(*self._sort_key)
+
+        if mask is not None:
+            rows = rows[mask[rows]]
+
+        self.layoutAboutToBeChanged.emit()
+        self._rows = rows
+        self.layoutChanged.emit()
+
+    def _sort_order(self, column, order):
+        if (column, order) not in self._sort_orders:
+            values = pd.Series(self._values[column])
+            ascending = order == Qt.SortOrder.AscendingOrder
+
+            try:
+                sorted_values = values.sort_values(ascending=ascending, kind="stable", na_position="last")
+            except TypeError:
+                # Mixed types (numbers and texts) are sorted as texts
+                sorted_values = values.where(values.isna(), values.astype(str)).sort_values(
+                    ascending=ascending, kind="stable", na_position="last")
+
+            self._sort_orders[(column, order)] = sorted_values.index.to_numpy()
+
+        return self._sort_orders[(column, order)]
+
+    def _factorize(self, column, week):
+        if (column, week) not in self._factorized:
+            values = iso_week_keys(self._values[column]) if week else self._values[column]
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+
+            # Only the distinct values are formatted, the sentinel -1 of the missing values
+            # indexes the appended False of the matches, they never match
+            self._factorized[(column, week)] = (codes, [format_value(unique).lower() for unique in uniques])
+
+        return self._factorized[(column, week)]
+
+def format_value(value):
+    '''
+    Returns the text of a cell as the viewer shows it.
+    '''
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+
+    if isinstance(value, (np.datetime64, pd.Timestamp)):
+        value = pd.Timestamp(value)
+        return value.strftime("%Y-%m-%d") if value == value.normalize() else value.strftime("%Y-%m-%d %H:%M")
+
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+
+    return str(value)
+
+def iso_week_keys(values):
+    '''
+    Returns the ISO weeks ("2026-W05") of an array of dates, None for missing dates.
+    '''
+    # A plan has a few hundred distinct dates, only those are converted
+    codes, dates = pd.factorize(pd.to_datetime(values, errors="coerce"), use_na_sentinel=True)
+    iso_calendar = pd.DatetimeIndex(dates).isocalendar()
+
+    date_keys = [f"{year}-W{week:02d}" for year, week in zip(iso_calendar["year"], iso_calendar["week"])]
+    keys = np.append(np.array(date_keys, dtype=object), None)
+
+    return keys[codes]
+
+def is_viewable(value):
+    '''
+    True for job results the viewer can show.
+    '''
+    return isinstance(value, pd.DataFrame)
+
+class ResultViewerDialog(QtWidgets.QDialog):
+    '''
+    Window showing the DataFrame returned by a job.
+
+    :param df: DataFrame to show
+    :param title: Window title
+    '''
+    def __init__(self, df, title, parent=None):
+        super(ResultViewerDialog, self).__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(900, 600)
+
+        self.model = DataFrameTableModel(df, self)
+
+        self.table_view = QtWidgets.QTableView(self)
+        self.table_view.setModel(self.model)
+        # No sort indicator at first, enabling the sorting would sort by the first column
+        self.table_view.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.table_view.setSortingEnabled(True)
+        self.table_view.horizontalHeader().setResizeContentsPrecision(RESIZE_PRECISION_ROWS)
+
+        # Fixed row heights, the view never measures rows it does not show
+        self.table_view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Fixed)
+        self.table_view.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 6)
+        self.table_view.resizeColumnsToContents()
+
+        self.material_column_cbox = QtWidgets.QComboBox(self)
+        self.material_column_cbox.addItems(self.model.column_names)
+        material_columns = [column for column in MATERIAL_COLUMNS if column in self.model.column_names]
+        if material_columns:
+            self.material_column_cbox.setCurrentText(material_columns[0])
+
+        self.material_filter_ledit = QtWidgets.QLineEdit(self)
+        self.material_filter_ledit.setPlaceholderText("Filter the column")
+
+        week_columns = [column for column in WEEK_COLUMNS if column in self.model.column_names]
+        self.week_column = week_columns[0] if week_columns else None
+
+        self.week_filter_ledit = QtWidgets.QLineEdit(self)
+        self.week_filter_ledit.setPlaceholderText(f"Week of {self.week_column}, e.g. 2026-W05"
+                                                  if self.week_column else "No date column")
+        self.week_filter_ledit.setEnabled(self.week_column is not None)
+
+        self.row_count_label = QtWidgets.QLabel(self)
+
+        filter_layout = QtWidgets.QHBoxLayout()
+        filter_layout.addWidget(self.material_column_cbox)
+        filter_layout.addWidget(self.material_filter_ledit, 2)
+        filter_layout.addWidget(self.week_filter_ledit, 1)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.table_view)
+        layout.addWidget(self.row_count_label)
+
+        # Filtering waits for a pause in the typing instead of running on every keystroke
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self._apply_filters)
+
+        self.material_filter_ledit.textChanged.connect(self.filter_timer.start)
+        self.week_filter_ledit.textChanged.connect(self.filter_timer.start)
+        self.material_column_cbox.currentTextChanged.connect(self._material_column_changed)
+
+        self.filtered_column = self.material_column_cbox.currentText()
+        self._update_row_count()
+
+    def _material_column_changed(self, column_name):
+        # The text filters the newly selected column only
+        self.model.set_filter(self.filtered_column, "")
+        self.filtered_column = column_name
+        self._apply_filters()
+
+    def _apply_filters(self):
+        self.model.set_filter(self.filtered_column, self.material_filter_ledit.text())
+
+        if self.week_column is not None:
+            self.model.set_filter(self.week_column, self.week_filter_ledit.text(), week=True)
+
+        self._update_row_count()
+
+    def _update_row_count(self):
+        self.row_count_label.setText(f"{self.model.rowCount():,} of {self.model.total_row_count:,} rows")
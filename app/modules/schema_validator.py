@@ -0,0 +1,196 @@
+"""
+Module: SchemaValidator
+Description: This module checks the layout of the input workbooks before a job starts
+             parsing them. Only the column title row and a few rows below it are read,
+             so a wrong column title row or a missing column is reported within
+             milliseconds instead of failing somewhere in the middle of the run.
+
+             The column titles are compared as pandas names them: an empty title becomes
+             "Unnamed: <position>" and repeated titles get a ".1", ".2", ... suffix.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import datetime
+import os
+
+# Value checks of the sampled rows
+NUMBER = "number"
+DATE = "date"
+COOPERATION_TIME = "number or X"
+
+# Column -> expected value type (None accepts anything)
+BI_RESERVATIONS_COLUMNS = {"CISLO_MAT": None,
+                           "NAZEV_MAT": None,
+                           "STAV_MAT": NUMBER,
+                           "MNOZSTVI": NUMBER,
+                           "_IB_KOKS": None,
+                           "CIS_OBJ": None,
+                           "DODATUMU": DATE}
+
+# "Unnamed: 9" is the untitled 10th column with the project numbers
+MANUFACTURING_PLAN_COLUMNS = {"Unnamed: 9": None,
+                              "CURRENT DELIVERY WEEK ": None}
+
+BATCH_DATABASE_COLUMNS = {"Číslo": None,
+                          "Norma Kooperace": COOPERATION_TIME,
+                          "Dávka": NUMBER}
+
+WELDING_PLAN_COLUMNS = {"MATERIAL NUMBER": None,
+                        "BATCH IN PRODUCTION": NUMBER}
+
+# Data rows below the column titles whose values are checked
+SAMPLE_ROWS = 50
+
+# Rows searched for the column titles when they are not in the given row
+TITLE_SEARCH_ROWS = 20
+
+# Formats read by openpyxl, other files are left to pandas
+VALIDATED_EXTENSIONS = (".xlsx", ".xlsm", ".xltx", ".xltm")
+
+class SchemaValidationError(ValueError):
+    '''
+    An input workbook does not have the layout the tool expects.
+    '''
+    pass
+
+def validate_welding_planner_inputs(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                                    welding_planner_excel=None):
+    # A multi-plant run has the BI reservations of every plant
+    if isinstance(bi_reservations_excel, dict):
+        inputs = [(plant_excel, BI_RESERVATIONS_COLUMNS, f"BI reservations of plant '{plant}'")
+                  for plant, plant_excel in bi_reservations_excel.items()]
+    else:
+        inputs = [(bi_reservations_excel, BI_RESERVATIONS_COLUMNS, "BI reservations")]
+
+    inputs += [(manufacturing_plan_excel, MANUFACTURING_PLAN_COLUMNS, "manufacturing plan"),
+               (batch_database_excel, BATCH_DATABASE_COLUMNS, "batch database")]
+
+    if welding_planner_excel is not None:
+        inputs.append((welding_planner_excel, WELDING_PLAN_COLUMNS, "previous welding plan"))
+
+    _validate(inputs)
+
+def validate_data_filler_inputs(src_excel, dst_excel, src_lookup_column, src_copy_column,
+                                dst_lookup_column, dst_fill_column):
+    _validate([(src_excel, {src_lookup_column: None, src_copy_column: None}, "source"),
+               (dst_excel, {dst_lookup_column: None, dst_fill_column: None}, "destination")])
+
+def _validate(inputs):
+    # openpyxl is imported here, the GUI imports this module for the exception class only
+    import openpyxl
+
+    workbooks = {}
+    try:
+        for excel_data_manager, columns, role in inputs:
+            file_path = excel_data_manager.file_path
+
+            if not os.path.isfile(file_path):
+                raise SchemaValidationError(f"The {role} file '{file_path}' does not exist.")
+
+            if os.path.splitext(file_path)[1].lower() not in VALIDATED_EXTENSIONS:
+                continue
+
+            # Sheets of one workbook are validated on the same read-only handle
+            if file_path not in workbooks:
+                try:
+                    workbooks[file_path] = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+                except Exception as e:
+                    raise SchemaValidationError(f"The {role} file '{file_path}' cannot be opened: {e}")
+
+            _validate_sheet(workbooks[file_path], excel_data_manager, columns, role)
+    finally:
+        for workbook in workbooks.values():
+            workbook.close()
+
+def _validate_sheet(workbook, excel_data_manager, columns, role):
+    sheet_name = excel_data_manager.sheet_name
+    sheet_label = f"sheet {sheet_name + 1}" if isinstance(sheet_name, int) else f"sheet '{sheet_name}'"
+    description = f"the {role} ('{os.path.basename(excel_data_manager.file_path)}', {sheet_label})"
+
+    if isinstance(sheet_name, int):
+        if sheet_name >= len(workbook.worksheets):
+            raise SchemaValidationError(f"The {role} file '{excel_data_manager.file_path}' has no {sheet_label}.")
+        worksheet = workbook.worksheets[sheet_name]
+    else:
+        if sheet_name not in workbook.sheetnames:
+            raise SchemaValidationError(f"The {role} file '{excel_data_manager.file_path}' has no {sheet_label}, "
+                                        f"the sheets are: {', '.join(workbook.sheetnames)}.")
+        worksheet = workbook[sheet_name]
+
+    title_row = excel_data_manager.column_name_row + 1
+    rows = list(worksheet.iter_rows(min_row=1, max_row=max(title_row + SAMPLE_ROWS, TITLE_SEARCH_ROWS),
+                                    values_only=True))
+
+    column_titles = pandas_column_titles(rows[title_row - 1]) if title_row <= len(rows) else []
+    missing_columns = [column for column in columns if column not in column_titles]
+
+    if missing_columns:
+        raise SchemaValidationError(_missing_columns_message(missing_columns, column_titles, rows,
+                                                             title_row, columns, description))
+
+    for column, value_type in columns.items():
+        if value_type is None:
+            continue
+
+        position = column_titles.index(column)
+        for row_number, row in enumerate(rows[title_row:title_row + SAMPLE_ROWS], start=title_row + 1):
+            value = row[position] if position < len(row) else None
+
+            if value is not None and value != "" and not _has_type(value, value_type):
+                raise SchemaValidationError(f"Column '{column}' of {description} has to contain a {value_type}, "
+                                            f"row {row_number} contains '{value}'.")
+
+def pandas_column_titles(row):
+    '''
+    Returns the column titles of a worksheet row named as pandas names them.
+    '''
+    column_titles = []
+    for position, title in enumerate(row):
+        title = f"Unnamed: {position}" if title is None else title
+
+        name, suffix = title, 0
+        while name in column_titles:
+            suffix += 1
+            name = f"{title}.{suffix}"
+
+        column_titles.append(name)
+
+    return column_titles
+
+def _missing_columns_message(missing_columns, column_titles, rows, title_row, columns, description):
+    message = (f"Column{'s' if len(missing_columns) > 1 else ''} "
+               f"{', '.join(repr(column) for column in missing_columns)} not found in row {title_row} of {description}.")
+
+    # The most common mistake is a wrong column title row
+    for row_number, row in enumerate(rows[:TITLE_SEARCH_ROWS], start=1):
+        if row_number != title_row and all(column in pandas_column_titles(row) for column in columns):
+            return message + f" The column titles are in row {row_number}, check the column title row."
+
+    import difflib
+
+    text_titles = [title for title in column_titles if isinstance(title, str)]
+    for column in missing_columns:
+        close_matches = difflib.get_close_matches(str(column), text_titles, n=1, cutoff=0.8)
+        if close_matches:
+            message += f" Did you mean '{close_matches[0]}' instead of '{column}'?"
+
+    return message
+
+def _has_type(value, value_type):
+    is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    if value_type == NUMBER:
+        return is_number
+
+    if value_type == DATE:
+        return isinstance(value, (datetime.datetime, datetime.date))
+
+    if value_type == COOPERATION_TIME:
+        return is_number or value == "X"
+
+    return True
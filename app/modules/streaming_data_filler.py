@@ -0,0 +1,302 @@
+"""
+Module: StreamingDataFiller
+Description: This module provides the out-of-core variant of the data filler for destination
+             workbooks too big to be loaded into memory. Only the lookup and copy columns of
+             the source are loaded, the destination is walked row by row with read-only
+             iterators and written row by row into a new write-only workbook, which then
+             replaces the destination file.
+
+             The memory use is O(destination rows), not flat: the lookup key of every
+             destination row is held for the whole fill, a string of the key per row (about
+             a hundred bytes, a few hundred while the keys are computed). The other columns
+             of the destination are never held, a row is written out as soon as it is read.
+
+             The lookup values are compared as the strings DataFiller compares: every lookup
+             column goes through the parser of pandas.read_excel and astype(str), so e.g. an
+             int column with blanks gives "10.0" on both paths. How a value turns into its
+             string depends on the whole column (the inferred dtype, dates with or without
+             a time), which is why the destination keys are computed for the whole column
+             before the rows are streamed. The n-th destination row of a lookup value gets
+             the value of the n-th source row of that lookup value, empty source values do
+             not overwrite anything, like DataFiller does.
+
+             Cell values, formulas and cell styles of all sheets are kept. Column widths,
+             merged cells, conditional formatting, data validation, charts and images of
+             every sheet of the workbook are not, the write-only workbook cannot carry them
+             over. The fill is therefore only run when the user asked for it.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .excel_data_manager import ExcelDataManager
+from .memory_profiler import MemoryProfiler
+
+# external module imports
+import os
+import tempfile
+import numpy as np
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+# Rows between two cancellation checks and progress updates
+ROWS_PER_CHECK = 1000
+
+def lookup_keys(column_title, values):
+    '''
+    Returns the lookup values of a column as the strings DataFiller compares. The cells are
+    converted and the dtype of the column is inferred by the parser pandas.read_excel uses,
+    then the values are turned into strings by astype(str) like DataFiller does.
+
+    :param column_title: Title of the lookup column
+    :param values: Cell values of the column as openpyxl reads them (values_only)
+    '''
+    rows = [[column_title]] + [[_read_excel_value(value)] for value in values]
+    column = TextParser(rows, header=0, skip_blank_lines=False).read().iloc[:, 0]
+
+    return column.astype(str).tolist()
+
+def _read_excel_value(value):
+    # The cell conversion of the openpyxl reader of pandas
+    if value is None:
+        return ""
+
+    if isinstance(value, str) and value in ERROR_CODES:
+        return np.nan
+
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+
+    return value
+
+def _is_empty_row(row):
+    return all(value is None for value in row)
+
+class StreamingDataFiller():
+    def __init__(self, source: ExcelDataManager, destination: ExcelDataManager,
+                 src_lookup_column, src_copy_column,
+                 dst_lookup_column, dst_fill_column, memory_profiler=None):
+
+        self.source = source
+        self.source.lookup_column = src_lookup_column
+        self.source.copy_column = src_copy_column
+
+        self.destination = destination
+        self.destination.lookup_column = dst_lookup_column
+        self.destination.fill_column = dst_fill_column
+
+        self.memory_profiler = memory_profiler if memory_profiler is not None else MemoryProfiler(enabled=False)
+
+        self.source_index = None
+        self.num_of_filled_cells = 0
+        self._style_cache = {}
+
+    def fill_data(self, progress_callback=None, cancel_token=None):
+        '''
+        Fills the destination file in place, returns the number of filled cells.
+        '''
+        try:
+            with self.memory_profiler.stage("index source"):
+                self.source_index = self._index_source()
+
+            self._check_cancelled(cancel_token)
+
+            with self.memory_profiler.stage("stream destination"):
+                self._stream_destination(progress_callback, cancel_token)
+
+            return self.num_of_filled_cells
+
+        finally:
+            self.source_index = None
+
+    def _index_source(self):
+        workbook = openpyxl.load_workbook(self.source.file_path, read_only=True, data_only=True)
+
+        try:
+            rows = self._worksheet(workbook, self.source.sheet_name).iter_rows(
+                min_row=self.source.column_name_row + 1, values_only=True)
+
+            column_titles = next(rows, ())
+            lookup_position = self._column_position(column_titles, self.source.lookup_column, self.source)
+            copy_position = self._column_position(column_titles, self.source.copy_column, self.source)
+
+            lookup_values = []
+            copy_values = []
+            num_of_rows = 0
+            for row in rows:
+                lookup_values.append(row[lookup_position] if lookup_position < len(row) else None)
+                copy_values.append(row[copy_position] if copy_position < len(row) else None)
+
+                # pandas drops the empty rows at the end of a sheet
+                if not _is_empty_row(row):
+                    num_of_rows = len(lookup_values)
+
+            # Lookup value -> copy values of its rows, in the order of the rows
+            source_index = {}
+            keys = lookup_keys(self.source.lookup_column, lookup_values[:num_of_rows])
+            for key, copy_value in zip(keys, copy_values):
+                source_index.setdefault(key, []).append(copy_value)
+
+            return source_index
+
+        finally:
+            workbook.close()
+
+    def _index_destination(self, values_worksheet):
+        '''
+        Returns the position of the fill column and the lookup key of every row below the
+        column title row, None for the empty rows at the end of the sheet. Only the lookup
+        column is kept, the list of keys is the O(rows) part of the memory use.
+        '''
+        column_title_row = self.destination.column_name_row + 1
+        lookup_position = fill_position = None
+
+        lookup_values = []
+        num_of_rows = 0
+        for row_number, row in enumerate(values_worksheet.iter_rows(values_only=True), start=1):
+            if row_number == column_title_row:
+                lookup_position = self._column_position(row, self.destination.lookup_column, self.destination)
+                fill_position = self._column_position(row, self.destination.fill_column, self.destination)
+
+            elif row_number > column_title_row:
+                lookup_values.append(row[lookup_position] if lookup_position < len(row) else None)
+
+                if not _is_empty_row(row):
+                    num_of_rows = len(lookup_values)
+
+        if lookup_position is None:
+            raise KeyError(f"Column title row {column_title_row} not found in '{self.destination.file_path}'.")
+
+        keys = lookup_keys(self.destination.lookup_column, lookup_values[:num_of_rows])
+        return fill_position, keys + [None] * (len(lookup_values) - num_of_rows)
+
+    def _stream_destination(self, progress_callback, cancel_token):
+        # Values for the lookup (cached formula results, like pandas reads them), formulas for the copy
+        values_workbook = openpyxl.load_workbook(self.destination.file_path, read_only=True, data_only=True)
+        formulas_workbook = openpyxl.load_workbook(self.destination.file_path, read_only=True, data_only=False)
+        output_workbook = openpyxl.Workbook(write_only=True)
+
+        file_descriptor, temp_path = tempfile.mkstemp(suffix=".xlsx", prefix="~fill-",
+                                                      dir=os.path.dirname(os.path.abspath(self.destination.file_path)))
+        os.close(file_descriptor)
+
+        try:
+            fill_worksheet = self._worksheet(formulas_workbook, self.destination.sheet_name)
+
+            # Values for the lookup, the keys of the whole column decide how the values compare
+            fill_position, destination_keys = self._index_destination(values_workbook[fill_worksheet.title])
+            self._check_cancelled(cancel_token)
+
+            for worksheet in formulas_workbook.worksheets:
+                output_worksheet = output_workbook.create_sheet(worksheet.title)
+
+                if worksheet.title == fill_worksheet.title:
+                    self._fill_worksheet(worksheet, output_worksheet, fill_position, destination_keys,
+                                         progress_callback, cancel_token)
+                else:
+                    for row in worksheet.iter_rows():
+                        output_worksheet.append([self._copy_cell(output_worksheet, cell) for cell in row])
+
+            # Last chance to stop before the destination file is replaced
+            self._check_cancelled(cancel_token)
+            output_workbook.save(temp_path)
+
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        finally:
+            values_workbook.close()
+            formulas_workbook.close()
+
+        os.replace(temp_path, self.destination.file_path)
+
+    def _fill_worksheet(self, formulas_worksheet, output_worksheet, fill_position, destination_keys,
+                        progress_callback, cancel_token):
+        column_title_row = self.destination.column_name_row + 1
+        num_of_rows = formulas_worksheet.max_row
+
+        # Occurrences of every lookup value so far, the n-th occurrence gets the n-th source value
+        occurrences = {}
+
+        for row_number, formula_row in enumerate(formulas_worksheet.iter_rows(), start=1):
+            output_row = [self._copy_cell(output_worksheet, cell) for cell in formula_row]
+
+            data_row = row_number - column_title_row - 1
+            key = destination_keys[data_row] if 0 <= data_row < len(destination_keys) else None
+            source_values = self.source_index.get(key) if key is not None else None
+
+            if source_values is not None:
+                occurrence = occurrences.get(key, 0)
+                occurrences[key] = occurrence + 1
+
+                if occurrence < len(source_values) and source_values[occurrence] is not None:
+                    self._set_output_value(output_worksheet, output_row, formula_row, fill_position,
+                                           source_values[occurrence])
+                    self.num_of_filled_cells += 1
+
+            output_worksheet.append(output_row)
+
+            if row_number % ROWS_PER_CHECK == 0:
+                self._check_cancelled(cancel_token)
+                if num_of_rows:
+                    self._update_progress_bar(progress_callback, min(99, int(row_number / num_of_rows * 100)))
+
+        self._update_progress_bar(progress_callback, 100)
+
+    def _set_output_value(self, output_worksheet, output_row, formula_row, position, value):
+        # Short rows end at their last non empty cell
+        if position >= len(output_row):
+            output_row.extend([None] * (position + 1 - len(output_row)))
+
+        if position < len(formula_row) and getattr(formula_row[position], "has_style", False):
+            output_cell = WriteOnlyCell(output_worksheet, value=value)
+            self._apply_style(output_cell, formula_row[position])
+            output_row[position] = output_cell
+        else:
+            output_row[position] = value
+
+    def _copy_cell(self, output_worksheet, cell):
+        if not getattr(cell, "has_style", False):
+            return cell.value
+
+        output_cell = WriteOnlyCell(output_worksheet, value=cell.value)
+        self._apply_style(output_cell, cell)
+        return output_cell
+
+    def _apply_style(self, output_cell, cell):
+        style = self._style_cache.get(cell._style_id)
+        if style is None:
+            style = (cell.font, cell.fill, cell.border, cell.alignment, cell.protection, cell.number_format)
+            self._style_cache[cell._style_id] = style
+
+        (output_cell.font, output_cell.fill, output_cell.border,
+         output_cell.alignment, output_cell.protection, output_cell.number_format) = style
+
+    def _worksheet(self, workbook, sheet_name):
+        if isinstance(sheet_name, int):
+            return workbook.worksheets[sheet_name]
+
+        return workbook[sheet_name]
+
+    def _column_position(self, column_titles, column_title, excel_data_manager):
+        for position, title in enumerate(column_titles):
+            if title is not None and str(title) == str(column_title):
+                return position
+
+        raise KeyError(f"Column '{column_title}' not found in '{excel_data_manager.file_path}', "
+                       f"sheet '{excel_data_manager.sheet_name}'.")
+
+    def _update_progress_bar(self, progress_callback, percentage):
+        # Headless runs (daemon, service) have no progress bar
+        if progress_callback is not None:
+            progress_callback.emit(percentage)
+
+    def _check_cancelled(self, cancel_token):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
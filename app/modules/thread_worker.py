@@ -10,8 +10,13 @@ This software is distributed under the GPL v3.0 license.
 """
 
 # external module imports
+import sys
+import traceback
 from PyQt6.QtCore import QRunnable, QThreadPool, pyqtSlot, pyqtSignal, QObject
 
+# local module imports
+from .cancellation import CancellationToken, JobCancelledError
+
 class WorkerSignals(QObject):
     '''
     Defines the signals available from a running worker thread.
@@ -21,14 +26,24 @@ class WorkerSignals(QObject):
     finished
         No data
 
+    error
+        tuple (exctype, value, traceback.format_exc())
+
+    result
+        object data returned from processing, anything
+
     progress
         int indicating % progress
 
+    cancelled
+        No data, emitted instead of result when the job was aborted
+
     '''
     finished = pyqtSignal()
-    error = pyqtSignal()
-    result = pyqtSignal()
+    error = pyqtSignal(tuple)
+    result = pyqtSignal(object)
     progress = pyqtSignal(int)
+    cancelled = pyqtSignal()
 
 class ThreadWorker(QRunnable):
     '''
@@ -42,6 +57,9 @@ class ThreadWorker(QRunnable):
     :param args: Arguments to pass to the callback function
     :param kwargs: Keywords to pass to the callback function
 
+    The callback additionally receives a ``cancel_token`` keyword argument, it is
+    triggered by :meth:`cancel` and has to be polled by the callback.
+
     '''
     def __init__(self, fn, *args, **kwargs):
         super(ThreadWorker, self).__init__()
@@ -55,17 +73,28 @@ class ThreadWorker(QRunnable):
         # Add the callback to kwargs
         self.kwargs['progress_callback'] = self.signals.progress
 
+        # Add the cancellation token to kwargs
+        self.cancel_token = CancellationToken()
+        self.kwargs['cancel_token'] = self.cancel_token
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
     @pyqtSlot()
     def run(self):
             try:
                 # run the function in another thread
-                self.fn(*self.args, **self.kwargs)
-            except:
-                # emit error
-                self.signals.error.emit()
+                result = self.fn(*self.args, **self.kwargs)
+            except JobCancelledError:
+                # emit cancelled, the callback stopped without producing a result
+                self.signals.cancelled.emit()
+            except Exception:
+                # emit error together with the formatted traceback
+                exctype, value = sys.exc_info()[:2]
+                self.signals.error.emit((exctype, value, traceback.format_exc()))
             else:
                 # emit successful result
-                self.signals.result.emit()
+                self.signals.result.emit(result)
             finally:
                 # emit the finished signal once the thread has finished
                 self.signals.finished.emit()
@@ -0,0 +1,267 @@
+"""
+Module: WatchDaemon
+Description: This module provides a headless daemon that watches a directory for new or
+             changed BI reservation, manufacturing plan and batch database exports and
+             re-plans the welding automatically in update mode against the last plan.
+             Parsed inputs are kept in a FrameCache between runs, so only the files that
+             changed are parsed again.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .cancellation import CancellationToken, JobCancelledError
+from .excel_data_manager import ExcelDataManager
+from .frame_cache import FrameCache
+from .schema_validator import SchemaValidationError, validate_welding_planner_inputs
+
+# external module imports
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import sys
+import time
+import traceback
+import zipfile
+from datetime import datetime
+
+# inotify flags, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+INPUT_ROLES = ("bi_reservations", "manufacturing_plan", "batch_database")
+
+def _log(message):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+class DirectoryWatcher():
+    '''
+    Blocks until something changes in a directory or the timeout passes.
+
+    Uses inotify where it is available (Linux) and plain sleeping otherwise. The caller
+    always re-scans the directory after waking up, so inotify only makes the reaction
+    faster and missed events (e.g. on network shares) are caught by the next scan.
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        self.inotify_fd = None
+        self._init_inotify()
+
+    @property
+    def uses_inotify(self):
+        return self.inotify_fd is not None
+
+    def _init_inotify(self):
+        if not sys.platform.startswith("linux"):
+            return
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            inotify_fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if inotify_fd < 0:
+                return
+
+            watch_descriptor = libc.inotify_add_watch(inotify_fd, os.fsencode(self.directory),
+                                                      IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO |
+                                                      IN_CREATE | IN_DELETE)
+            if watch_descriptor < 0:
+                os.close(inotify_fd)
+                return
+
+            self.inotify_fd = inotify_fd
+
+        except (OSError, AttributeError):
+            # No usable inotify, fall back to polling
+            self.inotify_fd = None
+
+    def wait(self, timeout):
+        if self.inotify_fd is None:
+            time.sleep(timeout)
+            return
+
+        readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if readable:
+            # The events themselves are not needed, drain them so the next wait blocks again
+            try:
+                while os.read(self.inotify_fd, 64 * 1024):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+
+class WatchDaemon():
+    '''
+    Re-plans the welding whenever one of the watched input files changes.
+
+    :param directory: Directory the BI system exports into
+    :param patterns: dict mapping each of INPUT_ROLES to a file name pattern, the newest
+                     matching file is used for the role
+    :param column_title_rows: dict mapping each of INPUT_ROLES to its 1-based column title row
+    :param output_path: Path of the WeldingPlan.xlsx that is updated by each run
+    :param settle_seconds: How long a file has to stay unchanged before it is used,
+                           protects against reading exports that are still being written
+    :param poll_interval: Seconds between directory scans
+    :param max_cache_bytes: Memory the parsed inputs may use between runs
+
+    '''
+    def __init__(self, directory, patterns, column_title_rows, output_path,
+                 settle_seconds=10, poll_interval=5, max_cache_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.patterns = patterns
+        self.column_title_rows = column_title_rows
+        self.output_path = output_path
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+
+        self.cancel_token = CancellationToken()
+        self.watcher = DirectoryWatcher(directory)
+        self.frame_cache = FrameCache(max_bytes=max_cache_bytes)
+
+        # path -> (size, mtime_ns, time the identity was first seen)
+        self._seen_identities = {}
+        self._last_planned_inputs = None
+
+    def stop(self):
+        self.cancel_token.cancel()
+
+    def run_forever(self):
+        ExcelDataManager.frame_cache = self.frame_cache
+        _log(f"Watching '{self.directory}' ({'inotify' if self.watcher.uses_inotify else 'polling'}).")
+
+        try:
+            while not self.cancel_token.is_cancelled:
+                inputs = self._select_stable_inputs()
+
+                if inputs is not None and inputs != self._last_planned_inputs:
+                    self._plan(inputs)
+
+                # Wake up earlier while a file is settling
+                self.watcher.wait(min(self.poll_interval, self.settle_seconds))
+        finally:
+            self.watcher.close()
+            ExcelDataManager.frame_cache = None
+            _log("Stopped.")
+
+    def _select_stable_inputs(self):
+        '''
+        Returns {role: (path, size, mtime_ns)} once every role has a stable file, else None.
+        '''
+        try:
+            file_names = os.listdir(self.directory)
+        except OSError as e:
+            _log(f"Cannot list '{self.directory}': {e}")
+            return None
+
+        output_name = os.path.basename(self.output_path)
+        inputs = {}
+
+        for role in INPUT_ROLES:
+            candidates = []
+            for file_name in fnmatch.filter(file_names, self.patterns[role]):
+                # Skip the plan written by the daemon itself and Office lock files
+                if file_name == output_name or file_name.startswith("~$"):
+                    continue
+
+                path = os.path.join(self.directory, file_name)
+                try:
+                    stat_result = os.stat(path)
+                except OSError:
+                    continue
+
+                candidates.append((stat_result.st_mtime_ns, path, stat_result.st_size))
+
+            if not candidates:
+                return None
+
+            mtime_ns, path, size = max(candidates)
+            if not self._is_stable(path, size, mtime_ns):
+                return None
+
+            inputs[role] = (path, size, mtime_ns)
+
+        return inputs
+
+    def _is_stable(self, path, size, mtime_ns):
+        now = time.monotonic()
+        seen = self._seen_identities.get(path)
+
+        if seen is None or seen[0:2] != (size, mtime_ns):
+            self._seen_identities[path] = (size, mtime_ns, now)
+            return False
+
+        if now - seen[2] < self.settle_seconds:
+            return False
+
+        # A half written xlsx is not a valid zip archive yet
+        return zipfile.is_zipfile(path)
+
+    def _plan(self, inputs):
+        from .capacity_scheduler import CapacityScheduler
+        from .jobs import plan_history_path
+        from .plan_history import PlanHistory
+        from .welding_planner import WeldingPlanner
+
+        changed_roles = [role for role in INPUT_ROLES
+                         if self._last_planned_inputs is None or inputs[role] != self._last_planned_inputs[role]]
+        _log(f"Re-planning, changed inputs: {', '.join(changed_roles)}.")
+
+        excel_data_managers = {role: ExcelDataManager(inputs[role][0], sheet_name=0,
+                                                      column_name_row=self.column_title_rows[role] - 1)
+                               for role in INPUT_ROLES}
+
+        # Update mode against the last plan, its in-production batches are carried over
+        if os.path.exists(self.output_path):
+            welding_planner_excel = ExcelDataManager(self.output_path, sheet_name="Welding Plan", column_name_row=0)
+        else:
+            welding_planner_excel = None
+
+        start_time = time.perf_counter()
+
+        plan_history = PlanHistory(plan_history_path(self.output_path))
+
+        try:
+            validate_welding_planner_inputs(excel_data_managers["bi_reservations"],
+                                            excel_data_managers["manufacturing_plan"],
+                                            excel_data_managers["batch_database"], welding_planner_excel)
+
+            welding_planner_instance = WeldingPlanner(welding_planner_excel, output_path=self.output_path,
+                                                      capacity_scheduler=CapacityScheduler.load(),
+                                                      plan_history=plan_history)
+            welding_plan_df = welding_planner_instance.plan_welding(excel_data_managers["bi_reservations"],
+                                                                    excel_data_managers["manufacturing_plan"],
+                                                                    excel_data_managers["batch_database"],
+                                                                    cancel_token=self.cancel_token)
+        except JobCancelledError:
+            return
+        except SchemaValidationError as e:
+            _log(f"Planning refused, {e}")
+        except Exception:
+            # Keep watching, the next export may be fine again
+            _log(f"Planning failed:\n{traceback.format_exc()}")
+        else:
+            if welding_planner_instance.output_unchanged:
+                outcome = f"Planned {welding_plan_df.shape[0]} batches, '{self.output_path}' is unchanged"
+            else:
+                outcome = f"Wrote {welding_plan_df.shape[0]} batches to '{self.output_path}'"
+
+            _log(f"{outcome} in {time.perf_counter() - start_time:.1f} s "
+                 f"(cache: {len(self.frame_cache)} sheets, {self.frame_cache.current_bytes / 2**20:.0f} MB).")
+        finally:
+            plan_history.close()
+
+        # A failing input is not retried until one of the files changes again
+        self._last_planned_inputs = inputs
@@ -10,14 +10,34 @@ This software is distributed under the GPL v3.0 license.
 
 # local module imports
 from .excel_data_manager import ExcelDataManager
+from .cancellation import JobCancelledError
+from .checkpoint_store import CheckpointStore
+from .iso_calendar import IsoWeekCalendar
+from .content_hash import frames_hash, is_unchanged, record_content_hash
+from .output_files import OUTPUT_UNCHANGED_ATTRIBUTE, content_hash_path, plan_changes_path
+from .memory_profiler import MemoryProfiler
+from .plan_diff import diff_welding_plans
+from .planning_rules import PlanningRules
+from .planning_scenario import PlanningScenario, INVALID_SHEET_NAME_CHARACTERS
 
 # external module imports
 from decimal import ROUND_UP
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import pandas as pd
 import numpy as np
 from datetime import date
-from isoweek import Week
 import os
+import time
+
+DEFAULT_OUTPUT_PATH = "output/WeldingPlan.xlsx"
+DEFAULT_SCENARIOS_OUTPUT_PATH = "output/WeldingPlanScenarios.xlsx"
+
+# Sheets of the welding plan workbook, the plant sheets must not take their names
+RESERVED_SHEET_NAMES = ("welding plan", "changes", "invalid deadline", "capacity load", "x_database missing")
+
+# Seconds of material planning between two checkpoints of the planned batches
+CHECKPOINT_INTERVAL_S = 30
 
 class PlannerMX():
     def __init__(self, mx):
@@ -28,45 +48,444 @@ class PlannerMX():
         self.temp_pieces_in_batch = 0
         self.batch_size = 0
         self.cooperation_time = 0
+        self.reserved_pieces = 0
+
+    def copy(self):
+        planner_mx = PlannerMX(self.mx)
+        planner_mx.__dict__.update(self.__dict__)
+        planner_mx.df = self.df.copy()
+        return planner_mx
 
 class WeldingPlanner():
-    def __init__(self, welding_planner_excel=None):
+    def __init__(self, welding_planner_excel=None, output_path=DEFAULT_OUTPUT_PATH, memory_profiler=None,
+                 planning_rules=None, capacity_scheduler=None, plan_history=None, scenario=None,
+                 checkpoint_directory=None):
         self.welding_planner_excel = welding_planner_excel
+        self.output_path = output_path
+        self.memory_profiler = memory_profiler if memory_profiler is not None else MemoryProfiler(enabled=False)
+        self.planning_rules = planning_rules if planning_rules is not None else PlanningRules.load()
+        self.stock_projects = self.planning_rules.stock_projects
+        self.capacity_scheduler = capacity_scheduler
+        self.plan_history = plan_history
+        self.scenario = scenario if scenario is not None else PlanningScenario()
+
+        # Scratch directory of the checkpoints, None runs without checkpoints
+        self.checkpoint_directory = checkpoint_directory
+        self.num_of_material_checkpoints = 0
+        self.checkpointed_batches = 0
+        self.checkpointed_missing_parts = 0
+        self.last_checkpoint_time = None
+        self.in_production_df = None
+        self.in_production_counts = {}
+        self.previous_plan_df = None
+        self.changes_df = None
+        self.output_unchanged = False
+        self.plants = []
+        self.plant_plans = {}
         self.planner_mx = None
         self.production_batches = []
         self.batch_database_missing_parts = []
+        self.invalid_deadline_parts = []
+        self.capacity_load = []
+        self.iso_week_calendar = IsoWeekCalendar(date.today().year - 1, date.today().year + 2)
 
     def plan_welding(self, bi_reservations_excel, manufacturing_plan_excel, 
-                     batch_database_excel, progress_callback=None):
+                     batch_database_excel, progress_callback=None, cancel_token=None, num_of_workers=1):
+        '''
+        Plans the welding and writes the welding plan to output_path, returns its DataFrame.
+
+        :param bi_reservations_excel: ExcelDataManager of the BI reservations, or a dict {plant: ExcelDataManager}
+                                      to plan several plants on the same manufacturing plan and batch database
+        :param num_of_workers: Processes planning the plants, 1 plans them one by one in this process
+        '''
+        try:
+            if isinstance(bi_reservations_excel, dict):
+                return self._plan_plants(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                                         num_of_workers, progress_callback, cancel_token)
+
+            return self._plan_welding(bi_reservations_excel, manufacturing_plan_excel,
+                               batch_database_excel, progress_callback, cancel_token)
+
+        except JobCancelledError:
+            if isinstance(bi_reservations_excel, dict):
+                self._release_data(*bi_reservations_excel.values(), manufacturing_plan_excel, batch_database_excel)
+            else:
+                self._release_data(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel)
+            raise
+
+    def plan_scenarios(self, bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                       scenarios, num_of_workers=1, progress_callback=None, cancel_token=None):
+        '''
+        Plans the welding for every scenario and writes one workbook with a sheet per scenario
+        and a "Comparison" sheet to output_path. The inputs are read, filtered and matched
+        with the project deadlines once, only the batching is repeated for each scenario.
+        Returns a dict {scenario name: welding plan DataFrame}.
+
+        :param scenarios: list of PlanningScenario objects
+        :param num_of_workers: Processes evaluating the scenarios, 1 evaluates them in this process
+        '''
+        try:
+            return self._plan_scenarios(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                                        scenarios, num_of_workers, progress_callback, cancel_token)
+
+        except JobCancelledError:
+            self._release_data(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel)
+            raise
+
+    def _release_data(self, *excel_data_managers):
+        # Drop everything computed so far so the memory is released right away
+        for excel_data_manager in excel_data_managers + (self.welding_planner_excel,):
+            if excel_data_manager is not None:
+                excel_data_manager.df = None
+
+        self.planner_mx = None
+        self.in_production_df = None
+        self.in_production_counts = {}
+        self.previous_plan_df = None
+        self.plant_plans = {}
+        self.production_batches = []
+        self.batch_database_missing_parts = []
+        self.invalid_deadline_parts = []
+
+    def _plan_welding(self, bi_reservations_excel, manufacturing_plan_excel,
+                      batch_database_excel, progress_callback, cancel_token):
+
+        checkpoints = self._open_checkpoints(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel)
+
+        if not self._restore_inputs(checkpoints, bi_reservations_excel, manufacturing_plan_excel,
+                                    batch_database_excel, progress_callback):
+            self._read_inputs(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                              progress_callback, cancel_token)
+
+            if self.welding_planner_excel != None:
+                self._load_previous_plan()
+
+            self._checkpoint_inputs(checkpoints, bi_reservations_excel, manufacturing_plan_excel, batch_database_excel)
+
+        # A run that failed while writing the output has the whole welding plan checkpointed
+        welding_plan_df = self._restore_welding_plan(checkpoints)
+
+        if welding_plan_df is None:
+            with self.memory_profiler.stage("plan materials"):
+                first_material = self._restore_materials(checkpoints)
+
+                # Index the batch database once instead of scanning it for every material
+                self._plan_materials(bi_reservations_excel.df, manufacturing_plan_excel.df,
+                                     self._index_batch_database(batch_database_excel.df), progress_callback, cancel_token,
+                                     checkpoints=checkpoints, first_material=first_material)
+
+            # Last chance to stop before anything is written to the disk
+            self._check_cancelled(cancel_token)
+
+            with self.memory_profiler.stage("build welding plan"):
+                welding_plan_df = self._assemble_welding_plan_df()
+
+            self._checkpoint_welding_plan(checkpoints, welding_plan_df)
+
+        self._check_cancelled(cancel_token)
+
+        # Generate the output Excel file
+        welding_plan_df = self._generate_output_excel(welding_plan_df)
+
+        if checkpoints is not None:
+            checkpoints.clear()
+
+        return welding_plan_df
+
+    def _open_checkpoints(self, bi_reservations_excel, manufacturing_plan_excel, batch_database_excel):
+        if self.checkpoint_directory is None:
+            return None
+
+        # Everything the plan depends on besides the input files, the plan also depends on today's date
+        parameters = {"planning_rules": vars(self.planning_rules),
+                      "capacity": vars(self.capacity_scheduler) if self.capacity_scheduler is not None else None,
+                      "scenario": vars(self.scenario),
+                      "plan_history": self.plan_history is not None,
+                      "date": date.today().isoformat()}
+
+        checkpoints = CheckpointStore(self.checkpoint_directory,
+                                      (bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                                       self.welding_planner_excel),
+                                      parameters)
+        checkpoints.prune()
+
+        return checkpoints
+
+    def _checkpoint_inputs(self, checkpoints, bi_reservations_excel, manufacturing_plan_excel, batch_database_excel):
+        if checkpoints is None:
+            return
+
+        with self.memory_profiler.stage("checkpoint inputs"):
+            checkpoints.save("inputs", {"bi_reservations": bi_reservations_excel.df,
+                                        "manufacturing_plan": manufacturing_plan_excel.df,
+                                        "batch_database": batch_database_excel.df,
+                                        "in_production": self.in_production_df,
+                                        "previous_plan": self.previous_plan_df})
+
+    def _restore_inputs(self, checkpoints, bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                        progress_callback):
+        inputs = checkpoints.load("inputs") if checkpoints is not None else None
+        if inputs is None:
+            return False
+
+        print(f"Resuming the planning from the checkpoints in '{checkpoints.run_directory}'.")
+
+        bi_reservations_excel.df = inputs["bi_reservations"]
+        manufacturing_plan_excel.df = inputs["manufacturing_plan"]
+        batch_database_excel.df = inputs["batch_database"]
+
+        if inputs["in_production"] is not None:
+            self._set_in_production_batches(inputs["in_production"])
+
+        self.previous_plan_df = inputs["previous_plan"]
+        self._update_progress_bar(progress_callback, 15)
+
+        return True
+
+    def _checkpoint_materials(self, checkpoints, next_material):
+        # Called at every material boundary, saves the batches planned since the last checkpoint
+        if time.perf_counter() - self.last_checkpoint_time < CHECKPOINT_INTERVAL_S:
+            return
+
+        with self.memory_profiler.stage("checkpoint materials"):
+            self.num_of_material_checkpoints += 1
+            checkpoints.save(f"materials-{self.num_of_material_checkpoints:06d}",
+                             {"next_material": next_material,
+                              "production_batches": self.production_batches[self.checkpointed_batches:],
+                              "batch_database_missing_parts": self.batch_database_missing_parts[self.checkpointed_missing_parts:]})
+
+        self.checkpointed_batches = len(self.production_batches)
+        self.checkpointed_missing_parts = len(self.batch_database_missing_parts)
+        self.last_checkpoint_time = time.perf_counter()
+
+    def _restore_materials(self, checkpoints):
+        # Returns the position of the first material still to plan
+        first_material = 0
+
+        if checkpoints is not None:
+            # Every checkpoint holds the batches planned since the previous one, a missing link ends the chain
+            for name in checkpoints.names("materials-"):
+                materials = checkpoints.load(name)
+                if materials is None:
+                    break
+
+                self.production_batches += materials["production_batches"]
+                self.batch_database_missing_parts += materials["batch_database_missing_parts"]
+                first_material = materials["next_material"]
+                self.num_of_material_checkpoints += 1
+
+        self.checkpointed_batches = len(self.production_batches)
+        self.checkpointed_missing_parts = len(self.batch_database_missing_parts)
+        self.last_checkpoint_time = time.perf_counter()
+
+        return first_material
+
+    def _checkpoint_welding_plan(self, checkpoints, welding_plan_df):
+        if checkpoints is None:
+            return
+
+        with self.memory_profiler.stage("checkpoint welding plan"):
+            checkpoints.save("welding_plan", {"welding_plan": welding_plan_df,
+                                              "batch_database_missing_parts": self.batch_database_missing_parts,
+                                              "invalid_deadline_parts": self.invalid_deadline_parts,
+                                              "capacity_load": self.capacity_load})
+
+    def _restore_welding_plan(self, checkpoints):
+        welding_plan = checkpoints.load("welding_plan") if checkpoints is not None else None
+        if welding_plan is None:
+            return None
+
+        self.batch_database_missing_parts = welding_plan["batch_database_missing_parts"]
+        self.invalid_deadline_parts = welding_plan["invalid_deadline_parts"]
+        self.capacity_load = welding_plan["capacity_load"]
+
+        return welding_plan["welding_plan"]
+
+    def _plan_plants(self, bi_reservations_excels, manufacturing_plan_excel, batch_database_excel,
+                     num_of_workers, progress_callback, cancel_token):
+        self.plants = list(bi_reservations_excels.keys())
+        self._check_plant_sheet_names()
+
+        # The master data is read and indexed once for all plants
+        with self.memory_profiler.stage("read manufacturing plan"):
+            manufacturing_plan_excel.df = manufacturing_plan_excel.read_excel()
+        self._update_progress_bar(progress_callback, 5)
+        self._check_cancelled(cancel_token)
+
+        with self.memory_profiler.stage("read batch database"):
+            batch_database_excel.df = batch_database_excel.read_excel()
+            batch_database_index = self._index_batch_database(batch_database_excel.df)
+        self._update_progress_bar(progress_callback, 10)
+        self._check_cancelled(cancel_token)
+
+        if self.welding_planner_excel != None:
+            self._load_in_production_batches()
+            self._load_previous_plan()
+
+        uses_worker_processes = self._uses_worker_processes(num_of_workers, len(self.plants))
+
+        tasks = {}
+        for plant, bi_reservations_excel in bi_reservations_excels.items():
+            if uses_worker_processes:
+                # The workbook pool of the run cannot be sent to a worker process, the workers open the files
+                bi_reservations_excel = ExcelDataManager(bi_reservations_excel.file_path, bi_reservations_excel.sheet_name,
+                                                         bi_reservations_excel.column_name_row,
+                                                         use_cache=bi_reservations_excel.use_cache)
+
+            tasks[plant] = (bi_reservations_excel, manufacturing_plan_excel.df, batch_database_index,
+                            self._plant_in_production_batches(plant), self.planning_rules,
+                            self.capacity_scheduler, self.scenario,
+                            None if uses_worker_processes else cancel_token)
+
+        # Every plant reads its own reservations, in the worker processes when there are any
+        with self.memory_profiler.stage("plan plants"):
+            results = self._run_tasks(plan_plant, tasks, num_of_workers, progress_callback, cancel_token,
+                                      progress_span=(15, 95))
+
+        # Last chance to stop before anything is written to the disk
+        self._check_cancelled(cancel_token)
+
+        plant_plan_dfs = []
+        for plant in self.plants:
+            welding_plan_df, batch_database_missing_parts, invalid_deadline_parts, capacity_load = results[plant]
+
+            self.plant_plans[plant] = welding_plan_df
+            self.batch_database_missing_parts += [(plant, mx) for mx in batch_database_missing_parts]
+            self.invalid_deadline_parts += [(plant, mx) for mx in invalid_deadline_parts]
+            self.capacity_load += [(plant,) + tuple(load) for load in capacity_load]
+
+            plant_plan_df = welding_plan_df.copy()
+            plant_plan_df.insert(0, "PLANT", plant)
+            plant_plan_dfs.append(plant_plan_df)
+
+        return self._generate_output_excel(pd.concat(plant_plan_dfs, ignore_index=True))
+
+    def _check_plant_sheet_names(self):
+        sheet_names = [self._plant_sheet_name(plant).lower() for plant in self.plants]
+
+        if len(set(sheet_names)) != len(sheet_names) or any(name in RESERVED_SHEET_NAMES for name in sheet_names):
+            raise ValueError(f"Plant names have to be unique (as sheet names) and must not be one of "
+                             f"{', '.join(RESERVED_SHEET_NAMES)}.")
+
+    def _plant_sheet_name(self, plant):
+        return INVALID_SHEET_NAME_CHARACTERS.sub("_", str(plant))[:31]
+
+    def _plant_in_production_batches(self, plant):
+        if self.in_production_df is None:
+            return None
+
+        if "PLANT" not in self.in_production_df.columns:
+            if self.in_production_df.shape[0] > 0:
+                raise ValueError("The batches in production of the previous welding plan have no PLANT, "
+                                 "update a multi-plant plan only with a multi-plant plan.")
+            return None
+
+        plant_rows = self.in_production_df["PLANT"].values == plant
+        return self.in_production_df[plant_rows].drop(columns="PLANT").reset_index(drop=True)
+
+    def _plan_scenarios(self, bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                        scenarios, num_of_workers, progress_callback, cancel_token):
+
+        self._read_inputs(bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                          progress_callback, cancel_token)
+
+        # The materials are prepared up to the project deadlines, whether the inventory covers
+        # them depends on the safety stock of the scenario
+        with self.memory_profiler.stage("prepare materials"):
+            prepared_materials = [planner_mx.copy() for planner_mx in
+                                  self._prepare_materials(bi_reservations_excel.df, manufacturing_plan_excel.df,
+                                                          self._index_batch_database(batch_database_excel.df),
+                                                          progress_callback, cancel_token,
+                                                          skip_covered_materials=False, progress_span=(15, 60))]
+        self.planner_mx = None
+
+        with self.memory_profiler.stage("evaluate scenarios"):
+            results = self._evaluate_scenarios(scenarios, prepared_materials, num_of_workers,
+                                               progress_callback, cancel_token)
+
+        # Last chance to stop before anything is written to the disk
+        self._check_cancelled(cancel_token)
+
+        with self.memory_profiler.stage("write scenarios workbook"):
+            self._write_scenarios_excel(scenarios, results)
 
+        self._update_progress_bar(progress_callback, 100)
+
+        return {scenario.name: results[scenario.name][0] for scenario in scenarios}
+
+    def _read_inputs(self, bi_reservations_excel, manufacturing_plan_excel, batch_database_excel,
+                     progress_callback, cancel_token):
         # Read and load data from the input Excel files
-        bi_reservations_excel.df = bi_reservations_excel.read_excel()
+        with self.memory_profiler.stage("read BI reservations"):
+            bi_reservations_excel.df = bi_reservations_excel.read_excel()
         self._update_progress_bar(progress_callback, 5)
+        self._check_cancelled(cancel_token)
         
-        manufacturing_plan_excel.df = manufacturing_plan_excel.read_excel()
+        with self.memory_profiler.stage("read manufacturing plan"):
+            manufacturing_plan_excel.df = manufacturing_plan_excel.read_excel()
         self._update_progress_bar(progress_callback, 10)
+        self._check_cancelled(cancel_token)
 
-        batch_database_excel.df = batch_database_excel.read_excel()
+        with self.memory_profiler.stage("read batch database"):
+            batch_database_excel.df = batch_database_excel.read_excel()
         self._update_progress_bar(progress_callback, 15)
+        self._check_cancelled(cancel_token)
 
         if self.welding_planner_excel != None:
-            self.welding_planner_excel.df = self.welding_planner_excel.read_excel()
+            self._load_in_production_batches()
+
+    def _plan_materials(self, bi_reservations_df, manufacturing_plan_df, batch_database_index,
+                        progress_callback, cancel_token, checkpoints=None, first_material=0):
+        if checkpoints is not None:
+            material_boundary = lambda next_material: self._checkpoint_materials(checkpoints, next_material)
+        else:
+            material_boundary = None
 
+        for _ in self._prepare_materials(bi_reservations_df, manufacturing_plan_df, batch_database_index,
+                                         progress_callback, cancel_token, first_material=first_material,
+                                         material_boundary=material_boundary):
+            self._plan_prepared_material()
+
+    def _prepare_materials(self, bi_reservations_df, manufacturing_plan_df, batch_database_index,
+                           progress_callback, cancel_token, skip_covered_materials=True, progress_span=(20, 100),
+                           first_material=0, material_boundary=None):
+        '''
+        Yields every material with reservations to plan, as self.planner_mx filled with its
+        reservations, inventory and project deadlines.
+
+        :param first_material: Position of the first material to prepare, the earlier ones are skipped
+        :param material_boundary: Called with the position of the next material once all materials
+                                  before it are planned
+        '''
         # Fill all the NaNs to zero in STAV_MAT column
-        self._fill_empty_cells(bi_reservations_excel.df["STAV_MAT"], 0)
+        self._fill_empty_cells(bi_reservations_df["STAV_MAT"], 0)
 
         # Get a list of unique material numbers
-        unique_MXs = self._get_unique_values_in_column(bi_reservations_excel.df, "CISLO_MAT")
+        unique_MXs = self._get_unique_values_in_column(bi_reservations_df, "CISLO_MAT")
+
+        # Evaluate the planning rules once for all reservations and group the eligible rows by material,
+        # the positions keep the original row order and index labels
+        self.stock_projects = self.planning_rules.stock_projects
+        eligible_reservations_df = bi_reservations_df[self.planning_rules.eligibility_mask(bi_reservations_df)]
+        eligible_rows_by_mx = eligible_reservations_df.groupby("CISLO_MAT", sort=False).indices
+
+        first_percentage, last_percentage = progress_span
 
         # Iterate through all unique material numbers
-        for index, current_mx in enumerate(unique_MXs):
-            self._update_progress_bar(progress_callback, int( (((index+1) /  unique_MXs.size) * 80) + 20) )
+        for index, current_mx in enumerate(unique_MXs[first_material:], start=first_material):
+            # Material boundary, stop here if the job was aborted
+            self._check_cancelled(cancel_token)
+
+            if material_boundary is not None:
+                material_boundary(index)
+
+            self._update_progress_bar(progress_callback, int( (((index+1) /  unique_MXs.size) * (last_percentage - first_percentage)) + first_percentage) )
 
             # Create a PlannerMX object for the current material number
             self.planner_mx = PlannerMX(current_mx)
 
             # Retrieve batch size and manufacturing time for the material number
-            self._get_batch_and_manufacturing_time(batch_database_excel.df)
+            self._get_batch_and_manufacturing_time(batch_database_index)
 
             if(self.planner_mx.batch_size == 0):
                 # Skip if the batch size is zero (missing parts in the batch database)
@@ -74,26 +493,88 @@ class WeldingPlanner():
                 continue
 
             # Filter and fill the MX planner with reservations data
-            self._filter_fill_mx_planner(bi_reservations_excel.df)
+            self._filter_fill_mx_planner(eligible_reservations_df, eligible_rows_by_mx.get(current_mx))
             
             # Skip if the dataframe is empty or if the inventory is sufficient
-            if( (self.planner_mx.df.shape[0] == 0) or (self._is_inventory_sufficient()) ):
+            if( (self.planner_mx.df.shape[0] == 0) or (skip_covered_materials and self._is_inventory_sufficient()) ):
                 continue
 
             # Retrieve project deadlines from the manufacturing plan dataframe
-            self._get_project_deadlines(manufacturing_plan_excel.df)
+            self._get_project_deadlines(manufacturing_plan_df)
             
             if(self.planner_mx.df.shape[0] == 0):
                 continue
 
-            # Drop projects covered by the inventory from the MX planner dataframe
-            self._drop_projects_covered_by_inventory()
+            yield self.planner_mx
 
-            # Generate production batches based on the MX planner dataframe
-            self._generate_production_batches()
+    def _plan_prepared_material(self):
+        # The inventory is compared with all reservations, also with those without a deadline
+        if self._is_inventory_sufficient():
+            return
 
-        # Generate the output Excel file
-        self._generate_output_excel()
+        # Apply the scenario, the safety stock is not available for the reservations
+        self.planner_mx.inventory -= self.scenario.safety_stock_of(self.planner_mx.mx)
+        self.planner_mx.batch_size = self.scenario.batch_size_of(self.planner_mx.mx, self.planner_mx.batch_size)
+
+        # Drop projects covered by the inventory from the MX planner dataframe
+        self._drop_projects_covered_by_inventory()
+
+        # Generate production batches based on the MX planner dataframe
+        self._generate_production_batches()
+
+    def _evaluate_scenarios(self, scenarios, prepared_materials, num_of_workers, progress_callback, cancel_token):
+        tasks = {scenario.name: (scenario, prepared_materials, self.in_production_df, self.planning_rules,
+                                 self.capacity_scheduler)
+                 for scenario in scenarios}
+
+        return self._run_tasks(evaluate_scenario, tasks, num_of_workers, progress_callback, cancel_token,
+                               progress_span=(60, 95))
+
+    def _uses_worker_processes(self, num_of_workers, num_of_tasks):
+        # Worker processes cannot start processes of their own
+        return num_of_workers > 1 and num_of_tasks > 1 and not multiprocessing.current_process().daemon
+
+    def _run_tasks(self, fn, tasks, num_of_workers, progress_callback, cancel_token, progress_span):
+        '''
+        Runs fn(*arguments) for every {key: arguments} task, in a spawned process pool when
+        more than one worker is allowed, and returns {key: result}.
+        '''
+        results = {}
+        first_percentage, last_percentage = progress_span
+
+        if self._uses_worker_processes(num_of_workers, len(tasks)):
+            executor = ProcessPoolExecutor(max_workers=min(num_of_workers, len(tasks)),
+                                           mp_context=multiprocessing.get_context("spawn"))
+            try:
+                futures = {executor.submit(fn, *arguments): key for key, arguments in tasks.items()}
+
+                for future in as_completed(futures):
+                    self._check_cancelled(cancel_token)
+                    results[futures[future]] = future.result()
+                    self._update_progress_bar(progress_callback, int(len(results) / len(tasks) * (last_percentage - first_percentage)) + first_percentage)
+
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+            executor.shutdown()
+            return results
+
+        for key, arguments in tasks.items():
+            self._check_cancelled(cancel_token)
+            results[key] = fn(*arguments)
+            self._update_progress_bar(progress_callback, int(len(results) / len(tasks) * (last_percentage - first_percentage)) + first_percentage)
+
+        return results
+
+    def _evaluate_prepared_materials(self, prepared_materials):
+        for prepared_mx in prepared_materials:
+            # The prepared materials are shared by all scenarios, the batching consumes its copy
+            self.planner_mx = prepared_mx.copy()
+            self._plan_prepared_material()
+
+        self.planner_mx = None
+        return self._assemble_welding_plan_df()
 
     def _fill_empty_cells(self, df, fill_value):
         df.fillna(fill_value, inplace=True)
@@ -102,19 +583,19 @@ class WeldingPlanner():
         return (df[column_title].unique())
     
     def _is_inventory_sufficient(self):
-        return (self.planner_mx.inventory >= int(self.planner_mx.df["reservation"].sum()) )
+        available_pieces = self.planner_mx.inventory - self.scenario.safety_stock_of(self.planner_mx.mx)
+        return (available_pieces >= self.planner_mx.reserved_pieces)
     
-    def _filter_fill_mx_planner(self, reservations_df):
-        # Filter rows based on specific conditions from the reservations dataframe
-        filtered_rows = reservations_df[(reservations_df['CISLO_MAT'] == self.planner_mx.mx) &
-                                        (reservations_df['_IB_KOKS'] != "S2024") & 
-                                        (reservations_df['CIS_OBJ'].str.get(1) != "K") &
-                                        (reservations_df['CIS_OBJ'] != 0)]
-
-        # Further filter rows to remove duplicates and specific values from "_IB_KOKS" column
+    def _filter_fill_mx_planner(self, eligible_reservations_df, row_positions):
+        # No reservation of this material passed the planning rules
+        if row_positions is None:
+            return
+
+        filtered_rows = eligible_reservations_df.iloc[row_positions]
+
+        # Further filter rows to remove duplicated projects, stock projects are always kept
         filtered_rows = filtered_rows[((~filtered_rows.duplicated("_IB_KOKS")) | 
-                                       (filtered_rows["_IB_KOKS"] == "M2023")  | 
-                                       (filtered_rows["_IB_KOKS"] == "M2024") )]
+                                       (filtered_rows["_IB_KOKS"].isin(self.stock_projects)) )]
         
         if(filtered_rows.shape[0] >= 1):
             filtered_rows.reset_index(drop=True)
@@ -127,23 +608,47 @@ class WeldingPlanner():
             self.planner_mx.df["project"] = filtered_rows["_IB_KOKS"]
             self.planner_mx.df["deadline"] = filtered_rows["DODATUMU"].dt.isocalendar().week
 
-    def _get_count_in_manufacturing(self):
-        retval = 0
+            # Sum of all reservations, the projects without a deadline are dropped later on
+            self.planner_mx.reserved_pieces = int(self.planner_mx.df["reservation"].sum())
+
+    def _load_in_production_batches(self):
+        if self.plan_history is not None:
+            # The last run of the previous plan is in the history, no need to parse the workbook
+            with self.memory_profiler.stage("query plan history"):
+                self.in_production_df = self.plan_history.in_production(self.welding_planner_excel)
+
+        if self.in_production_df is None:
+            with self.memory_profiler.stage("read previous welding plan"):
+                self.welding_planner_excel.df = self.welding_planner_excel.read_excel()
+
+                # Filter rows from the welding planner Excel DataFrame where "BATCH IN PRODUCTION" is greater than 0
+                self.in_production_df = self.welding_planner_excel.df[self.welding_planner_excel.df["BATCH IN PRODUCTION"].values > 0]
+                self.in_production_df = self.in_production_df.reset_index(drop=True)
+
+        self._set_in_production_batches(self.in_production_df)
+
+    def _set_in_production_batches(self, in_production_df):
+        self.in_production_df = in_production_df
+
+        # Sum of the items in production batches by material number
+        self.in_production_counts = self.in_production_df.groupby("MATERIAL NUMBER")["BATCH IN PRODUCTION"].sum().to_dict()
 
-        if(self.welding_planner_excel is not None):
-            # Filter rows based on material number and batches in production
-            in_manufacturing = self.welding_planner_excel.df[( (self.welding_planner_excel.df["MATERIAL NUMBER"] == self.planner_mx.mx) &
-                                                               (self.welding_planner_excel.df["BATCH IN PRODUCTION"].values > 0) )]
+    def _load_previous_plan(self):
+        # All batches of the previous plan, the new plan is compared with them
+        if self.plan_history is not None:
+            with self.memory_profiler.stage("query plan history"):
+                self.previous_plan_df = self.plan_history.latest_plan(self.welding_planner_excel)
 
-            if(in_manufacturing.shape[0] >= 1):
-                    # Calculate the sum of items in production batches
-                    retval = int(in_manufacturing["BATCH IN PRODUCTION"].sum())
+        if self.previous_plan_df is None:
+            # Not recorded in the history, the workbook was read for the batches in production
+            self.previous_plan_df = self.welding_planner_excel.df
 
-        return retval
+    def _get_count_in_manufacturing(self):
+        return int(self.in_production_counts.get(self.planner_mx.mx, 0))
     
     def _get_project_deadlines(self, manufacturing_plan_df):
-        # Filter out M2022 and M2023 projects from the PlannerMX dataframe
-        filtered_planner_mx_df = self.planner_mx.df[(self.planner_mx.df["project"] != "M2023") & (self.planner_mx.df["project"] != "M2024")]
+        # Filter out the stock projects from the PlannerMX dataframe, they have no deadline in the manufacturing plan
+        filtered_planner_mx_df = self.planner_mx.df[~self.planner_mx.df["project"].isin(self.stock_projects)]
 
         # Get unique project numbers from the filtered PlannerMX dataframe
         unique_project_numbers = self._get_unique_values_in_column(filtered_planner_mx_df, "project")
@@ -163,8 +668,7 @@ class WeldingPlanner():
                 filtered_planner_mx_df = filtered_planner_mx_df[filtered_planner_mx_df["project"].isin(projects_found)]
 
                 self.planner_mx.df = self.planner_mx.df[self.planner_mx.df["project"].isin(projects_found) |
-                                                       (self.planner_mx.df["project"] == "M2023") |
-                                                       (self.planner_mx.df["project"] == "M2024")]
+                                                       self.planner_mx.df["project"].isin(self.stock_projects)]
 
         # Sort the dataframes by project number and index them to match
         filtered_planner_mx_df = filtered_planner_mx_df.sort_values("project", ascending=True)
@@ -172,8 +676,8 @@ class WeldingPlanner():
         filtered_manufacturing_plan_df.index = filtered_planner_mx_df.index
 
         # Update the PlannerMX dataframe's "deadline" column with the manufacturing plan's delivery week
-        self.planner_mx.df.loc[(self.planner_mx.df["project"] != "M2023") & 
-                               (self.planner_mx.df["project"] != "M2024"), "deadline"] = filtered_manufacturing_plan_df["CURRENT DELIVERY WEEK "]
+        self.planner_mx.df.loc[~self.planner_mx.df["project"].isin(self.stock_projects),
+                               "deadline"] = filtered_manufacturing_plan_df["CURRENT DELIVERY WEEK "]
         
     def _drop_projects_covered_by_inventory(self):
         # Sort the merged subsets by delivery week and reset row indeces
@@ -196,45 +700,36 @@ class WeldingPlanner():
                 self.temp_pieces_in_batch = (self.planner_mx.inventory + reserved_pieces_count)
                 break
 
-    def _get_batch_and_manufacturing_time(self, batch_databse_df):
-            filtered_batch_database_df = batch_databse_df[batch_databse_df["Číslo"] == self.planner_mx.mx]
+    def _index_batch_database(self, batch_database_df):
+        # Keep the first row of every material number, as the row by row lookup did
+        unique_batch_database_df = batch_database_df.drop_duplicates(subset="Číslo", keep="first")
+
+        return dict(zip(unique_batch_database_df["Číslo"].values,
+                        zip(unique_batch_database_df["Norma Kooperace"].values,
+                            unique_batch_database_df["Dávka"].values)))
+
+    def _get_batch_and_manufacturing_time(self, batch_database_index):
+            batch_database_row = batch_database_index.get(self.planner_mx.mx)
 
             # Check if not empty
-            if(filtered_batch_database_df.shape[0] != 0):
-                manufacturing_cooperation_time = filtered_batch_database_df["Norma Kooperace"].values[0]
+            if(batch_database_row is not None):
+                manufacturing_cooperation_time, batch_size = batch_database_row
 
                 # Check if the material cooperation time exists, if == "X", it does not exist yet, skip this CurrentMaterialNumber
                 if(manufacturing_cooperation_time != "X"):
                     self.planner_mx.cooperation_time = int(np.ceil(manufacturing_cooperation_time/7))
-                    self.planner_mx.batch_size = int(filtered_batch_database_df["Dávka"].values[0])
+                    self.planner_mx.batch_size = int(batch_size)
 
     def _generate_production_batches(self):
-        TodaysDate = date.today()
-
-        # CONFIG VARIABLES --> CAN BE CHANGED TO BE MORE OR LESS CONSERVATIVE
-        #MaterialDeliveryTimeInWeeks = 4
-        MaterialPickingTimeInWeeks = 2
-        AssemblyTimeInWeeks = 1
-
-        production_batch = [0] * 6
+        production_batch = [0] * 5
         
         while(self.planner_mx.df.shape[0] > 0):
-            # Set the values for this production batch
+            # Set the values for this production batch, the dates are computed for all batches at once
             production_batch[0] = self.planner_mx.mx
             production_batch[1] = self.planner_mx.name
             production_batch[2] = self.planner_mx.batch_size
-            try:                        
-                production_batch[3] = Week(TodaysDate.year, int(self.planner_mx.df['deadline'].values[0]
-                                                    - MaterialPickingTimeInWeeks 
-                                                    - AssemblyTimeInWeeks)).monday()
-            except:
-                print(f"failed at {self.planner_mx.mx}")
-
-            production_batch[4] = Week(TodaysDate.year, int(self.planner_mx.df['deadline'].values[0]
-                                                    - MaterialPickingTimeInWeeks
-                                                    - AssemblyTimeInWeeks
-                                                    - self.planner_mx.cooperation_time)).monday()
-            production_batch[5] = 0
+            production_batch[3] = self.planner_mx.df['deadline'].values[0]
+            production_batch[4] = self.planner_mx.cooperation_time
 
             # Add the production batch to the list of batches
             self.production_batches.append(production_batch.copy())
@@ -268,15 +763,104 @@ class WeldingPlanner():
                     self.planner_mx.df.drop(self.planner_mx.df.index[0:num_of_rows_to_be_deleted], inplace=True)
                     break
 
-    def _generate_output_excel(self):
+    def _build_welding_plan_df(self):
+        TodaysDate = date.today()
+
+        # Lead times of the scenario --> CAN BE CHANGED TO BE MORE OR LESS CONSERVATIVE
+        MaterialDeliveryTimeInWeeks = self.scenario.material_delivery_weeks
+        MaterialPickingTimeInWeeks = self.scenario.material_picking_weeks
+        AssemblyTimeInWeeks = self.scenario.assembly_weeks
+
+        batches_df = pd.DataFrame(self.production_batches,
+                                  columns=["MATERIAL NUMBER",
+                                           "NAME",
+                                           "PIECES IN BATCH",
+                                           "DEADLINE WEEK",
+                                           "COOPERATION WEEKS"])
+
+        # Week numbers relative to this year, a missing or non-numeric deadline becomes NaN
+        deadline_weeks = pd.to_numeric(batches_df["DEADLINE WEEK"], errors="coerce").to_numpy(dtype=float)
+        ready_for_picking_weeks = deadline_weeks - MaterialPickingTimeInWeeks - AssemblyTimeInWeeks
+        welding_completed_weeks = ready_for_picking_weeks - batches_df["COOPERATION WEEKS"].to_numpy(dtype=float)
+
+        invalid_deadlines = np.isnan(deadline_weeks)
+        if invalid_deadlines.any():
+            self.invalid_deadline_parts = list(pd.unique(batches_df["MATERIAL NUMBER"].values[invalid_deadlines]))
+            print(f"Invalid deadline for {len(self.invalid_deadline_parts)} material numbers")
+
+        # Map the week offsets of both date columns to Mondays in one array operation each
+        welding_plan_df = pd.DataFrame({"MATERIAL NUMBER": batches_df["MATERIAL NUMBER"],
+                                        "NAME": batches_df["NAME"],
+                                        "PIECES IN BATCH": batches_df["PIECES IN BATCH"],
+                                        "READY FOR PICKING": self.iso_week_calendar.mondays_of(TodaysDate.year, ready_for_picking_weeks),
+                                        "WELDING COMPLETED": self.iso_week_calendar.mondays_of(TodaysDate.year, welding_completed_weeks)})
+
+        if MaterialDeliveryTimeInWeeks is not None:
+            # The material has to be in stock this many weeks before the welding is completed
+            welding_plan_df["MATERIAL DELIVERY"] = self.iso_week_calendar.mondays_of(
+                TodaysDate.year, welding_completed_weeks - MaterialDeliveryTimeInWeeks)
+
+        if self.capacity_scheduler is not None:
+            # Level the welding load, a batch is welded at the latest in its WELDING COMPLETED week
+            welding_weeks = self.capacity_scheduler.assign_weeks(welding_completed_weeks,
+                                                                 batches_df["MATERIAL NUMBER"].values,
+                                                                 batches_df["PIECES IN BATCH"].values,
+                                                                 first_week=self._current_week(TodaysDate))
+            welding_plan_df["WELDING WEEK"] = self.iso_week_calendar.mondays_of(TodaysDate.year, welding_weeks)
+
+            self.capacity_load = [(workcentre, self.iso_week_calendar.mondays_of(TodaysDate.year, [week])[0], load, capacity)
+                                  for workcentre, week, load, capacity in
+                                  self.capacity_scheduler.weekly_load(welding_weeks,
+                                                                      batches_df["MATERIAL NUMBER"].values,
+                                                                      batches_df["PIECES IN BATCH"].values)]
+
+        welding_plan_df["BATCH IN PRODUCTION"] = 0
+
+        return welding_plan_df
+
+    def _current_week(self, todays_date):
+        # This week as a week number relative to week 1 of this year (0 or less in late December ISO years)
+        week_one_monday = date.fromisocalendar(todays_date.year, 1, 1)
+        return (todays_date - week_one_monday).days // 7 + 1
+
+    def _generate_output_excel(self, welding_plan_df=None):
+        if welding_plan_df is None:
+            with self.memory_profiler.stage("build welding plan"):
+                welding_plan_df = self._assemble_welding_plan_df()
+
+        if self.previous_plan_df is not None:
+            with self.memory_profiler.stage("compare with previous plan"):
+                self.changes_df = diff_welding_plans(self.previous_plan_df, welding_plan_df)
+
+        with self.memory_profiler.stage("write output workbook"):
+            output_sheets = self._output_sheets(welding_plan_df)
+
+            # An output with the same content is left alone, no slow save and no new file for the sync clients
+            content_hash = frames_hash(output_sheets)
+            self.output_unchanged = is_unchanged(self.output_path, content_hash_path(self.output_path), content_hash)
+
+            if self.output_unchanged:
+                print(f"'{self.output_path}' is unchanged, it is not written again.")
+                welding_plan_df.attrs[OUTPUT_UNCHANGED_ATTRIBUTE] = True
+            else:
+                self._write_output_excel(output_sheets)
+                record_content_hash(self.output_path, content_hash_path(self.output_path), content_hash)
+
+                if self.changes_df is not None:
+                    # The changes also go to a CSV file for other tools
+                    self.changes_df.to_csv(plan_changes_path(self.output_path), index=False, date_format="%Y-%m-%d")
+
+        # An unchanged output is already recorded by its last run, unless the history missed it
+        if self.plan_history is not None and not (self.output_unchanged and
+                                                  self.plan_history.is_recorded(self.output_path)):
+            with self.memory_profiler.stage("record plan history"):
+                self.plan_history.record_run(welding_plan_df, self.output_path)
+
+        return welding_plan_df
+
+    def _assemble_welding_plan_df(self):
         # Create a DataFrame from the production batches:
-        welding_plan_df = pd.DataFrame(self.production_batches, 
-                                       columns=["MATERIAL NUMBER", 
-                                                "NAME", 
-                                                "PIECES IN BATCH", 
-                                                "READY FOR PICKING", 
-                                                "WELDING COMPLETED", 
-                                                "BATCH IN PRODUCTION"])
+        welding_plan_df = self._build_welding_plan_df()
         
         # Sort the DataFrame by "READY FOR PICKING" column in ascending order
         welding_plan_df.sort_values("READY FOR PICKING", ascending=True, inplace=True)
@@ -284,16 +868,48 @@ class WeldingPlanner():
         # Reset the index of the DataFrame
         welding_plan_df.reset_index(drop=True, inplace=True)
 
-        if(self.welding_planner_excel != None):
-            # Filter rows from the welding planner Excel DataFrame where "BATCH IN PRODUCTION" is greater than 0
-            in_manufacturing_rows = self.welding_planner_excel.df[self.welding_planner_excel.df["BATCH IN PRODUCTION"].values > 0]
-            in_manufacturing_rows.reset_index(drop=True, inplace=True)
+        if(self.in_production_df is not None):
+            # Concatenate the batches in production with the welding plan DataFrame
+            welding_plan_df = pd.concat([self.in_production_df, welding_plan_df], ignore_index=True)
+
+        return welding_plan_df
+
+    def _output_sheets(self, welding_plan_df):
+        # The (sheet name, DataFrame) pairs of the output workbook in the order of the sheets
+        output_sheets = [("Welding Plan", welding_plan_df)]
+
+        if(self.changes_df is not None):
+            # Added, removed and re-dated batches against the previous plan
+            output_sheets.append(("Changes", self.changes_df))
+
+        for plant in self.plants:
+            # The plan of every plant as a separate run would write it
+            output_sheets.append((self._plant_sheet_name(plant), self.plant_plans[plant]))
+
+        # The lists of a multi-plant plan name the plant of every row
+        plant_columns = ["PLANT"] if self.plants else []
+
+        if(len(self.invalid_deadline_parts) > 0):
+            # Batches of these material numbers have no READY FOR PICKING / WELDING COMPLETED date
+            invalid_deadline_df = pd.DataFrame(self.invalid_deadline_parts, columns=plant_columns + ["MATERIAL NUMBER"])
+            output_sheets.append(("Invalid deadline", invalid_deadline_df))
 
-            # Concatenate the filtered rows with the welding plan DataFrame
-            welding_plan_df = pd.concat([in_manufacturing_rows, welding_plan_df], ignore_index=True)
+        if(len(self.capacity_load) > 0):
+            # Welding load of every workcentre and week after the capacity levelling
+            capacity_load_df = pd.DataFrame(self.capacity_load,
+                                            columns=plant_columns + ["WORKCENTRE", "WELDING WEEK", "LOAD", "CAPACITY"])
+            output_sheets.append(("Capacity load", capacity_load_df))
 
-        # Specify the output path for the Excel file
-        path = "./output"
+        if(len(self.batch_database_missing_parts) > 0):
+            # Create a DataFrame from the batch database missing parts list
+            x_database_missing_df = pd.DataFrame(self.batch_database_missing_parts, columns=plant_columns + ["MATERIAL NUMBER"])
+            output_sheets.append(("X_database missing", x_database_missing_df))
+
+        return output_sheets
+
+    def _write_output_excel(self, output_sheets):
+        # Specify the output directory for the Excel file
+        path = os.path.dirname(self.output_path) or "."
 
         # Check whether the specified path exists or not
         isExist = os.path.exists(path)
@@ -303,20 +919,106 @@ class WeldingPlanner():
             os.makedirs(path)
 
         # Create an Excel file and write the DataFrames to different sheets
-        with pd.ExcelWriter("output/WeldingPlan.xlsx") as writer:
-            # Write the welding plan DataFrame to the "WeldingPlan" sheet
-            welding_plan_df.to_excel(writer, sheet_name="Welding Plan", index=False)
+        with pd.ExcelWriter(self.output_path, date_format="YYYY-MM-DD", datetime_format="YYYY-MM-DD") as writer:
+            for sheet_name, sheet_df in output_sheets:
+                sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+    def _write_scenarios_excel(self, scenarios, results):
+        path = os.path.dirname(self.output_path) or "."
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        with pd.ExcelWriter(self.output_path, date_format="YYYY-MM-DD", datetime_format="YYYY-MM-DD") as writer:
+            self._build_comparison_df(scenarios, results).to_excel(writer, sheet_name="Comparison", index=False)
+
+            for scenario in scenarios:
+                welding_plan_df = results[scenario.name][0]
+                welding_plan_df.to_excel(writer, sheet_name=scenario.sheet_name, index=False)
 
             if(len(self.batch_database_missing_parts) > 0):
-                # Create a DataFrame from the batch database missing parts list
+                # The same for all scenarios, the batch database is not part of a scenario
                 x_database_missing_df = pd.DataFrame(self.batch_database_missing_parts, columns=["MATERIAL NUMBER"])
-
-                # Write the batch database missing parts DataFrame to the "X_database missing" sheet
                 x_database_missing_df.to_excel(writer, sheet_name="X_database missing", index=False)
 
+    def _build_comparison_df(self, scenarios, results):
+        rows = []
+        for scenario in scenarios:
+            welding_plan_df, invalid_deadline_parts, capacity_load = results[scenario.name]
+
+            # Only the newly planned batches, the batches already in production are the same in all scenarios
+            planned_df = welding_plan_df[welding_plan_df["BATCH IN PRODUCTION"].values == 0]
+            pieces_by_week = planned_df.groupby("WELDING COMPLETED")["PIECES IN BATCH"].sum()
+
+            rows.append({"SCENARIO": scenario.name,
+                         "MATERIAL PICKING WEEKS": scenario.material_picking_weeks,
+                         "ASSEMBLY WEEKS": scenario.assembly_weeks,
+                         "MATERIAL DELIVERY WEEKS": scenario.material_delivery_weeks,
+                         "BATCH SIZE OVERRIDES": len(scenario.batch_sizes),
+                         "SAFETY STOCK": (f"{len(scenario.safety_stock)} materials" if isinstance(scenario.safety_stock, dict)
+                                          else scenario.safety_stock),
+                         "BATCHES": planned_df.shape[0],
+                         "PIECES": int(planned_df["PIECES IN BATCH"].sum()),
+                         "MATERIALS": planned_df["MATERIAL NUMBER"].nunique(),
+                         "FIRST WELDING COMPLETED": planned_df["WELDING COMPLETED"].min(),
+                         "LAST WELDING COMPLETED": planned_df["WELDING COMPLETED"].max(),
+                         "PEAK WEEKLY PIECES": int(pieces_by_week.max()) if pieces_by_week.size > 0 else 0,
+                         "OVERLOADED WEEKS": sum(1 for _, _, load, capacity in capacity_load if load > capacity),
+                         "INVALID DEADLINES": len(invalid_deadline_parts)})
+
+        comparison_df = pd.DataFrame(rows)
+
+        # Differences to the first scenario, the reference of the comparison
+        for column in ("BATCHES", "PIECES"):
+            comparison_df[f"{column} VS {scenarios[0].name}"] = comparison_df[column] - comparison_df[column].iloc[0]
+
+        return comparison_df
+
+    def _check_cancelled(self, cancel_token):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
     def _update_progress_bar(self, progress_callback, percentage):
+        # Headless runs (daemon, service) have no progress bar
+        if progress_callback is None:
+            return
+
         try:
             progress_callback.emit(percentage)
         except Exception as e:
             print("An error occured while updating the progress bar")
 
+def evaluate_scenario(scenario, prepared_materials, in_production_df, planning_rules, capacity_scheduler):
+    '''
+    Batches the prepared materials for one scenario, returns the (welding plan DataFrame,
+    invalid deadline parts, capacity load) of the scenario. A module level function so
+    that it can run in a worker process.
+    '''
+    welding_planner = WeldingPlanner(output_path=None, planning_rules=planning_rules,
+                                     capacity_scheduler=capacity_scheduler, scenario=scenario)
+    welding_planner.in_production_df = in_production_df
+
+    welding_plan_df = welding_planner._evaluate_prepared_materials(prepared_materials)
+
+    return (welding_plan_df, welding_planner.invalid_deadline_parts, welding_planner.capacity_load)
+
+def plan_plant(bi_reservations_excel, manufacturing_plan_df, batch_database_index, in_production_df,
+               planning_rules, capacity_scheduler, scenario, cancel_token=None):
+    '''
+    Plans the welding of one plant on the shared master data, returns the (welding plan
+    DataFrame, batch database missing parts, invalid deadline parts, capacity load) of the
+    plant. A module level function so that it can run in a worker process.
+    '''
+    welding_planner = WeldingPlanner(output_path=None, planning_rules=planning_rules,
+                                     capacity_scheduler=capacity_scheduler, scenario=scenario)
+
+    if in_production_df is not None:
+        welding_planner._set_in_production_batches(in_production_df)
+
+    bi_reservations_df = bi_reservations_excel.read_excel()
+    welding_planner._plan_materials(bi_reservations_df, manufacturing_plan_df, batch_database_index,
+                                    None, cancel_token)
+
+    welding_plan_df = welding_planner._assemble_welding_plan_df()
+
+    return (welding_plan_df, welding_planner.batch_database_missing_parts,
+            welding_planner.invalid_deadline_parts, welding_planner.capacity_load)
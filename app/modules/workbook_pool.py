@@ -0,0 +1,140 @@
+"""
+Module: WorkbookPool
+Description: This module keeps the Excel workbooks of one run open, so every file is
+             opened and parsed once no matter how many of its sheets are read. A file
+             the run updates is loaded once as a writable openpyxl workbook, its sheets
+             are read from that same workbook and it is saved once at the end of the run.
+             A file that is only read goes through a read-only pandas ExcelFile, which
+             parses faster. All handles are closed when the pool is closed.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import os
+import openpyxl
+import pandas as pd
+
+class WorkbookPool():
+    '''
+    Open workbook handles of one run, keyed by the normalized file path.
+
+    Usage:
+        with WorkbookPool(writable_paths=[dst_excel.file_path]) as workbook_pool:
+            excel_data_manager.workbook_pool = workbook_pool
+            ...
+        # modified workbooks are saved and all handles closed here
+
+    When the block raises, the modified workbooks are not saved.
+
+    A writable workbook keeps the formulas but not their last calculated values, so a
+    sheet with formula cells is read from a separate read-only handle, as Excel shows it.
+
+    :param writable_paths: Files the run writes into, read from their writable workbook
+
+    '''
+    def __init__(self, writable_paths=()):
+        self._paths = {}
+        self._excel_files = {}
+        self._value_excel_files = {}
+        self._workbooks = {}
+        self._modified = set()
+        self._writable = {self._key(file_path) for file_path in writable_paths}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.save()
+        finally:
+            self.close()
+
+    def excel_file(self, file_path):
+        '''
+        Returns the shared pandas ExcelFile of the file, the workbook is parsed on first use.
+        '''
+        key = self._key(file_path)
+
+        if key not in self._excel_files:
+            if key in self._writable or key in self._workbooks:
+                # Built on the writable workbook, the file is not parsed a second time
+                self._excel_files[key] = pd.ExcelFile(self._load_workbook(key), engine="openpyxl")
+            else:
+                self._value_excel_files[key] = pd.ExcelFile(file_path, engine="openpyxl")
+                self._excel_files[key] = self._value_excel_files[key]
+
+        return self._excel_files[key]
+
+    def parse(self, file_path, sheet_name, **kwargs):
+        '''
+        Returns the sheet as a DataFrame of the cell values, kwargs go to ExcelFile.parse.
+        '''
+        excel_file = self.excel_file(file_path)
+        key = self._key(file_path)
+
+        if key in self._workbooks and _has_formulas(_worksheet(self._workbooks[key], sheet_name)):
+            if key not in self._value_excel_files:
+                self._value_excel_files[key] = pd.ExcelFile(file_path, engine="openpyxl")
+            excel_file = self._value_excel_files[key]
+
+        return excel_file.parse(sheet_name, **kwargs)
+
+    def workbook(self, file_path):
+        '''
+        Returns the writable openpyxl workbook of the file and marks it as modified.
+        '''
+        key = self._key(file_path)
+        workbook = self._load_workbook(key)
+
+        self._modified.add(key)
+        return workbook
+
+    def save(self):
+        for key in sorted(self._modified):
+            # A read-only handle keeps the file open, Windows would not let us replace it
+            if key in self._value_excel_files:
+                value_excel_file = self._value_excel_files.pop(key)
+                value_excel_file.close()
+                if self._excel_files.get(key) is value_excel_file:
+                    del self._excel_files[key]
+
+            self._workbooks[key].save(self._paths[key])
+
+        self._modified.clear()
+
+    def close(self):
+        for excel_file in self._value_excel_files.values():
+            excel_file.close()
+
+        for workbook in self._workbooks.values():
+            workbook.close()
+
+        self._excel_files.clear()
+        self._value_excel_files.clear()
+        self._workbooks.clear()
+        self._modified.clear()
+
+    def _load_workbook(self, key):
+        if key not in self._workbooks:
+            self._workbooks[key] = openpyxl.load_workbook(self._paths[key])
+
+        return self._workbooks[key]
+
+    def _key(self, file_path):
+        key = os.path.normcase(os.path.abspath(file_path))
+        self._paths.setdefault(key, file_path)
+        return key
+
+def _worksheet(workbook, sheet_name):
+    if isinstance(sheet_name, int):
+        return workbook.worksheets[sheet_name]
+
+    return workbook[sheet_name]
+
+def _has_formulas(worksheet):
+    return any(cell.data_type == "f" for row in worksheet.iter_rows() for cell in row)
@@ -0,0 +1,105 @@
+"""
+Module: WorkbookPreview
+Description: This module reads the structure of a workbook, its sheet names and the first
+             rows of every sheet, without parsing the sheets. The GUI offers the sheet names
+             and column titles of the selected files as completions. The previews are cached
+             by the file identity, a changed file is read again.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# local module imports
+from .frame_cache import file_identity
+from .schema_validator import pandas_column_titles
+
+# external module imports
+import os
+from collections import OrderedDict
+
+# Rows read from the top of every sheet, the column title row has to be one of them
+PREVIEW_ROWS = 20
+
+class WorkbookPreview():
+    '''
+    Sheet names and the first rows of the sheets of one workbook.
+
+    :param identity: File identity (path, size, modification time) of the read workbook
+    :param sheets: dict {sheet name: list of row value tuples}, in the workbook order
+
+    '''
+    def __init__(self, identity, sheets):
+        self.identity = identity
+        self.sheets = sheets
+
+    @property
+    def sheet_names(self):
+        return list(self.sheets.keys())
+
+    def column_titles(self, sheet_name, column_title_row):
+        '''
+        Returns the column titles of the sheet, as the tools name them, an empty list when
+        the sheet or the row is not in the preview.
+        '''
+        rows = self.sheets.get(sheet_name)
+        if rows is None or not (1 <= column_title_row <= len(rows)):
+            return []
+
+        return [str(title) for title in pandas_column_titles(rows[column_title_row - 1])]
+
+def read_workbook_preview(file_path, progress_callback=None, cancel_token=None):
+    # Imported in the worker thread, the GUI must not wait for openpyxl
+    import openpyxl
+
+    identity = file_identity(file_path)
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+
+    try:
+        sheets = OrderedDict()
+        for worksheet in workbook.worksheets:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            # Read-only sheets are streamed, only the first rows are parsed
+            sheets[worksheet.title] = list(worksheet.iter_rows(max_row=PREVIEW_ROWS, values_only=True))
+
+        return WorkbookPreview(identity, sheets)
+
+    finally:
+        workbook.close()
+
+class WorkbookPreviewCache():
+    '''
+    The previews of the last selected workbooks, used only from the GUI thread.
+    '''
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._previews = OrderedDict()
+
+    def get(self, file_path):
+        '''
+        Returns the preview of the file, None when it was not read or changed since.
+        '''
+        try:
+            identity = file_identity(file_path)
+        except OSError:
+            return None
+
+        preview = self._previews.get(identity[0])
+        if preview is None or preview.identity != identity:
+            return None
+
+        self._previews.move_to_end(identity[0])
+        return preview
+
+    def put(self, preview):
+        self._previews[preview.identity[0]] = preview
+        self._previews.move_to_end(preview.identity[0])
+
+        while len(self._previews) > self.max_entries:
+            self._previews.popitem(last=False)
+
+def is_same_file(file_path, preview):
+    return os.path.normcase(os.path.abspath(file_path)) == preview.identity[0]
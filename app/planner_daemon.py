@@ -0,0 +1,58 @@
+"""
+MasterPlanner Daemon
+
+Description: This module is the headless entry point of the welding planner. It watches
+             a directory for new BI exports and updates the welding plan automatically.
+
+             Example:
+                 python planner_daemon.py //server/bi_exports --output //server/plans/WeldingPlan.xlsx
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import argparse
+import signal
+
+# local module imports
+from modules.watch_daemon import WatchDaemon
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-plan the welding whenever new BI exports arrive.")
+    parser.add_argument("directory", help="directory the BI exports are dropped into")
+    parser.add_argument("--output", default="output/WeldingPlan.xlsx", help="welding plan to create and update")
+    parser.add_argument("--reservations-pattern", default="*reserv*.xlsx")
+    parser.add_argument("--manufacturing-plan-pattern", default="*manuf*.xlsx")
+    parser.add_argument("--batch-database-pattern", default="*batch*.xlsx")
+    parser.add_argument("--reservations-title-row", type=int, default=1)
+    parser.add_argument("--manufacturing-plan-title-row", type=int, default=1)
+    parser.add_argument("--batch-database-title-row", type=int, default=2)
+    parser.add_argument("--settle-seconds", type=float, default=10,
+                        help="how long a file has to stay unchanged before it is used")
+    parser.add_argument("--poll-interval", type=float, default=5, help="seconds between directory scans")
+    parser.add_argument("--cache-mb", type=int, default=512, help="memory for parsed inputs kept between runs")
+    args = parser.parse_args()
+
+    daemon = WatchDaemon(args.directory,
+                         patterns={"bi_reservations": args.reservations_pattern,
+                                   "manufacturing_plan": args.manufacturing_plan_pattern,
+                                   "batch_database": args.batch_database_pattern},
+                         column_title_rows={"bi_reservations": args.reservations_title_row,
+                                            "manufacturing_plan": args.manufacturing_plan_title_row,
+                                            "batch_database": args.batch_database_title_row},
+                         output_path=args.output,
+                         settle_seconds=args.settle_seconds,
+                         poll_interval=args.poll_interval,
+                         max_cache_bytes=args.cache_mb * 1024 * 1024)
+
+    # Stop cleanly, a running plan stops at its next material boundary
+    signal.signal(signal.SIGINT, lambda signum, frame: daemon.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+
+    daemon.run_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+MasterPlanner Scenarios
+
+Description: This module is the entry point of the what-if welding planning. It plans
+             the welding for every scenario of a scenarios file and writes one workbook
+             with a sheet per scenario and a comparison of the scenarios.
+
+             Example:
+                 python scenarios.py reservations.xlsx manufacturing_plan.xlsx batch_database.xlsx
+                        --scenarios config/scenarios.example.json --workers 2
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import argparse
+
+# local module imports
+from modules import jobs
+from modules.excel_data_manager import ExcelDataManager
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare welding plans of several planning scenarios.")
+    parser.add_argument("bi_reservations")
+    parser.add_argument("manufacturing_plan")
+    parser.add_argument("batch_database")
+    parser.add_argument("--scenarios", default="config/scenarios.json", help="scenarios file")
+    parser.add_argument("--previous-plan", help="welding plan with the batches in production")
+    parser.add_argument("--output", default=jobs.DEFAULT_SCENARIOS_OUTPUT_PATH)
+    parser.add_argument("--reservations-title-row", type=int, default=1)
+    parser.add_argument("--manufacturing-plan-title-row", type=int, default=1)
+    parser.add_argument("--batch-database-title-row", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1, help="processes evaluating the scenarios")
+    args = parser.parse_args()
+
+    welding_planner_excel = None
+    if args.previous_plan:
+        welding_planner_excel = ExcelDataManager(args.previous_plan, "Welding Plan", 0)
+
+    welding_plans = jobs.run_welding_scenarios(ExcelDataManager(args.bi_reservations, 0, args.reservations_title_row - 1),
+                                               ExcelDataManager(args.manufacturing_plan, 0, args.manufacturing_plan_title_row - 1),
+                                               ExcelDataManager(args.batch_database, 0, args.batch_database_title_row - 1),
+                                               args.scenarios, welding_planner_excel=welding_planner_excel,
+                                               output_path=args.output, num_of_workers=args.workers)
+
+    for name, welding_plan_df in welding_plans.items():
+        print(f"{name}: {welding_plan_df.shape[0]} batches")
+
+    print(f"Scenarios written to {args.output}")
+
+if __name__ == "__main__":
+    main()
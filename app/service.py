@@ -0,0 +1,43 @@
+"""
+MasterPlanner Service
+
+Description: This module is the entry point of the local planning service. It serves
+             the welding planner and the data filler over HTTP/JSON on localhost.
+
+             Example:
+                 python service.py --port 8765
+                 curl http://127.0.0.1:8765/health
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import argparse
+
+# local module imports
+from modules.planning_service import PlanningService
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the MasterPlanner tools over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4, help="requests processed at the same time")
+    parser.add_argument("--cache-mb", type=int, default=1024, help="memory for parsed master data")
+    args = parser.parse_args()
+
+    service = PlanningService(host=args.host, port=args.port, max_workers=args.workers,
+                              max_cache_bytes=args.cache_mb * 1024 * 1024)
+
+    host, port = service.server_address[:2]
+    print(f"MasterPlanner service listening on http://{host}:{port}", flush=True)
+
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Module: conftest
+Description: Shared pytest setup. The app runs from its own directory and imports its
+             packages (modules, benchmarks) from there, the tests do the same.
+
+             Run from the app directory:
+                 python -m pytest -q tests
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import os
+import sys
+
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if APP_DIRECTORY not in sys.path:
+    sys.path.insert(0, APP_DIRECTORY)
+
+# Qt widgets are created without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
@@ -0,0 +1,126 @@
+"""
+Module: test_job_scheduler
+Description: Tests of the JobScheduler. The scheduler runs in a child interpreter, a worker
+             touching a deleted Qt object aborts the whole process and would take pytest
+             down with it.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import json
+import os
+import subprocess
+import sys
+
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACK_TO_BACK_JOBS = """
+import json
+import time
+from PyQt6.QtCore import QCoreApplication, QTimer
+from modules.job_scheduler import JobScheduler
+from modules.thread_worker import ThreadWorker
+
+class LateFinishingWorker(ThreadWorker):
+    # Widens the gap between the result and the finished signal, the scheduler handles
+    # the result while the worker thread still uses its signals
+    def run(self):
+        self.signals.result.emit(self.fn(*self.args, **self.kwargs))
+        time.sleep(0.02)
+        self.signals.finished.emit()
+
+def job(number, progress_callback, cancel_token):
+    return number
+
+app = QCoreApplication([])
+scheduler = JobScheduler(max_concurrent_jobs=2, worker_factory=LateFinishingWorker)
+statuses = []
+
+def quit_when_idle():
+    # Quitting tears the Qt objects down, it must wait until no worker uses its signals
+    if len(statuses) == NUM_OF_JOBS and scheduler.is_idle():
+        app.quit()
+
+def job_finished(job_result):
+    statuses.append(job_result.status)
+    quit_when_idle()
+
+scheduler.job_finished.connect(job_finished)
+for number in range(NUM_OF_JOBS):
+    scheduler.submit(job, number)
+
+idle_timer = QTimer()
+idle_timer.timeout.connect(quit_when_idle)
+idle_timer.start(5)
+QTimer.singleShot(60000, app.quit)
+app.exec()
+
+print(json.dumps(statuses))
+"""
+
+def test_back_to_back_jobs_keep_the_process_alive():
+    num_of_jobs = 5
+
+    for _ in range(10):
+        completed = subprocess.run([sys.executable, "-c", f"NUM_OF_JOBS = {num_of_jobs}\n" + BACK_TO_BACK_JOBS],
+                                   cwd=APP_DIRECTORY, capture_output=True, text=True, timeout=120)
+
+        assert completed.returncode == 0, completed.stderr
+        assert "has been deleted" not in completed.stderr
+        assert json.loads(completed.stdout.strip().splitlines()[-1]) == ["succeeded"] * num_of_jobs
+
+CANCEL_QUEUED_JOB = """
+import json
+import threading
+from PyQt6.QtCore import QCoreApplication, QTimer
+from modules.job_scheduler import JobScheduler
+
+release_running_job = threading.Event()
+
+def job(progress_callback, cancel_token):
+    release_running_job.wait(60)
+
+app = QCoreApplication([])
+scheduler = JobScheduler(max_concurrent_jobs=2)
+started = []
+scheduler.job_started.connect(started.append)
+
+# A waits behind R writing the same file, B only reads the file A writes
+running_id = scheduler.submit(job, name="R", written_files={"plan.xlsx"})
+blocked_id = scheduler.submit(job, name="A", written_files={"plan.xlsx", "report.xlsx"})
+waiting_id = scheduler.submit(job, name="B", read_files={"report.xlsx"})
+started_before_cancel = list(started)
+
+scheduler.cancel(blocked_id)
+started_after_cancel = list(started)
+
+release_running_job.set()
+
+def quit_when_idle():
+    if scheduler.is_idle():
+        app.quit()
+
+idle_timer = QTimer()
+idle_timer.timeout.connect(quit_when_idle)
+idle_timer.start(5)
+QTimer.singleShot(60000, app.quit)
+app.exec()
+
+print(json.dumps({"ids": [running_id, blocked_id, waiting_id],
+                  "before": started_before_cancel, "after": started_after_cancel}))
+"""
+
+def test_cancelling_a_queued_job_starts_the_jobs_waiting_behind_it():
+    completed = subprocess.run([sys.executable, "-c", CANCEL_QUEUED_JOB],
+                               cwd=APP_DIRECTORY, capture_output=True, text=True, timeout=120)
+
+    assert completed.returncode == 0, completed.stderr
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    running_id, blocked_id, waiting_id = result["ids"]
+
+    assert result["before"] == [running_id]
+    assert result["after"] == [running_id, waiting_id]
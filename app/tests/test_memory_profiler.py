@@ -0,0 +1,86 @@
+"""
+Module: test_memory_profiler
+Description: Tests of the per-stage call sites of the memory profiler and of profilers
+             sharing tracemalloc while jobs run at the same time.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import threading
+import tracemalloc
+
+from modules.memory_profiler import MemoryProfiler
+
+def _allocate(num_of_items):
+    return [str(item) for item in range(num_of_items)]
+
+def test_call_sites_are_listed_for_the_stage_that_allocated():
+    profiler = MemoryProfiler()
+    profiler.start()
+
+    with profiler.stage("allocate"):
+        kept = _allocate(200000)
+
+    with profiler.stage("nothing"):
+        pass
+
+    profiler.stop()
+
+    allocate_record, nothing_record = profiler.stages
+    top_call_site = allocate_record.top_call_sites[0]
+
+    assert top_call_site.filename == __file__
+    assert top_call_site.size_diff > 1024 * 1024
+    assert all(call_site.filename != __file__ for call_site in nothing_record.top_call_sites)
+    assert "call sites grown during 'allocate'" in profiler.report()
+    assert not tracemalloc.is_tracing()
+    del kept
+
+def test_concurrent_profilers_share_tracemalloc():
+    first_profiler = MemoryProfiler()
+    second_profiler = MemoryProfiler()
+    second_started = threading.Event()
+    first_stopped = threading.Event()
+
+    def second_job():
+        second_profiler.start()
+
+        with second_profiler.stage("second"):
+            # The first job stops its profiler in the middle of this stage
+            second_started.set()
+            first_stopped.wait(10)
+            kept = _allocate(100000)
+
+        second_profiler.stop()
+        del kept
+
+    first_profiler.start()
+    with first_profiler.stage("first"):
+        thread = threading.Thread(target=second_job)
+        thread.start()
+        second_started.wait(10)
+
+    first_profiler.stop()
+
+    # The second job is still profiling, tracing must go on
+    assert tracemalloc.is_tracing()
+    first_stopped.set()
+    thread.join()
+
+    assert not tracemalloc.is_tracing()
+    assert first_profiler.stages[0].overlapped
+    assert second_profiler.stages[0].overlapped
+    assert second_profiler.stages[0].traced_peak - second_profiler.stages[0].traced_start > 1024 * 1024
+
+def test_report_failure_does_not_raise(tmp_path):
+    profiler = MemoryProfiler()
+    profiler.start()
+    with profiler.stage("stage"):
+        pass
+    profiler.stop()
+
+    profiler.write_report(str(tmp_path / "missing directory" / "report.txt"))
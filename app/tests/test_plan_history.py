@@ -0,0 +1,74 @@
+"""
+Module: test_plan_history
+Description: Tests of the plan history: user columns kept with the batches, workbooks
+             that cannot be imported and the recorded state of an output.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import os
+import pandas as pd
+
+from modules.excel_data_manager import ExcelDataManager
+from modules.plan_history import PlanHistory
+
+def _welding_plan_df():
+    dates = pd.to_datetime(["2026-01-05", "2026-01-12", "2026-01-19"])
+    return pd.DataFrame({"MATERIAL NUMBER": ["MX1", "MX2", "MX3"], "NAME": ["a", "b", "c"],
+                         "PIECES IN BATCH": [10, 20, 30], "READY FOR PICKING": dates, "WELDING COMPLETED": dates,
+                         "BATCH IN PRODUCTION": [10, 0, 0]})
+
+def _write_plan(path, welding_plan_df):
+    welding_plan_df.to_excel(path, sheet_name="Welding Plan", index=False)
+
+def test_user_columns_are_kept_with_the_batches(tmp_path):
+    output_path = str(tmp_path / "WeldingPlan.xlsx")
+    welding_plan_df = _welding_plan_df()
+    _write_plan(output_path, welding_plan_df)
+
+    with PlanHistory(str(tmp_path / "plan_history.sqlite")) as plan_history:
+        plan_history.record_run(welding_plan_df, output_path)
+
+        # The users add a note and a start date to the batch in production
+        edited_df = welding_plan_df.copy()
+        edited_df["NOTE"] = ["urgent", None, None]
+        edited_df["START DATE"] = pd.to_datetime(["2026-01-02", None, None])
+        _write_plan(output_path, edited_df)
+
+        in_production_df = plan_history.in_production(ExcelDataManager(output_path, "Welding Plan", 0))
+
+    assert list(in_production_df.columns[-2:]) == ["NOTE", "START DATE"]
+    assert in_production_df.loc[0, "NOTE"] == "urgent"
+    assert in_production_df.loc[0, "START DATE"] == pd.Timestamp("2026-01-02")
+
+def test_unreadable_edits_keep_the_recorded_batches(tmp_path):
+    output_path = str(tmp_path / "WeldingPlan.xlsx")
+    welding_plan_df = _welding_plan_df()
+    _write_plan(output_path, welding_plan_df)
+
+    with PlanHistory(str(tmp_path / "plan_history.sqlite")) as plan_history:
+        plan_history.record_run(welding_plan_df, output_path)
+        os.utime(output_path, ns=(0, 0))
+
+        # read_excel returns None for a sheet that is not there
+        in_production_df = plan_history.in_production(ExcelDataManager(output_path, "Missing", 0))
+
+    assert in_production_df["MATERIAL NUMBER"].tolist() == ["MX1"]
+
+def test_is_recorded_follows_the_output_file(tmp_path):
+    output_path = str(tmp_path / "WeldingPlan.xlsx")
+    welding_plan_df = _welding_plan_df()
+    _write_plan(output_path, welding_plan_df)
+
+    with PlanHistory(str(tmp_path / "plan_history.sqlite")) as plan_history:
+        assert not plan_history.is_recorded(output_path)
+
+        plan_history.record_run(welding_plan_df, output_path)
+        assert plan_history.is_recorded(output_path)
+
+        os.utime(output_path, ns=(0, 0))
+        assert not plan_history.is_recorded(output_path)
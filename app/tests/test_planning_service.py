@@ -0,0 +1,59 @@
+"""
+Module: test_planning_service
+Description: Tests of the planning service: uploaded workbooks must not take the place
+             of the master data in the frame cache.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import base64
+import json
+import threading
+import urllib.request
+
+from benchmarks.synthetic_inputs import write_welding_planner_inputs
+from modules.planning_service import PlanningService
+
+def _request(service, method, endpoint, payload=None):
+    host, port = service.server_address
+    data = None if payload is None else json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(f"http://{host}:{port}{endpoint}", data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+def test_uploads_do_not_enter_the_frame_cache(tmp_path):
+    inputs = write_welding_planner_inputs(str(tmp_path), num_of_materials=20)
+    paths = inputs["paths"]
+
+    with open(paths["bi_reservations"], "rb") as upload_file:
+        bi_reservations_base64 = base64.b64encode(upload_file.read()).decode("ascii")
+
+    plan_request = {"bi_reservations": {"content_base64": bi_reservations_base64},
+                    "manufacturing_plan": {"path": paths["manufacturing_plan"]},
+                    "batch_database": {"path": paths["batch_database"], "column_title_row": 2}}
+
+    service = PlanningService(port=0, max_workers=1)
+    server_thread = threading.Thread(target=service.serve_forever, daemon=True)
+    server_thread.start()
+
+    try:
+        _request(service, "POST", "/plan", plan_request)
+        first_health = _request(service, "GET", "/health")
+
+        _request(service, "POST", "/plan", plan_request)
+        second_health = _request(service, "GET", "/health")
+    finally:
+        service.shutdown()
+        server_thread.join()
+
+    # Only the manufacturing plan and the batch database are cached, the second request hits both
+    assert first_health["cached_sheets"] == 2
+    assert second_health["cached_sheets"] == 2
+    assert second_health["cache_hits"] == first_health["cache_hits"] + 2
+    assert second_health["cache_misses"] == first_health["cache_misses"]
@@ -0,0 +1,107 @@
+"""
+Module: test_streaming_data_filler
+Description: Tests that the streaming data filler fills exactly what DataFiller fills, the
+             lookup values must compare the same way on both paths.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import datetime
+import tracemalloc
+import openpyxl
+import pandas as pd
+import pytest
+
+from modules import jobs
+from modules.excel_data_manager import ExcelDataManager
+from modules.streaming_data_filler import lookup_keys
+
+def _write_sheet(path, sheet_name, rows):
+    workbook = openpyxl.Workbook()
+    workbook.active.title = sheet_name
+    for row in rows:
+        workbook.active.append(row)
+    workbook.save(path)
+
+def _fill(tmp_path, source_rows, destination_rows, streaming):
+    source_path = tmp_path / "source.xlsx"
+    destination_path = tmp_path / f"destination_{'streaming' if streaming else 'loaded'}.xlsx"
+
+    _write_sheet(source_path, "Source", source_rows)
+    _write_sheet(destination_path, "Destination", destination_rows)
+
+    jobs.run_data_filler(ExcelDataManager(str(source_path), "Source", 0),
+                         ExcelDataManager(str(destination_path), "Destination", 0),
+                         "KEY", "VALUE", "KEY", "VALUE", streaming=streaming)
+
+    return pd.read_excel(destination_path, "Destination")["VALUE"].tolist()
+
+@pytest.mark.parametrize("source_keys", [[10, 20, 30], [10, None, 30]], ids=["ints", "ints with blanks"])
+def test_int_key_column_with_blanks_fills_like_data_filler(tmp_path, source_keys):
+    source_rows = [["KEY", "VALUE"]] + [[key, f"value {position}"] for position, key in enumerate(source_keys)]
+    destination_rows = [["KEY", "VALUE"], [10, None], [None, None], [30, None]]
+
+    loaded = _fill(tmp_path, source_rows, destination_rows, streaming=False)
+    streamed = _fill(tmp_path, source_rows, destination_rows, streaming=True)
+
+    assert pd.Series(streamed).equals(pd.Series(loaded))
+
+@pytest.mark.parametrize("values", [
+    [10, None, 30],
+    [10.0, 10.5, None],
+    ["10", "0010", 30],
+    ["A1", 10, None],
+    [datetime.datetime(2026, 1, 5), None],
+    [True, False, None],
+    ["N/A", "x", "#DIV/0!"],
+    [None, None],
+])
+def test_lookup_keys_match_read_excel_astype_str(tmp_path, values):
+    path = tmp_path / "keys.xlsx"
+    # A second, full column keeps the rows with an empty key in the sheet
+    _write_sheet(path, "Keys", [["KEY", "OTHER"]] + [[value, 1] for value in values])
+
+    expected = pd.read_excel(path, "Keys")["KEY"].astype(str).tolist()
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    cell_values = [row[0] for row in workbook["Keys"].iter_rows(min_row=2, values_only=True)]
+    workbook.close()
+
+    assert lookup_keys("KEY", cell_values) == expected
+
+def _traced_peak_of_streaming_fill(tmp_path, num_of_rows, num_of_other_columns):
+    source_path = tmp_path / "source.xlsx"
+    destination_path = tmp_path / f"destination_{num_of_rows}.xlsx"
+
+    _write_sheet(source_path, "Source", [["KEY", "VALUE"]] + [[f"K{key}", key] for key in range(100)])
+    _write_sheet(destination_path, "Destination",
+                 [["KEY", "VALUE"] + [f"OTHER {column}" for column in range(num_of_other_columns)]] +
+                 [[f"K{row % 150}", None] + [f"text {row} {column}" for column in range(num_of_other_columns)]
+                  for row in range(num_of_rows)])
+
+    tracemalloc.start()
+    try:
+        jobs.run_data_filler(ExcelDataManager(str(source_path), "Source", 0),
+                             ExcelDataManager(str(destination_path), "Destination", 0),
+                             "KEY", "VALUE", "KEY", "VALUE", streaming=True)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def test_memory_grows_only_by_the_destination_lookup_keys(tmp_path):
+    num_of_other_columns = 10
+
+    # The first fill imports and caches what every fill needs, that is not part of either size
+    _traced_peak_of_streaming_fill(tmp_path, 10, num_of_other_columns)
+
+    small_peak = _traced_peak_of_streaming_fill(tmp_path, 1000, num_of_other_columns)
+    large_peak = _traced_peak_of_streaming_fill(tmp_path, 2000, num_of_other_columns)
+
+    # The keys of the destination are held, O(rows) at a few hundred bytes per row. Loading
+    # the rows of 12 short text cells as DataFiller does costs about 5 kB per row.
+    bytes_per_row = (large_peak - small_peak) / 1000
+    assert bytes_per_row < 500
@@ -0,0 +1,86 @@
+"""
+Module: test_workbook_pool
+Description: Tests of the workbook pool: a file the run reads and updates is parsed once,
+             formula cells are read as their values.
+
+Author: Adam Ondryas
+Email: adam.ondryas@gmail.com
+
+This software is distributed under the GPL v3.0 license.
+"""
+
+# external module imports
+import zipfile
+import openpyxl
+import pandas as pd
+
+from modules.excel_data_manager import ExcelDataManager
+from modules.workbook_pool import WorkbookPool
+
+def _write_workbook(path, sheets):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for sheet_name, rows in sheets.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        for row in rows:
+            worksheet.append(row)
+    workbook.save(path)
+
+def _set_cached_values(path, cached_values):
+    # openpyxl saves formulas without values, Excel saves the last calculated value with them
+    with zipfile.ZipFile(path) as workbook_zip:
+        members = {name: workbook_zip.read(name) for name in workbook_zip.namelist()}
+
+    sheet_xml = members["xl/worksheets/sheet1.xml"].decode("utf-8")
+    for formula, value in cached_values.items():
+        sheet_xml = sheet_xml.replace(f"<f>{formula}</f><v />", f"<f>{formula}</f><v>{value}</v>")
+    members["xl/worksheets/sheet1.xml"] = sheet_xml.encode("utf-8")
+
+    with zipfile.ZipFile(path, "w") as workbook_zip:
+        for name, content in members.items():
+            workbook_zip.writestr(name, content)
+
+def test_a_read_and_updated_workbook_is_parsed_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "workbook.xlsx")
+    _write_workbook(path, {"Source": [["KEY", "VALUE"], ["A", 1], ["B", 2]],
+                           "Destination": [["KEY", "VALUE"], ["B", None], ["A", None]]})
+
+    loads = []
+    load_workbook = openpyxl.load_workbook
+
+    def counting_load_workbook(*args, **kwargs):
+        loads.append(args[0])
+        return load_workbook(*args, **kwargs)
+
+    monkeypatch.setattr(openpyxl, "load_workbook", counting_load_workbook)
+
+    with WorkbookPool(writable_paths=[path]) as workbook_pool:
+        src_excel = ExcelDataManager(path, "Source", 0, workbook_pool)
+        dst_excel = ExcelDataManager(path, "Destination", 0, workbook_pool)
+
+        src_df = src_excel.read_excel()
+        dst_df = dst_excel.read_excel()
+
+        dst_df["VALUE"] = dst_df["KEY"].map(src_df.set_index("KEY")["VALUE"])
+        dst_excel.append_to_excel(dst_df)
+
+    assert len(loads) == 1
+    assert pd.read_excel(path, "Destination")["VALUE"].tolist() == [2, 1]
+
+def test_formula_cells_are_read_as_their_values(tmp_path):
+    path = str(tmp_path / "workbook.xlsx")
+    _write_workbook(path, {"Destination": [["KEY", "VALUE"], ["=1+1", None], [3, None]]})
+    _set_cached_values(path, {"1+1": 2})
+
+    with WorkbookPool(writable_paths=[path]) as workbook_pool:
+        dst_excel = ExcelDataManager(path, "Destination", 0, workbook_pool)
+        dst_df = dst_excel.read_excel()
+
+        # Only the filled column is written, like DataFiller does
+        dst_df["VALUE"] = ["two", "three"]
+        dst_excel.append_to_excel(dst_df[["VALUE"]], startcol=1)
+
+    assert dst_df["KEY"].tolist() == [2, 3]
+
+    # The formula itself is kept in the saved workbook
+    assert openpyxl.load_workbook(path)["Destination"]["A2"].value == "=1+1"